@@ -0,0 +1,85 @@
+"""
+Excel 解析引擎基準測試：比較 calamine 與預設引擎（xlrd/openpyxl）讀取 WoS 匯出的耗時，
+以及只讀取 map_wos_frame 用到的欄位（usecols）的效果。
+
+測試資料由專案根目錄的 savedrecs.xls 重複擴充到指定列數（標題與 DOI 加上序號避免重複）；
+沒有寫入 .xls 的套件，擴充後的文件存為 .xlsx。原始 savedrecs.xls 另外以 xlrd 與 calamine 各讀取一次。
+不需要資料庫：
+
+    cd backend
+    python benchmarks/bench_excel_engine.py --rows 1000 10000 50000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+import readers
+from excel_import import WOS_COLUMNS, map_wos_frame
+
+SAVEDRECS = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "savedrecs.xls")
+
+def write_scaled(path: str, rows: int):
+    """將 savedrecs.xls 的紀錄重複到 rows 列後寫成 xlsx"""
+    source = pd.read_excel(SAVEDRECS)
+    df = pd.concat([source] * (rows // len(source) + 1), ignore_index=True).head(rows)
+    suffix = pd.Series(range(rows)).astype(str)
+    df["Article Title"] = df["Article Title"].astype(str) + " #" + suffix
+    df["DOI"] = df["DOI"].where(df["DOI"].isna(), df["DOI"].astype(str) + "." + suffix)
+    df.to_excel(path, index=False)
+
+def measure(path: str, engine: str, usecols, repeat: int):
+    """以指定引擎讀取並映射 repeat 次，回傳 (最短讀取秒數, 映射秒數, 映射結果)"""
+    readers.IMPORT_EXCEL_ENGINE = engine
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        df = readers.read_excel(path, usecols=usecols)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    started = time.perf_counter()
+    records = map_wos_frame(df)
+    return best, time.perf_counter() - started, records
+
+def run_cases(label: str, path: str, repeat: int):
+    results = []
+    baseline = None
+    for engine in ("default", "calamine"):
+        if engine == "calamine" and not readers.CALAMINE_AVAILABLE:
+            print("未安裝 python-calamine，略過 calamine")
+            continue
+        for usecols in (None, WOS_COLUMNS):
+            read_seconds, map_seconds, records = measure(path, engine, usecols, repeat)
+            # 各種組合產生的論文數據必須完全相同
+            if baseline is None:
+                baseline = records
+            elif records != baseline:
+                raise SystemExit(f"{label}: {engine} 的映射結果與預設引擎不同")
+            results.append((label, engine, "映射欄位" if usecols else "全部欄位", read_seconds, map_seconds))
+    return results
+
+def run(row_counts, repeat: int):
+    results = run_cases(f"savedrecs.xls ({len(pd.read_excel(SAVEDRECS))} 列)", SAVEDRECS, repeat)
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in row_counts:
+            path = os.path.join(directory, f"savedrecs-{rows}.xlsx")
+            print(f"產生 {rows} 列的測試文件...")
+            write_scaled(path, rows)
+            size_mb = os.path.getsize(path) / 1024 / 1024
+            results.extend(run_cases(f"{rows} 列 xlsx ({size_mb:.1f} MB)", path, repeat))
+
+    print(f"\n{'文件':<28}{'引擎':>10}{'欄位':>10}{'讀取 (s)':>12}{'映射 (s)':>12}")
+    for label, engine, columns, read_seconds, map_seconds in results:
+        print(f"{label:<28}{engine:>10}{columns:>10}{read_seconds:>12.3f}{map_seconds:>12.3f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Excel 解析引擎基準測試")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 50000], help="擴充後測試文件的列數")
+    parser.add_argument("--repeat", type=int, default=3, help="每種組合讀取的次數（取最短時間）")
+    args = parser.parse_args()
+    run(args.rows, args.repeat)
@@ -0,0 +1,527 @@
+import fcntl
+import json
+import math
+import os
+import re
+import shutil
+import threading
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from models import Paper, PaperAuthor, Author
+
+# 搜索引擎設定：'postgres'（預設）或 'bm25'（行程內倒排索引）
+SEARCH_ENGINE = os.getenv("SEARCH_ENGINE", "postgres").lower()
+BM25_INDEX_PATH = os.getenv("BM25_INDEX_PATH", "./search_index")
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+BM25_SYNC_INTERVAL = float(os.getenv("BM25_SYNC_INTERVAL", "30"))  # 秒
+BM25_COMPACT_THRESHOLD = int(os.getenv("BM25_COMPACT_THRESHOLD", "1000"))
+# 以資料庫檢查結構化條件時第一批的候選數，之後每批加倍
+BM25_MAX_CANDIDATES = int(os.getenv("BM25_MAX_CANDIDATES", "1000"))
+
+INDEX_FORMAT = 1
+SEGMENT_ARRAYS = ("offsets", "post_docs", "post_tfs", "doc_ids", "doc_lens")
+# 寫入索引段時持有的檔案鎖（同一目錄的各 worker 共用）
+LOCK_FILE = "LOCK"
+
+# 各欄位的詞頻權重
+FIELD_WEIGHTS = {"title": 3.0, "keywords": 2.0, "authors": 2.0, "abstract": 1.0}
+
+# 前綴查詢最多展開的詞數
+PREFIX_EXPANSIONS = 50
+# 超過此長度的詞視為雜訊，不建立索引
+MAX_TOKEN_LENGTH = 40
+# 增量同步時往回多看的時間，涵蓋提交較晚的長交易
+SYNC_OVERLAP = timedelta(seconds=60)
+
+CJK_RANGES = "\u3400-\u9fff\uf900-\ufaff"
+# 中日韓文字逐字切分，其他文字以連續的字母數字為一個詞
+TOKEN_PATTERN = re.compile(f"[{CJK_RANGES}]|[^\\W_{CJK_RANGES}]+")
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """將文字標準化並切分為小寫詞"""
+    if not text:
+        return []
+    normalized = unicodedata.normalize('NFKC', text).lower()
+    return [token for token in TOKEN_PATTERN.findall(normalized) if len(token) <= MAX_TOKEN_LENGTH]
+
+def document_terms(title: Optional[str], abstract: Optional[str], keywords: Optional[List[str]], author_names: List[str]) -> Dict[str, float]:
+    """計算一篇論文的加權詞頻"""
+    fields = (
+        ("title", title),
+        ("keywords", " ".join(keywords or [])),
+        ("authors", " ".join(author_names)),
+        ("abstract", abstract),
+    )
+    counts: Dict[str, float] = {}
+    for field, text in fields:
+        weight = FIELD_WEIGHTS[field]
+        for token in tokenize(text):
+            counts[token] = counts.get(token, 0.0) + weight
+    return counts
+
+def iter_documents(db: Session, paper_ids: Optional[Iterable[int]] = None, batch_size: int = 2000):
+    """依 id 順序逐批讀取論文，產生 (id, 加權詞頻, updated_at)"""
+    query = db.query(Paper.id, Paper.title, Paper.abstract, Paper.keywords, Paper.updated_at)
+    authors_query = db.query(PaperAuthor.paper_id, Author.name).join(Author, Author.id == PaperAuthor.author_id)
+    if paper_ids is not None:
+        paper_ids = list(paper_ids)
+        if not paper_ids:
+            return
+        query = query.filter(Paper.id.in_(paper_ids))
+        authors_query = authors_query.filter(PaperAuthor.paper_id.in_(paper_ids))
+
+    authors: Dict[int, List[str]] = {}
+    for paper_id, name in authors_query.order_by(PaperAuthor.paper_id, PaperAuthor.author_order):
+        authors.setdefault(paper_id, []).append(name)
+
+    for row in query.order_by(Paper.id).yield_per(batch_size):
+        terms = document_terms(row.title, row.abstract, row.keywords, authors.get(row.id, []))
+        yield row.id, terms, row.updated_at
+
+def find_paper_changes(db: Session, watermark, indexed_ids: np.ndarray) -> Tuple[List[int], List[int]]:
+    """
+    比對資料庫與索引，回傳 (需要重新索引的 id, 已刪除的 id)。
+    先以一次聚合比對論文數與 id 總和：與索引（加上依 updated_at 找到的變更）一致時視為沒有刪除或遺漏的論文，
+    不一致時才讀出全部 id 逐一比對。
+    """
+    changed = set()
+    if watermark is not None:
+        changed.update(db.execute(select(Paper.id).where(Paper.updated_at > watermark - SYNC_OVERLAP)).scalars())
+    expected = np.union1d(indexed_ids, np.fromiter(changed, dtype=np.int64, count=len(changed)))
+    count, id_sum = db.execute(select(func.count(), func.coalesce(func.sum(Paper.id), 0))).one()
+    if count == len(expected) and int(id_sum) == int(expected.sum(dtype=np.int64)):
+        return sorted(changed), []
+
+    current_ids = np.fromiter(db.execute(select(Paper.id)).scalars(), dtype=np.int64)
+    changed.update(np.setdiff1d(current_ids, indexed_ids).tolist())
+    removed = np.setdiff1d(indexed_ids, current_ids).tolist()
+    return sorted(changed), removed
+
+class BM25Index:
+    """
+    論文標題、摘要、關鍵字與作者的 BM25 倒排索引。
+    基底段以 numpy 陣列存於磁碟並以記憶體映射載入，之後的新增、更新與刪除
+    記錄在記憶體中的增量區，累積到一定數量時合併寫成新的基底段。
+    """
+
+    def __init__(self, path: str, k1: float = BM25_K1, b: float = BM25_B):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self.watermark: Optional[datetime] = None
+        self.last_sync = 0.0
+        self._set_base([], np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int32),
+                       np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32))
+
+    def _set_base(self, terms, offsets, post_docs, post_tfs, doc_ids, doc_lens):
+        """切換基底段並清空增量區"""
+        self.terms: List[str] = terms
+        self.offsets = offsets
+        self.post_docs = post_docs
+        self.post_tfs = post_tfs
+        self.doc_ids = doc_ids
+        self.doc_lens = doc_lens
+        self.total_len = float(np.sum(doc_lens, dtype=np.float64))
+        # 增量區：新增或更新過的論文
+        self.delta_terms: Dict[int, Dict[str, float]] = {}
+        self.delta_lens: Dict[int, float] = {}
+        self.delta_postings: Dict[str, Dict[int, float]] = {}
+        # 基底段中已刪除或已更新（改由增量區提供）的論文
+        self.deleted: set = set()
+        self._deleted_array = None
+
+    # ---- 基底段查詢 ----
+
+    def _base_position(self, paper_id: int) -> int:
+        """論文在基底段文件陣列中的位置，不存在時回傳 -1"""
+        position = int(np.searchsorted(self.doc_ids, paper_id))
+        if position < len(self.doc_ids) and self.doc_ids[position] == paper_id:
+            return position
+        return -1
+
+    def _deleted_ids(self) -> np.ndarray:
+        if self._deleted_array is None:
+            self._deleted_array = np.fromiter(self.deleted, dtype=np.int32, count=len(self.deleted))
+        return self._deleted_array
+
+    def doc_count(self) -> int:
+        return len(self.doc_ids) - len(self.deleted) + len(self.delta_terms)
+
+    def indexed_ids(self) -> np.ndarray:
+        """目前索引中所有論文的 id"""
+        with self._lock:
+            base = np.asarray(self.doc_ids)
+            if self.deleted:
+                base = base[~np.isin(base, self._deleted_ids())]
+            delta = np.fromiter(self.delta_terms.keys(), dtype=np.int32, count=len(self.delta_terms))
+            return np.union1d(base, delta)
+
+    # ---- 增量更新 ----
+
+    def remove_document(self, paper_id: int):
+        """從索引移除一篇論文"""
+        with self._lock:
+            terms = self.delta_terms.pop(paper_id, None)
+            if terms is not None:
+                for term in terms:
+                    postings = self.delta_postings[term]
+                    postings.pop(paper_id, None)
+                    if not postings:
+                        del self.delta_postings[term]
+                self.total_len -= self.delta_lens.pop(paper_id)
+
+            if paper_id not in self.deleted:
+                position = self._base_position(paper_id)
+                if position >= 0:
+                    self.deleted.add(paper_id)
+                    self._deleted_array = None
+                    self.total_len -= float(self.doc_lens[position])
+
+    def index_document(self, paper_id: int, terms: Dict[str, float]):
+        """新增或更新一篇論文（寫入增量區）"""
+        with self._lock:
+            self.remove_document(paper_id)
+            self.delta_terms[paper_id] = terms
+            length = float(sum(terms.values()))
+            self.delta_lens[paper_id] = length
+            self.total_len += length
+            for term, tf in terms.items():
+                self.delta_postings.setdefault(term, {})[paper_id] = tf
+
+    # ---- 查詢 ----
+
+    def _expand_prefix(self, prefix: str) -> List[str]:
+        """列出以 prefix 開頭的索引詞（含 prefix 本身）"""
+        expansions = [prefix]
+        position = bisect_left(self.terms, prefix)
+        while position < len(self.terms) and len(expansions) < PREFIX_EXPANSIONS:
+            term = self.terms[position]
+            if not term.startswith(prefix):
+                break
+            if term != prefix:
+                expansions.append(term)
+            position += 1
+        for term in self.delta_postings:
+            if len(expansions) >= PREFIX_EXPANSIONS:
+                break
+            if term.startswith(prefix) and term not in expansions:
+                expansions.append(term)
+        return expansions
+
+    def _query_groups(self, query: str) -> List[List[str]]:
+        """將查詢切分為詞組；查詢未以空白結尾時，最後一個詞視為前綴（邊輸入邊搜索）"""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+        groups = [[token] for token in tokens]
+        if not query[-1].isspace():
+            last = tokenize(query)[-1]
+            groups = [[token] for token in tokens if token != last]
+            groups.append(self._expand_prefix(last))
+        return groups
+
+    def _postings(self, term: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """取得一個詞的 (論文 id, 詞頻, 文件長度)，已合併基底段與增量區"""
+        ids_parts, tf_parts, len_parts = [], [], []
+
+        position = bisect_left(self.terms, term)
+        if position < len(self.terms) and self.terms[position] == term:
+            start, end = int(self.offsets[position]), int(self.offsets[position + 1])
+            ids = np.asarray(self.post_docs[start:end])
+            tfs = np.asarray(self.post_tfs[start:end])
+            if self.deleted:
+                keep = ~np.isin(ids, self._deleted_ids())
+                ids, tfs = ids[keep], tfs[keep]
+            ids_parts.append(ids)
+            tf_parts.append(tfs)
+            len_parts.append(np.asarray(self.doc_lens)[np.searchsorted(self.doc_ids, ids)])
+
+        postings = self.delta_postings.get(term)
+        if postings:
+            ids = np.fromiter(postings.keys(), dtype=np.int32, count=len(postings))
+            ids_parts.append(ids)
+            tf_parts.append(np.fromiter(postings.values(), dtype=np.float32, count=len(postings)))
+            len_parts.append(np.array([self.delta_lens[paper_id] for paper_id in postings], dtype=np.float32))
+
+        if not ids_parts:
+            empty = np.zeros(0)
+            return empty.astype(np.int32), empty, empty
+        return np.concatenate(ids_parts), np.concatenate(tf_parts), np.concatenate(len_parts)
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[Tuple[int, float]]:
+        """BM25 搜索，回傳依分數排序的 (論文 id, 分數)，limit 為 None 時回傳全部命中；所有查詢詞都必須命中"""
+        with self._lock:
+            groups = self._query_groups(query)
+            doc_count = self.doc_count()
+            if not groups or doc_count <= 0:
+                return []
+            avg_len = self.total_len / doc_count if self.total_len > 0 else 1.0
+
+            matched_ids, matched_scores = None, None
+            for terms in groups:
+                id_parts, score_parts = [], []
+                for term in terms:
+                    ids, tfs, lengths = self._postings(term)
+                    if len(ids) == 0:
+                        continue
+                    df = len(ids)
+                    idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+                    tfs = tfs.astype(np.float64)
+                    norm = self.k1 * (1 - self.b + self.b * lengths / avg_len)
+                    id_parts.append(ids)
+                    score_parts.append(idf * tfs * (self.k1 + 1) / (tfs + norm))
+                if not id_parts:
+                    return []
+
+                # 同一詞組（前綴展開）內的多個詞分數相加，每篇論文只算一次命中
+                ids, inverse = np.unique(np.concatenate(id_parts), return_inverse=True)
+                scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+                if matched_ids is None:
+                    matched_ids, matched_scores = ids, scores
+                else:
+                    matched_ids, left, right = np.intersect1d(matched_ids, ids, assume_unique=True, return_indices=True)
+                    matched_scores = matched_scores[left] + scores[right]
+                if len(matched_ids) == 0:
+                    return []
+
+        order = np.lexsort((matched_ids, -matched_scores))[:limit]
+        return [(int(matched_ids[i]), float(matched_scores[i])) for i in order]
+
+    # ---- 持久化 ----
+
+    def load(self) -> bool:
+        """以記憶體映射載入最新的索引段，不存在或格式不符時回傳 False"""
+        try:
+            with open(os.path.join(self.path, "CURRENT"), encoding="utf-8") as f:
+                segment_dir = os.path.join(self.path, f.read().strip())
+            with open(os.path.join(segment_dir, "meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("format") != INDEX_FORMAT:
+                return False
+            with open(os.path.join(segment_dir, "terms.json"), encoding="utf-8") as f:
+                terms = json.load(f)
+            arrays = {
+                name: np.load(os.path.join(segment_dir, f"{name}.npy"), mmap_mode="r")
+                for name in SEGMENT_ARRAYS
+            }
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            print(f"BM25 索引檔無法讀取，將重新建立: {e}")
+            return False
+
+        with self._lock:
+            self._set_base(terms, *(arrays[name] for name in SEGMENT_ARRAYS))
+            self.watermark = datetime.fromisoformat(meta["watermark"]) if meta.get("watermark") else None
+        return True
+
+    def _write_segment(self, terms: List[str], post_terms, post_docs, post_tfs, doc_ids, doc_lens):
+        """將 (詞編號, 論文 id, 詞頻) 三元組排序後寫成新的索引段，並切換 CURRENT 指向它"""
+        post_terms = np.asarray(post_terms, dtype=np.int64)
+        post_docs = np.asarray(post_docs, dtype=np.int32)
+        post_tfs = np.asarray(post_tfs, dtype=np.float32)
+
+        # 移除已沒有任何論文的詞，並依字典順序重新編號
+        counts = np.bincount(post_terms, minlength=len(terms))
+        used = np.flatnonzero(counts)
+        sorted_used = sorted(used.tolist(), key=terms.__getitem__)
+        rank = np.zeros(len(terms), dtype=np.int64)
+        rank[sorted_used] = np.arange(len(sorted_used))
+        new_terms = [terms[i] for i in sorted_used]
+
+        post_terms = rank[post_terms]
+        order = np.lexsort((post_docs, post_terms))
+        offsets = np.zeros(len(new_terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(post_terms, minlength=len(new_terms)))
+
+        doc_ids = np.asarray(doc_ids, dtype=np.int32)
+        doc_order = np.argsort(doc_ids, kind="stable")
+        arrays = {
+            "offsets": offsets,
+            "post_docs": post_docs[order],
+            "post_tfs": post_tfs[order],
+            "doc_ids": doc_ids[doc_order],
+            "doc_lens": np.asarray(doc_lens, dtype=np.float32)[doc_order],
+        }
+
+        # 多個 worker 共用索引目錄：寫入、切換 CURRENT 與清理都在檔案鎖內進行，避免刪除其他 worker 正在寫入的索引段
+        with open(os.path.join(self.path, LOCK_FILE), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self._publish_segment(arrays, new_terms, len(doc_ids))
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _publish_segment(self, arrays: Dict[str, np.ndarray], terms: List[str], doc_count: int):
+        """寫入索引段目錄並切換 CURRENT；呼叫者須持有檔案鎖"""
+        try:
+            with open(os.path.join(self.path, "CURRENT"), encoding="utf-8") as f:
+                previous = f.read().strip()
+        except FileNotFoundError:
+            previous = None
+
+        segment = f"segment-{time.time_ns()}-{os.getpid()}"
+        segment_dir = os.path.join(self.path, segment)
+        os.makedirs(segment_dir)
+        for name, values in arrays.items():
+            np.save(os.path.join(segment_dir, f"{name}.npy"), values)
+        with open(os.path.join(segment_dir, "terms.json"), "w", encoding="utf-8") as f:
+            json.dump(terms, f, ensure_ascii=False)
+        with open(os.path.join(segment_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "format": INDEX_FORMAT,
+                "doc_count": doc_count,
+                "watermark": self.watermark.isoformat() if self.watermark else None,
+            }, f)
+
+        current_tmp = os.path.join(self.path, f"CURRENT.{os.getpid()}.tmp")
+        with open(current_tmp, "w", encoding="utf-8") as f:
+            f.write(segment)
+        os.replace(current_tmp, os.path.join(self.path, "CURRENT"))
+
+        # 只清除比切換前 CURRENT 更舊的索引段；保留前一段，讓剛讀到舊 CURRENT 的 worker 仍能載入
+        # （已載入的記憶體映射在 Linux 上仍可繼續使用）
+        if previous is None:
+            return
+        for name in os.listdir(self.path):
+            if name.startswith("segment-") and name < previous:
+                shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+    def build(self, db: Session):
+        """從 papers 表完整建立索引並寫入磁碟"""
+        os.makedirs(self.path, exist_ok=True)
+        term_ids: Dict[str, int] = {}
+        post_terms, post_docs, post_tfs = array('i'), array('i'), array('f')
+        doc_ids, doc_lens = array('i'), array('f')
+        watermark = None
+
+        for paper_id, terms, updated_at in iter_documents(db):
+            doc_ids.append(paper_id)
+            doc_lens.append(sum(terms.values()))
+            for term, tf in terms.items():
+                post_terms.append(term_ids.setdefault(term, len(term_ids)))
+                post_docs.append(paper_id)
+                post_tfs.append(tf)
+            if updated_at is not None and (watermark is None or updated_at > watermark):
+                watermark = updated_at
+
+        with self._lock:
+            self.watermark = watermark
+            self._write_segment(list(term_ids), post_terms, post_docs, post_tfs, doc_ids, doc_lens)
+            self.load()
+            self.last_sync = time.monotonic()
+
+    def save(self):
+        """將增量區合併進基底段並寫成新的索引段"""
+        with self._lock:
+            if not self.delta_terms and not self.deleted:
+                return
+            os.makedirs(self.path, exist_ok=True)
+            terms = list(self.terms)
+            term_ids = {term: i for i, term in enumerate(terms)}
+
+            base_terms = np.repeat(np.arange(len(terms), dtype=np.int64), np.diff(np.asarray(self.offsets)))
+            base_docs = np.asarray(self.post_docs)
+            base_tfs = np.asarray(self.post_tfs)
+            doc_ids = np.asarray(self.doc_ids)
+            doc_lens = np.asarray(self.doc_lens)
+            if self.deleted:
+                deleted = self._deleted_ids()
+                keep = ~np.isin(base_docs, deleted)
+                base_terms, base_docs, base_tfs = base_terms[keep], base_docs[keep], base_tfs[keep]
+                keep_docs = ~np.isin(doc_ids, deleted)
+                doc_ids, doc_lens = doc_ids[keep_docs], doc_lens[keep_docs]
+
+            delta_terms, delta_docs, delta_tfs = array('q'), array('i'), array('f')
+            for term, postings in self.delta_postings.items():
+                term_id = term_ids.setdefault(term, len(terms))
+                if term_id == len(terms):
+                    terms.append(term)
+                for paper_id, tf in postings.items():
+                    delta_terms.append(term_id)
+                    delta_docs.append(paper_id)
+                    delta_tfs.append(tf)
+
+            self._write_segment(
+                terms,
+                np.concatenate([base_terms, np.frombuffer(delta_terms, dtype=np.int64)]),
+                np.concatenate([base_docs, np.frombuffer(delta_docs, dtype=np.int32)]),
+                np.concatenate([base_tfs, np.frombuffer(delta_tfs, dtype=np.float32)]),
+                np.concatenate([doc_ids, np.fromiter(self.delta_lens.keys(), dtype=np.int32)]),
+                np.concatenate([doc_lens, np.fromiter(self.delta_lens.values(), dtype=np.float32)]),
+            )
+            self.load()
+
+    def sync(self, db: Session):
+        """補上不經過本行程的變更（其他 worker、直接寫入資料庫等）"""
+        with self._lock:
+            watermark = self.watermark
+
+        changed, removed = find_paper_changes(db, watermark, self.indexed_ids())
+        for paper_id, terms, updated_at in iter_documents(db, changed):
+            self.index_document(paper_id, terms)
+            with self._lock:
+                if updated_at is not None and (self.watermark is None or updated_at > self.watermark):
+                    self.watermark = updated_at
+        for paper_id in removed:
+            self.remove_document(paper_id)
+
+        with self._lock:
+            self.last_sync = time.monotonic()
+            if len(self.delta_terms) + len(self.deleted) >= BM25_COMPACT_THRESHOLD:
+                self.save()
+
+    def maybe_sync(self, db: Session):
+        """距離上次同步超過 BM25_SYNC_INTERVAL 秒時進行同步"""
+        if time.monotonic() - self.last_sync >= BM25_SYNC_INTERVAL:
+            self.sync(db)
+
+# 行程內共用的索引
+search_index = BM25Index(BM25_INDEX_PATH)
+
+def bm25_enabled() -> bool:
+    return SEARCH_ENGINE == "bm25"
+
+def init_search_index(session_factory):
+    """啟動時載入索引檔並補上變更；沒有可用的索引檔時從 papers 表重建"""
+    if not bm25_enabled():
+        return
+    db = session_factory()
+    try:
+        started = time.perf_counter()
+        if search_index.load():
+            search_index.sync(db)
+            print(f"BM25 索引已載入（{search_index.doc_count()} 篇，{time.perf_counter() - started:.2f} 秒）")
+        else:
+            search_index.build(db)
+            print(f"BM25 索引已重建（{search_index.doc_count()} 篇，{time.perf_counter() - started:.2f} 秒）")
+    finally:
+        db.close()
+
+def index_paper(paper: Paper):
+    """論文新增或更新後同步到索引"""
+    if not bm25_enabled():
+        return
+    author_names = [relation.author.name for relation in sorted(paper.authors, key=lambda r: r.author_order)]
+    search_index.index_document(paper.id, document_terms(paper.title, paper.abstract, paper.keywords, author_names))
+
+def remove_paper(paper_id: int):
+    """論文刪除後從索引移除"""
+    if bm25_enabled():
+        search_index.remove_document(paper_id)
+
+def save_search_index():
+    """將尚未寫入的增量更新存檔（關閉服務時呼叫）"""
+    if bm25_enabled():
+        search_index.save()
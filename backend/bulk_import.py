@@ -0,0 +1,213 @@
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import select, insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.orm import Session
+
+from models import Paper, Author, Venue, PaperAuthor
+from schemas import PaperCreate
+from normalization import author_name_key, venue_name_key, normalize_doi, paper_title_key
+from crud import hydrate_papers
+from result_cache import bump_data_version
+from bm25_index import bm25_enabled, index_paper
+from similarity_index import similarity_index, index_paper_similarity
+from duplicate_index import duplicate_index, index_paper_duplicates
+
+# 批次匯入時每個區塊的列數（每個區塊查詢、寫入並提交一次）
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+
+# 論文欄位（不含需解析為 ID 的作者與期刊/會議）
+PAPER_FIELDS = ["title", "abstract", "publication_year", "doi", "citation_count", "keywords", "url"]
+
+def resolve_authors(db: Session, names: Iterable[str]) -> Dict[str, int]:
+    """一次查出整個區塊的作者，不存在者以 INSERT ... ON CONFLICT 批次建立；回傳 name_key -> 作者 id"""
+    wanted: Dict[str, str] = {}
+    for name in names:
+        name = " ".join(name.split())
+        name_key = author_name_key(name)
+        if name_key:
+            wanted.setdefault(name_key, name[:255])
+    if not wanted:
+        return {}
+
+    ids = dict(db.execute(select(Author.name_key, Author.id).where(Author.name_key.in_(wanted))).all())
+    # 依鍵排序插入，讓併發的匯入以相同順序取得唯一索引上的鎖
+    missing = [{"name": wanted[key], "name_key": key} for key in sorted(wanted) if key not in ids]
+    if missing:
+        ids.update(db.execute(
+            pg_insert(Author).on_conflict_do_nothing(index_elements=[Author.name_key])
+            .returning(Author.name_key, Author.id),
+            missing
+        ).all())
+        # 衝突的列是被其他匯入同時建立的，再查一次
+        conflicted = [row["name_key"] for row in missing if row["name_key"] not in ids]
+        if conflicted:
+            ids.update(db.execute(select(Author.name_key, Author.id).where(Author.name_key.in_(conflicted))).all())
+    return ids
+
+def resolve_venues(db: Session, venues: Iterable[Tuple[str, str]]) -> Dict[str, int]:
+    """一次查出整個區塊的期刊/會議（名稱, 類型），不存在者批次建立；回傳 name_key -> 期刊/會議 id"""
+    wanted: Dict[str, Tuple[str, str]] = {}
+    for name, venue_type in venues:
+        name_key = venue_name_key(name)
+        if name_key:
+            wanted.setdefault(name_key, (name.strip()[:500], venue_type))
+    if not wanted:
+        return {}
+
+    ids = dict(db.execute(select(Venue.name_key, Venue.id).where(Venue.name_key.in_(wanted))).all())
+    missing = [
+        {"name": wanted[key][0], "name_key": key, "type": wanted[key][1]}
+        for key in sorted(wanted) if key not in ids
+    ]
+    if missing:
+        ids.update(db.execute(
+            pg_insert(Venue).on_conflict_do_nothing(index_elements=[Venue.name_key])
+            .returning(Venue.name_key, Venue.id),
+            missing
+        ).all())
+        conflicted = [row["name_key"] for row in missing if row["name_key"] not in ids]
+        if conflicted:
+            ids.update(db.execute(select(Venue.name_key, Venue.id).where(Venue.name_key.in_(conflicted))).all())
+    return ids
+
+def insert_papers(db: Session, values: List[Dict[str, Any]]) -> List[Tuple[Optional[int], Optional[str]]]:
+    """
+    以多列 INSERT 寫入整個區塊的論文，回傳每列的 (論文 id, 錯誤)。
+    整批違反約束（例如其他匯入同時寫入相同 DOI）或有列的資料不合欄位限制（例如標題、DOI 或 URL 超過長度）時，
+    改為逐列在 savepoint 中寫入，只讓出錯的列失敗。
+    使用 Core 的資料表 INSERT：ORM 的批次寫入會依值為 None 的欄位把區塊拆成許多小批次。
+    """
+    papers = Paper.__table__
+    try:
+        with db.begin_nested():
+            ids = db.execute(insert(papers).returning(papers.c.id, sort_by_parameter_order=True), values).scalars().all()
+        return [(paper_id, None) for paper_id in ids]
+    except (IntegrityError, DataError):
+        pass
+
+    results = []
+    for value in values:
+        try:
+            with db.begin_nested():
+                results.append((db.execute(insert(papers).returning(papers.c.id), value).scalar_one(), None))
+        except (IntegrityError, DataError) as e:
+            message = "數據重複" if "duplicate key" in str(e.orig) else f"創建論文失敗 - {e.orig}"
+            results.append((None, message))
+    return results
+
+def load_paper_keys(db: Session) -> Tuple[Dict[str, int], Dict[str, int]]:
+    """一次載入全部論文的標準化 DOI 與標題鍵，回傳 (doi_key -> 論文 id, title_key -> 論文 id)；同標題取 id 最小者"""
+    doi_ids = dict(db.execute(select(Paper.doi_key, Paper.id).where(Paper.doi_key.isnot(None))).all())
+    title_ids = dict(db.execute(
+        select(Paper.title_key, Paper.id).where(Paper.title_key != "").order_by(Paper.id.desc())
+    ).all())
+    return doi_ids, title_ids
+
+def validation_error(data: Dict[str, Any]) -> Optional[ValidationError]:
+    """以與 PaperCreate 相同的規則（例如年份範圍）驗證映射後的資料，回傳錯誤或 None"""
+    try:
+        PaperCreate(**{field: data.get(field) for field in PAPER_FIELDS if data.get(field) is not None})
+    except ValidationError as e:
+        return e
+    return None
+
+def indexes_enabled() -> bool:
+    """是否有需要以論文及其作者更新的行程內索引（BM25、相似論文或重複論文）"""
+    return bm25_enabled() or similarity_index.built or duplicate_index.built
+
+def import_chunk(db: Session, rows: List[Tuple[int, Dict[str, Any]]], keep_papers: bool = True) -> Tuple[List[int], List[Paper], List[str]]:
+    """
+    匯入一個區塊的論文資料（行號, 映射後的資料），整個區塊在單一交易中寫入並只提交一次，
+    回傳 (新論文 id, 新論文, 錯誤訊息)。個別列違反約束時只回滾該列的 savepoint；區塊失敗時作者與期刊/會議一併回滾。
+    映射後的資料以 'authors'（姓名列表）與 'venue'、'venue_type' 表示作者與期刊/會議。
+    keep_papers 為 False 且沒有需要更新的索引時不載入新論文及其關聯（新論文為空列表）。
+    """
+    errors: List[str] = []
+
+    # 1. 驗證欄位（與 PaperCreate 相同的規則，例如年份範圍）
+    valid: List[Tuple[int, Dict[str, Any]]] = []
+    for row_number, data in rows:
+        error = validation_error(data)
+        if error is None:
+            valid.append((row_number, data))
+        else:
+            errors.append(f"行 {row_number}: {error}")
+
+    # 2. 一次查詢比對整個區塊的 DOI 與標題，並排除區塊內彼此重複的列
+    doi_keys = {row_number: normalize_doi(data.get("doi")) for row_number, data in valid}
+    title_keys = {row_number: paper_title_key(data["title"]) for row_number, data in valid}
+    existing_dois = set(db.execute(
+        select(Paper.doi_key).where(Paper.doi_key.in_({key for key in doi_keys.values() if key}))
+    ).scalars())
+    existing_titles = set(db.execute(
+        select(Paper.title_key).where(Paper.title_key.in_({key for key in title_keys.values() if key}))
+    ).scalars())
+
+    accepted: List[Tuple[int, Dict[str, Any]]] = []
+    for row_number, data in valid:
+        doi_key, title_key = doi_keys[row_number], title_keys[row_number]
+        if doi_key and doi_key in existing_dois:
+            errors.append(f"行 {row_number}: DOI {data['doi']} 已存在")
+            continue
+        if title_key and title_key in existing_titles:
+            errors.append(f"行 {row_number}: 標題 '{data['title'][:50]}...' 已存在")
+            continue
+        if doi_key:
+            existing_dois.add(doi_key)
+        if title_key:
+            existing_titles.add(title_key)
+        accepted.append((row_number, data))
+    if not accepted:
+        db.commit()
+        return [], [], errors
+
+    # 3. 一次解析整個區塊的作者與期刊/會議（與論文同一個交易，依鍵排序插入避免併發匯入互相死鎖）
+    author_ids = resolve_authors(db, (name for _, data in accepted for name in data.get("authors") or []))
+    venue_ids = resolve_venues(db, (
+        (data["venue"], data.get("venue_type") or "journal") for _, data in accepted if data.get("venue")
+    ))
+
+    # 4. 多列寫入論文與作者關聯，整個區塊只提交一次
+    values = []
+    for row_number, data in accepted:
+        value = {field: data.get(field) for field in PAPER_FIELDS}
+        value["citation_count"] = value["citation_count"] or 0
+        value["title_key"] = title_keys[row_number]
+        value["doi_key"] = doi_keys[row_number] or None
+        value["venue_id"] = venue_ids.get(venue_name_key(data.get("venue"))) if data.get("venue") else None
+        value["document_type"] = "paper"
+        values.append(value)
+    inserted = insert_papers(db, values)
+
+    paper_ids = []
+    relations = []
+    for (row_number, data), (paper_id, error) in zip(accepted, inserted):
+        if paper_id is None:
+            errors.append(f"行 {row_number}: {error}")
+            continue
+        paper_ids.append(paper_id)
+        seen = set()
+        for order, name in enumerate(data.get("authors") or [], start=1):
+            author_id = author_ids.get(author_name_key(" ".join(name.split())))
+            if author_id is not None and author_id not in seen:
+                seen.add(author_id)
+                relations.append({"paper_id": paper_id, "author_id": author_id, "author_order": order})
+    if relations:
+        db.execute(insert(PaperAuthor.__table__), relations)
+    db.commit()
+    if not paper_ids:
+        return [], [], errors
+
+    bump_data_version()
+    if not keep_papers and not indexes_enabled():
+        return paper_ids, [], errors
+    papers = hydrate_papers(db, paper_ids)
+    for paper in papers:
+        index_paper(paper)
+        index_paper_similarity(paper)
+        index_paper_duplicates(paper)
+    return paper_ids, papers if keep_papers else [], errors
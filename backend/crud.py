@@ -1,19 +1,42 @@
-import unicodedata
-from sqlalchemy.orm import Session, joinedload, aliased
-from sqlalchemy import and_, desc, or_, func, text, exists, case
-from typing import List, Optional, Dict, Any
-from models import Paper, Author, PaperAuthor, Tag, PaperTag, Venue
+import json
+import os
+from sqlalchemy.orm import Session, joinedload, selectinload, aliased
+from sqlalchemy import and_, desc, or_, func, text, exists, case, tuple_, cast, Float, Integer, String, select, literal, null, union_all, delete, bindparam, any_
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.exc import IntegrityError
+from typing import List, Optional, Dict, Any, Tuple
+from models import Paper, Author, PaperAuthor, Tag, PaperTag, Venue, DuplicateScanRun, DuplicateCluster
 from schemas import (
     PaperCreate, PaperUpdate, AuthorCreate, TagCreate, VenueCreate, SearchFilters, 
-    ComplexSearchQuery, FilterGroup, FilterCondition
+    ComplexSearchQuery, FilterGroup, FilterCondition, DuplicateResolveRequest
+)
+from pagination import encode_cursor, decode_cursor, SORT_BY_YEAR, SORT_BY_RELEVANCE
+from result_cache import bump_data_version
+from normalization import author_name_key, venue_name_key, normalize_doi, paper_title_key
+from bm25_index import bm25_enabled, search_index, index_paper, remove_paper, BM25_MAX_CANDIDATES
+from similarity_index import similarity_index, paper_term_counts, index_paper_similarity, remove_paper_similarity
+from duplicate_index import (
+    duplicate_index, paper_signature, index_paper_duplicates, remove_paper_duplicates, DUPLICATE_INCLUDE_AUTHORS
+)
+from query_compiler import (
+    author_exists, tag_exists, compile_filter_group, offset_ids_statement, keyset_ids_statement
 )
 
+# 搜索結果總數不超過此值時回傳精確計數，超過時改用查詢規劃器的估計值
+EXACT_COUNT_THRESHOLD = int(os.getenv("SEARCH_EXACT_COUNT_THRESHOLD", "10000"))
+# 批次重複檢查每次最多的論文數
+DUPLICATE_CHECK_MAX_BATCH = 5000
+
 # Paper CRUD operations
-def check_doi_exists(db: Session, doi: str) -> bool:
-    """檢查DOI是否已存在"""
-    if not doi:
+def check_doi_exists(db: Session, doi: str, exclude_paper_id: Optional[int] = None) -> bool:
+    """檢查DOI是否已存在（以標準化 DOI 比對，走 doi_key 唯一索引）"""
+    doi_key = normalize_doi(doi)
+    if not doi_key:
         return False
-    return db.query(Paper).filter(Paper.doi == doi).first() is not None
+    query = db.query(Paper.id).filter(Paper.doi_key == doi_key)
+    if exclude_paper_id is not None:
+        query = query.filter(Paper.id != exclude_paper_id)
+    return query.first() is not None
 
 def create_paper(db: Session, paper: PaperCreate):
     # 檢查DOI是否已存在
@@ -23,9 +46,11 @@ def create_paper(db: Session, paper: PaperCreate):
     # 創建論文記錄
     db_paper = Paper(
         title=paper.title,
+        title_key=paper_title_key(paper.title),
         abstract=paper.abstract,
         publication_year=paper.publication_year,
         doi=paper.doi,
+        doi_key=normalize_doi(paper.doi) or None,
         isbn=paper.isbn,
         citation_count=paper.citation_count,
         venue_id=paper.venue_id,
@@ -34,45 +59,106 @@ def create_paper(db: Session, paper: PaperCreate):
         document_type=paper.document_type # 新增 document_type 欄位
     )
     db.add(db_paper)
-    db.commit()
-    db.refresh(db_paper)
+    # 只 flush 取得 id，論文與作者、標籤關聯在同一個交易中提交，失敗時不會留下沒有關聯的論文
+    db.flush()
     
-    # 添加作者關聯
+    # 添加作者關聯（新論文尚無關聯，只需略過重複的作者）
+    seen_authors = set()
     for i, author_id in enumerate(paper.author_ids):
-        # 檢查是否已存在相同的關聯
-        existing_relation = db.query(PaperAuthor).filter(
-            and_(PaperAuthor.paper_id == db_paper.id, PaperAuthor.author_id == author_id)
-        ).first()
-        
-        if not existing_relation:
-            paper_author = PaperAuthor(
-                paper_id=db_paper.id,
-                author_id=author_id,
-                author_order=i + 1
-            )
-            db.add(paper_author)
+        if author_id not in seen_authors:
+            seen_authors.add(author_id)
+            db.add(PaperAuthor(paper_id=db_paper.id, author_id=author_id, author_order=i + 1))
     
     # 添加標籤關聯
-    for tag_id in paper.tag_ids:
-        # 檢查是否已存在相同的關聯
-        existing_relation = db.query(PaperTag).filter(
-            and_(PaperTag.paper_id == db_paper.id, PaperTag.tag_id == tag_id)
-        ).first()
-        
-        if not existing_relation:
-            paper_tag = PaperTag(paper_id=db_paper.id, tag_id=tag_id)
-            db.add(paper_tag)
+    for tag_id in dict.fromkeys(paper.tag_ids):
+        db.add(PaperTag(paper_id=db_paper.id, tag_id=tag_id))
     
     db.commit()
+    bump_data_version()
     db.refresh(db_paper)
+    index_paper(db_paper)
+    index_paper_similarity(db_paper)
+    index_paper_duplicates(db_paper)
     return db_paper
 
 def get_papers(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(Paper).options(
+    rows = select_paper_ids(db, [], skip=skip, limit=limit)
+    return hydrate_papers(db, [row.id for row in rows])
+
+def get_papers_page(db: Session, cursor: Optional[str] = None, limit: int = 100):
+    """以游標分頁獲取論文列表（依年份新到舊）"""
+    return paginate_by_keyset(db, [], cursor, limit)
+
+def hydrate_papers(db: Session, paper_ids: List[int], scores: Optional[Dict[int, float]] = None) -> List[Paper]:
+    """第二階段：依 ID 批量載入論文及其關聯，並保持 ID 的順序"""
+    if not paper_ids:
+        return []
+    
+    # 作者與標籤以 selectin 批次載入，避免 authors × tags 的笛卡兒積
+    papers = db.query(Paper).options(
         joinedload(Paper.venue),
-        joinedload(Paper.authors).joinedload(PaperAuthor.author),
-        joinedload(Paper.tags).joinedload(PaperTag.tag)
-    ).offset(skip).limit(limit).all()
+        selectinload(Paper.authors).joinedload(PaperAuthor.author),
+        selectinload(Paper.tags).joinedload(PaperTag.tag)
+    ).filter(Paper.id.in_(paper_ids)).all()
+    
+    papers_by_id = {paper.id: paper for paper in papers}
+    ordered = []
+    for paper_id in paper_ids:
+        paper = papers_by_id.get(paper_id)
+        if paper is None:
+            continue
+        if scores is not None:
+            paper.score = scores.get(paper_id)
+        ordered.append(paper)
+    return ordered
+
+def select_paper_ids(db: Session, conditions: list, skip: int = 0, limit: int = 100, score=None):
+    """第一階段：只查詢符合條件的論文 ID（offset 分頁，依 id 或相關度排序）"""
+    columns = [Paper.id] if score is None else [Paper.id, score]
+    query = db.query(*columns)
+    if conditions:
+        query = query.filter(and_(*conditions))
+    if score is None:
+        query = query.order_by(Paper.id)
+    else:
+        query = query.order_by(desc(score), Paper.id)
+    return query.offset(skip).limit(limit).all()
+
+def paginate_by_keyset(db: Session, conditions: list, cursor: Optional[str], limit: int, score=None) -> Tuple[List[Paper], Optional[str]]:
+    """鍵集分頁：依 (publication_year, id) 或 (score, id) 由大到小排序，回傳 (論文, 下一頁游標)"""
+    if score is None:
+        sort = SORT_BY_YEAR
+        keys = (Paper.publication_year, Paper.id)
+    else:
+        sort = SORT_BY_RELEVANCE
+        keys = (score, Paper.id)
+    
+    query = db.query(keys[0], Paper.id)
+    if conditions:
+        query = query.filter(and_(*conditions))
+    
+    values = decode_cursor(cursor, sort)
+    if values is not None:
+        query = query.filter(tuple_(*keys) < tuple_(*values))
+    
+    # 多取一筆以判斷是否還有下一頁
+    rows = query.order_by(*[desc(key) for key in keys]).limit(limit + 1).all()
+    return keyset_page(db, rows, limit, sort)
+
+def keyset_page(db: Session, rows, limit: int, sort: str) -> Tuple[List[Paper], Optional[str]]:
+    """將 (排序鍵, id) 結果列（多取一筆）轉為 (論文, 下一頁游標)"""
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    scored = sort == SORT_BY_RELEVANCE
+    
+    next_cursor = None
+    if has_more and rows:
+        last_key, last_id = rows[-1]
+        next_cursor = encode_cursor(sort, [float(last_key) if scored else last_key, last_id])
+    
+    paper_ids = [paper_id for _, paper_id in rows]
+    scores = {paper_id: float(key) for key, paper_id in rows} if scored else None
+    return hydrate_papers(db, paper_ids, scores), next_cursor
 
 def get_paper(db: Session, paper_id: int):
     return db.query(Paper).options(
@@ -122,15 +208,24 @@ def count_papers_with_tag(db: Session, tag_name: str) -> int:
     """計算具有特定標籤的論文數量"""
     return db.query(Paper).join(PaperTag).join(Tag).filter(Tag.name == tag_name).count()
 
-def update_paper(db: Session, paper_id: int, paper: PaperUpdate):
+def update_paper(db: Session, paper_id: int, paper: PaperUpdate, commit: bool = True):
+    """更新論文；commit=False 時只 flush，由呼叫者在同一個交易中提交並更新搜索索引"""
     db_paper = db.query(Paper).filter(Paper.id == paper_id).first()
     if not db_paper:
         return None
     
+    if paper.doi and check_doi_exists(db, paper.doi, exclude_paper_id=paper_id):
+        raise ValueError(f"DOI '{paper.doi}' 已存在")
+
     # 更新基本字段
-    for field, value in paper.model_dump(exclude_unset=True).items():
+    updates = paper.model_dump(exclude_unset=True)
+    for field, value in updates.items():
         if field not in ['author_ids', 'tag_ids'] and value is not None:
             setattr(db_paper, field, value)
+    # 只在更新 DOI 時重算 doi_key：回填時與其他論文衝突的舊資料 doi_key 保持 NULL，更新其他欄位不應觸發唯一索引
+    if updates.get('doi') is not None:
+        db_paper.doi_key = normalize_doi(db_paper.doi) or None
+    db_paper.title_key = paper_title_key(db_paper.title)
     
     # 更新作者關聯
     if paper.author_ids is not None:
@@ -166,8 +261,22 @@ def update_paper(db: Session, paper_id: int, paper: PaperUpdate):
                 paper_tag = PaperTag(paper_id=paper_id, tag_id=tag_id)
                 db.add(paper_tag)
     
+    try:
+        db.flush()
+    except IntegrityError as e:
+        # 檢查後其他請求同時寫入相同 DOI 時由 doi_key 唯一索引擋下
+        db.rollback()
+        if "idx_papers_doi_key" in str(e.orig):
+            raise ValueError(f"DOI '{paper.doi}' 已存在")
+        raise
+    if not commit:
+        return db_paper
     db.commit()
+    bump_data_version()
     db.refresh(db_paper)
+    index_paper(db_paper)
+    index_paper_similarity(db_paper)
+    index_paper_duplicates(db_paper)
     return db_paper
 
 def delete_paper(db: Session, paper_id: int):
@@ -175,20 +284,25 @@ def delete_paper(db: Session, paper_id: int):
     if not db_paper:
         return False
     
-    db.delete(db_paper)
+    # 作者、標籤與引用關聯由資料庫的 ON DELETE CASCADE 一併刪除
+    db.execute(delete(Paper).where(Paper.id == paper_id))
     db.commit()
+    bump_data_version()
+    remove_paper(paper_id)
+    remove_paper_similarity(paper_id)
+    remove_paper_duplicates(paper_id)
     return True
 
-def search_papers(db: Session, filters: SearchFilters, skip: int = 0, limit: int = 100):
-    """多條件搜索論文"""
-    query = db.query(Paper).options(
-        joinedload(Paper.venue),
-        joinedload(Paper.authors).joinedload(PaperAuthor.author),
-        joinedload(Paper.tags).joinedload(PaperTag.tag)
-    )
-    
+def build_search_conditions(filters: SearchFilters):
+    """根據搜索條件構建只涉及 papers 表的條件，回傳 (條件列表, 全文查詢表達式)"""
     conditions = []
     
+    # 加權全文搜索（使用預先計算的 search_vector 與 GIN 索引）
+    ts_query = None
+    if filters.keyword:
+        ts_query = func.websearch_to_tsquery('english', filters.keyword)
+        conditions.append(Paper.search_vector.op('@@')(ts_query))
+    
     # 標題關鍵字搜索（全文搜索）
     if filters.title_keyword:
         conditions.append(
@@ -203,10 +317,9 @@ def search_papers(db: Session, filters: SearchFilters, skip: int = 0, limit: int
     
     # 作者姓名搜索
     if filters.author_name:
-        query = query.join(PaperAuthor).join(Author)
-        conditions.append(
+        conditions.append(author_exists(
             func.to_tsvector('english', Author.name).match(filters.author_name)
-        )
+        ))
     
     # 年份範圍
     if filters.year_from:
@@ -226,160 +339,268 @@ def search_papers(db: Session, filters: SearchFilters, skip: int = 0, limit: int
     
     # 標籤搜索
     if filters.tags:
-        query = query.join(PaperTag).join(Tag)
-        conditions.append(Tag.name.in_(filters.tags))
+        conditions.append(tag_exists(Tag.name.in_(filters.tags)))
     
-    # 應用所有條件
+    return conditions, ts_query
+
+def relevance_score(filters: SearchFilters, ts_query):
+    """若要求依相關度排序，回傳 ts_rank_cd 分數表達式"""
+    if ts_query is not None and filters.sort_by == 'relevance':
+        # 轉為 double precision，確保分數經游標往返後仍可精確比較
+        return cast(func.ts_rank_cd(Paper.search_vector, ts_query), Float(precision=53)).label('score')
+    return None
+
+def search_papers(db: Session, filters: SearchFilters, skip: int = 0, limit: int = 100):
+    """多條件搜索論文"""
+    if filters.keyword and bm25_enabled():
+        return search_papers_bm25(db, filters, skip=skip, limit=limit)
+    conditions, ts_query = build_search_conditions(filters)
+    score = relevance_score(filters, ts_query)
+    rows = select_paper_ids(db, conditions, skip=skip, limit=limit, score=score)
+    
+    paper_ids = [row[0] for row in rows]
+    scores = {row[0]: float(row[1]) for row in rows} if score is not None else None
+    return hydrate_papers(db, paper_ids, scores)
+
+def filter_ranked_ids(db: Session, ranked: List[Tuple[int, float]], conditions: list, needed: int) -> List[Tuple[int, float]]:
+    """
+    依順序分批以資料庫檢查結構化條件，直到通過的候選達到 needed 筆或全部命中都已檢查；
+    第一批 BM25_MAX_CANDIDATES 筆，之後每批加倍，選擇性高的條件也能找到排在後面的命中。
+    """
+    allowed: List[Tuple[int, float]] = []
+    position, batch_size = 0, BM25_MAX_CANDIDATES
+    while position < len(ranked) and len(allowed) < needed:
+        batch = ranked[position:position + batch_size]
+        # 以單一陣列參數傳遞 id，批次再大也不會超過參數數量上限
+        ids = bindparam('candidate_ids', [paper_id for paper_id, _ in batch], type_=ARRAY(Integer))
+        passed = set(db.execute(select(Paper.id).where(Paper.id == any_(ids), *conditions)).scalars())
+        allowed.extend(item for item in batch if item[0] in passed)
+        position += batch_size
+        batch_size *= 2
+    return allowed
+
+def search_papers_bm25(db: Session, filters: SearchFilters, skip: int = 0, limit: int = 100):
+    """
+    以行程內 BM25 索引處理全文關鍵字，再以資料庫套用其餘的結構化條件。
+    結構化條件依排序順序分批套用於全部命中，結果與分頁和資料庫路徑一致；
+    只有全文比對本身（BM25 的切詞與 websearch_to_tsquery 的詞幹化）可能不同。
+    """
+    search_index.maybe_sync(db)
+    ranked = search_index.search(filters.keyword)
+    if not ranked:
+        return []
+    
+    if filters.sort_by != 'relevance':
+        ranked.sort(key=lambda item: item[0])
+    conditions, _ = build_search_conditions(filters.model_copy(update={"keyword": None}))
     if conditions:
-        query = query.filter(and_(*conditions))
-    
-    return query.distinct().offset(skip).limit(limit).all()
+        ranked = filter_ranked_ids(db, ranked, conditions, skip + limit)
+    ranked = ranked[skip:skip + limit]
+    scores = dict(ranked) if filters.sort_by == 'relevance' else None
+    return hydrate_papers(db, [paper_id for paper_id, _ in ranked], scores)
+
+def search_papers_page(db: Session, filters: SearchFilters, cursor: Optional[str] = None, limit: int = 100):
+    """多條件搜索論文（游標分頁）"""
+    conditions, ts_query = build_search_conditions(filters)
+    score = relevance_score(filters, ts_query)
+    return paginate_by_keyset(db, conditions, cursor, limit, score=score)
 
 def search_papers_complex(db: Session, query_data: ComplexSearchQuery, skip: int = 0, limit: int = 100):
     """處理複雜的 AND/OR 搜索查詢"""
-    query = db.query(Paper).options(
-        joinedload(Paper.venue),
-        joinedload(Paper.authors).joinedload(PaperAuthor.author),
-        joinedload(Paper.tags).joinedload(PaperTag.tag)
+    compiled, params = compile_filter_group(query_data.root)
+    stmt = compiled.statement('offset_ids', offset_ids_statement)
+    paper_ids = db.execute(stmt, {**params, 'skip': skip, 'limit': limit}).scalars().all()
+    return hydrate_papers(db, paper_ids)
+
+def search_papers_complex_page(db: Session, query_data: ComplexSearchQuery, cursor: Optional[str] = None, limit: int = 100):
+    """處理複雜的 AND/OR 搜索查詢（游標分頁）"""
+    compiled, params = compile_filter_group(query_data.root)
+    values = decode_cursor(cursor, SORT_BY_YEAR)
+    if values is None:
+        stmt = compiled.statement('keyset_ids', lambda conditions: keyset_ids_statement(conditions, False))
+    else:
+        stmt = compiled.statement('keyset_ids_after', lambda conditions: keyset_ids_statement(conditions, True))
+        params.update(cursor_year=values[0], cursor_id=values[1])
+    rows = db.execute(stmt, {**params, 'limit': limit + 1}).all()
+    return keyset_page(db, rows, limit, SORT_BY_YEAR)
+
+def estimate_row_count(db: Session, stmt, params: Optional[Dict[str, Any]] = None) -> int:
+    """以 EXPLAIN 取得查詢規劃器估計的結果列數（不實際執行查詢）"""
+    compiled = stmt.compile(dialect=db.get_bind().dialect)
+    state = compiled.construct_expanded_state(params or {})
+    plan = db.connection().exec_driver_sql("EXPLAIN (FORMAT JSON) " + state.statement, state.parameters).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+def count_search_results(db: Session, conditions: list, params: Optional[Dict[str, Any]] = None) -> Tuple[int, bool]:
+    """
+    計算搜索結果總數，回傳 (總數, 是否為精確值)。
+    只掃描到門檻加一筆為止；超過門檻時以規劃器估計值回傳（至少為已計數的筆數）。
+    """
+    matched = select(Paper.id).where(*conditions)
+    capped = select(func.count()).select_from(matched.limit(EXACT_COUNT_THRESHOLD + 1).subquery())
+    count = db.execute(capped, params or {}).scalar()
+    if count <= EXACT_COUNT_THRESHOLD:
+        return count, True
+    return max(count, estimate_row_count(db, matched, params)), False
+
+def count_search_papers(db: Session, filters: SearchFilters) -> Tuple[int, bool]:
+    """多條件搜索的結果總數"""
+    conditions, _ = build_search_conditions(filters)
+    return count_search_results(db, conditions)
+
+def count_search_papers_complex(db: Session, query_data: ComplexSearchQuery) -> Tuple[int, bool]:
+    """複雜 AND/OR 搜索的結果總數"""
+    compiled, params = compile_filter_group(query_data.root)
+    return count_search_results(db, compiled.conditions(), params)
+
+def faceted_search_statement(conditions: list, score=None, after_cursor: bool = False):
+    """
+    在單一語句中取得鍵集分頁的一頁論文 ID（多取一筆）與整個結果集的分面統計。
+    matched CTE 同時供分頁與統計使用：分頁列的 facet 為 'page'，以 sort_key 與 paper_id 回傳排序鍵與論文 id；
+    年份、期刊/會議、文件類型與總數以 GROUPING SETS 統計，標籤另以一段 UNION ALL 統計。
+    """
+    sort_key = Paper.publication_year if score is None else score
+    matched = (
+        select(Paper.id, Paper.publication_year, Paper.venue_id, Paper.document_type, sort_key.label('sort_key'))
+        .where(*conditions)
+        .cte('matched')
+    )
+    no_text = cast(null(), String)
+    no_count = cast(null(), Integer)
+    no_key = cast(null(), matched.c.sort_key.type)
+    
+    # 依 (排序鍵, id) 由大到小的一頁
+    keys = (matched.c.sort_key, matched.c.id)
+    page_where = []
+    if after_cursor:
+        cursor_type = Integer if score is None else Float(precision=53)
+        page_where.append(tuple_(*keys) < tuple_(
+            bindparam('cursor_key', type_=cursor_type),
+            bindparam('cursor_id', type_=Integer)
+        ))
+    page = (
+        select(*keys)
+        .where(*page_where)
+        .order_by(*[desc(key) for key in keys])
+        .limit(bindparam('limit', type_=Integer))
+        .subquery('page')
+    )
+    paged = select(
+        literal('page').label('facet'), no_text.label('value'), no_text.label('label'), no_text.label('color'),
+        no_count.label('count'), page.c.sort_key, page.c.id.label('paper_id')
     )
     
-    # 檢查是否需要 JOIN
-    needs_author_join = check_needs_author_join(query_data.root)
-    needs_tag_join = check_needs_tag_join(query_data.root)
-    
-    # 添加必要的 JOIN
-    if needs_author_join:
-        query = query.join(PaperAuthor).join(Author)
-    
-    if needs_tag_join:
-        query = query.join(PaperTag).join(Tag)
-    
-    # 構建查詢條件
-    conditions = build_query_conditions(db, query_data.root)
-    
-    if conditions is not None:
-        query = query.filter(conditions)
-    
-    return query.distinct().offset(skip).limit(limit).all()
-
-def check_needs_author_join(group: FilterGroup) -> bool:
-    """檢查是否需要 author JOIN"""
-    for condition in group.conditions:
-        if condition.field == 'author_name':
-            return True
-    for subgroup in group.groups:
-        if check_needs_author_join(subgroup):
-            return True
-    return False
-
-def check_needs_tag_join(group: FilterGroup) -> bool:
-    """檢查是否需要 tag JOIN"""
-    for condition in group.conditions:
-        if condition.field == 'tags':
-            return True
-    for subgroup in group.groups:
-        if check_needs_tag_join(subgroup):
-            return True
-    return False
-
-def build_query_conditions(db: Session, group: FilterGroup):
-    """遞歸構建查詢條件"""
-    conditions = []
-    
-    # 處理當前群組的條件
-    for condition in group.conditions:
-        db_condition = build_single_condition(condition)
-        if db_condition is not None:
-            conditions.append(db_condition)
-    
-    # 遞歸處理子群組
-    for subgroup in group.groups:
-        subgroup_condition = build_query_conditions(db, subgroup)
-        if subgroup_condition is not None:
-            conditions.append(subgroup_condition)
-    
-    if not conditions:
-        return None
-    
-    # 根據操作符組合條件
-    if group.operator == 'AND':
-        return and_(*conditions)
-    else:  # OR
-        return or_(*conditions)
-
-def build_single_condition(condition: FilterCondition):
-    """構建單個搜索條件"""
-    field = condition.field
-    operator = condition.operator
-    value = condition.value
-    
-    # 如果值為空，跳過此條件
-    if not value or (isinstance(value, str) and value.strip() == ''):
-        return None
+    # 年份、期刊/會議、文件類型與總數以 GROUPING SETS 一次統計
+    grouped = (
+        select(
+            case(
+                (func.grouping(matched.c.publication_year) == 0, 'year'),
+                (func.grouping(matched.c.venue_id) == 0, 'venue'),
+                (func.grouping(matched.c.document_type) == 0, 'document_type'),
+                else_='total'
+            ).label('facet'),
+            func.coalesce(
+                cast(matched.c.publication_year, String),
+                cast(matched.c.venue_id, String),
+                matched.c.document_type
+            ).label('value'),
+            Venue.name.label('label'),
+            no_text.label('color'),
+            func.count().label('count'),
+            no_key.label('sort_key'),
+            no_count.label('paper_id')
+        )
+        .select_from(matched.outerjoin(Venue, Venue.id == matched.c.venue_id))
+        .group_by(func.grouping_sets(
+            tuple_(matched.c.publication_year),
+            tuple_(matched.c.venue_id, Venue.name),
+            tuple_(matched.c.document_type),
+            tuple_()
+        ))
+    )
     
-    try:
-        if field == 'title_keyword':
-            if operator == 'contains':
-                return Paper.title.ilike(f'%{str(value)}%')
-            elif operator == 'equals':
-                return Paper.title == str(value)
-                
-        elif field == 'abstract_keyword':
-            if operator == 'contains':
-                return Paper.abstract.ilike(f'%{str(value)}%')
-            elif operator == 'equals':
-                return Paper.abstract == str(value)
-                
-        elif field == 'author_name':
-            if operator == 'contains':
-                return Author.name.ilike(f'%{str(value)}%')
-            elif operator == 'equals':
-                return Author.name == str(value)
-                
-        elif field == 'year_from':
-            if operator in ['greater_than', 'greater_equal']:
-                return Paper.publication_year >= int(value)
-            elif operator == 'equals':
-                return Paper.publication_year == int(value)
-                
-        elif field == 'year_to':
-            if operator in ['less_than', 'less_equal']:
-                return Paper.publication_year <= int(value)
-            elif operator == 'equals':
-                return Paper.publication_year == int(value)
-                
-        elif field == 'min_citations':
-            if operator in ['greater_than', 'greater_equal']:
-                return Paper.citation_count >= int(value)
-            elif operator == 'equals':
-                return Paper.citation_count == int(value)
-                
-        elif field == 'max_citations':
-            if operator in ['less_than', 'less_equal']:
-                return Paper.citation_count <= int(value)
-            elif operator == 'equals':
-                return Paper.citation_count == int(value)
-                
-        elif field == 'venue_id':
-            if operator == 'equals':
-                return Paper.venue_id == int(value)
-                
-        elif field == 'tags':
-            if operator == 'in' and isinstance(value, list):
-                return Tag.name.in_(value)
-            elif operator == 'equals':
-                tag_value = value[0] if isinstance(value, list) else str(value)
-                return Tag.name == tag_value
-                
-    except (ValueError, TypeError):
-        # 如果類型轉換失敗，跳過此條件
-        pass
+    # 標籤分布（paper_tags 上有唯一約束，計數不會重複）
+    tagged = (
+        select(
+            literal('tag').label('facet'),
+            cast(Tag.id, String).label('value'),
+            Tag.name.label('label'),
+            Tag.color.label('color'),
+            func.count().label('count'),
+            no_key.label('sort_key'),
+            no_count.label('paper_id')
+        )
+        .select_from(
+            matched.join(PaperTag, PaperTag.paper_id == matched.c.id).join(Tag, Tag.id == PaperTag.tag_id)
+        )
+        .group_by(Tag.id, Tag.name, Tag.color)
+    )
     
-    return None
+    return union_all(paged, grouped, tagged)
+
+def collect_facets(rows, facet_limit: int = 20) -> Dict[str, Any]:
+    """將分面統計列轉為各欄位的分布"""
+    facets = {"total": 0, "publication_year": [], "venue": [], "document_type": [], "tag": []}
+    for row in rows:
+        if row.facet == 'total':
+            facets["total"] = row.count
+        elif row.facet == 'year':
+            facets["publication_year"].append({"value": int(row.value), "count": row.count})
+        elif row.facet == 'venue':
+            value = int(row.value) if row.value is not None else None
+            facets["venue"].append({"value": value, "label": row.label, "count": row.count})
+        elif row.facet == 'document_type':
+            facets["document_type"].append({"value": row.value, "count": row.count})
+        else:
+            facets["tag"].append({"value": int(row.value), "label": row.label, "color": row.color, "count": row.count})
+    
+    facets["publication_year"].sort(key=lambda item: item["value"])
+    for name in ("venue", "document_type", "tag"):
+        facets[name].sort(key=lambda item: item["count"], reverse=True)
+        facets[name] = facets[name][:facet_limit]
+    return facets
+
+def faceted_page(db: Session, stmt, params: Dict[str, Any], limit: int, sort: str):
+    """執行 faceted_search_statement，回傳 (論文, 下一頁游標, 分面統計)；分頁的論文另以 hydrate_papers 載入關聯"""
+    rows = db.execute(stmt, {**params, 'limit': limit + 1}).all()
+    page = sorted(((row.sort_key, row.paper_id) for row in rows if row.facet == 'page'), reverse=True)
+    papers, next_cursor = keyset_page(db, page, limit, sort)
+    return papers, next_cursor, collect_facets(row for row in rows if row.facet != 'page')
+
+def search_papers_faceted(db: Session, filters: SearchFilters, cursor: Optional[str] = None, limit: int = 100):
+    """多條件搜索論文，並附上結果集的分面統計（一頁的 ID 與統計在同一個查詢中取得）"""
+    conditions, ts_query = build_search_conditions(filters)
+    score = relevance_score(filters, ts_query)
+    sort = SORT_BY_YEAR if score is None else SORT_BY_RELEVANCE
+    values = decode_cursor(cursor, sort)
+    params = {}
+    if values is not None:
+        params.update(cursor_key=values[0], cursor_id=values[1])
+    stmt = faceted_search_statement(conditions, score, after_cursor=values is not None)
+    return faceted_page(db, stmt, params, limit, sort)
+
+def search_papers_complex_faceted(db: Session, query_data: ComplexSearchQuery, cursor: Optional[str] = None, limit: int = 100):
+    """處理複雜的 AND/OR 搜索查詢，並附上結果集的分面統計（一頁的 ID 與統計在同一個查詢中取得）"""
+    compiled, params = compile_filter_group(query_data.root)
+    values = decode_cursor(cursor, SORT_BY_YEAR)
+    if values is None:
+        stmt = compiled.statement('faceted_ids', faceted_search_statement)
+    else:
+        stmt = compiled.statement('faceted_ids_after', lambda conditions: faceted_search_statement(conditions, after_cursor=True))
+        params.update(cursor_key=values[0], cursor_id=values[1])
+    return faceted_page(db, stmt, params, limit, SORT_BY_YEAR)
 
 # Author CRUD operations
 def create_author(db: Session, author: AuthorCreate):
-    db_author = Author(**author.model_dump())
+    """建立作者；標準化姓名已存在時拋出 ValueError"""
+    name_key = author_name_key(author.name) or None
+    if name_key:
+        existing = db.query(Author).filter(Author.name_key == name_key).first()
+        if existing:
+            raise ValueError(f"作者 '{existing.name}' 已存在（id={existing.id}）")
+    db_author = Author(**author.model_dump(), name_key=name_key)
     db.add(db_author)
     db.commit()
     db.refresh(db_author)
@@ -407,7 +628,13 @@ def get_tag(db: Session, tag_id: int):
 
 # Venue CRUD operations
 def create_venue(db: Session, venue: VenueCreate):
-    db_venue = Venue(**venue.model_dump())
+    """建立期刊/會議；標準化名稱已存在時拋出 ValueError"""
+    name_key = venue_name_key(venue.name) or None
+    if name_key:
+        existing = db.query(Venue).filter(Venue.name_key == name_key).first()
+        if existing:
+            raise ValueError(f"期刊/會議 '{existing.name}' 已存在（id={existing.id}）")
+    db_venue = Venue(**venue.model_dump(), name_key=name_key)
     db.add(db_venue)
     db.commit()
     db.refresh(db_venue)
@@ -468,6 +695,7 @@ def batch_add_tags_to_papers(db: Session, paper_ids: List[int], tag_ids: List[in
                 errors.append(f"論文 {paper_id} 添加標籤失敗: {str(e)}")
         
         db.commit()
+        bump_data_version()
         
     except Exception as e:
         db.rollback()
@@ -510,6 +738,7 @@ def batch_remove_tags_from_papers(db: Session, paper_ids: List[int], tag_ids: Li
                 errors.append(f"論文 {paper_id} 移除標籤失敗: {str(e)}")
         
         db.commit()
+        bump_data_version()
         
     except Exception as e:
         db.rollback()
@@ -525,65 +754,114 @@ def batch_remove_tags_from_papers(db: Session, paper_ids: List[int], tag_ids: Li
         errors=errors
     ) 
 
-def normalize_text(s: str):
-    if not s:
-        return ""
-    s = unicodedata.normalize("NFKC", s)
-    s = s.replace("\u00a0", " ").replace("\u202f", " ")
-    s = " ".join(s.split())  # 移除多餘空白
-    return s.strip().lower()
-
-
 def search_related_papers(db: Session, paper_data: PaperCreate, limit: int = 5):
     # (0) DOI 精準匹配
-    if paper_data.doi:
-        doi_clean = paper_data.doi.strip().lower()
+    doi_key = normalize_doi(paper_data.doi)
+    if doi_key:
         exists = (
             db.query(Paper)
-            .filter(func.lower(Paper.doi) == doi_clean)
+            .filter(Paper.doi_key == doi_key)
             .options(joinedload(Paper.authors).joinedload(PaperAuthor.author))
             .first()
         )
         if exists:
             return [exists]
 
-    # (1) 標題比對
-    title_norm = normalize_text(paper_data.title)
-
-    # 使用 PostgreSQL LOWER + REPLACE 清洗資料庫字串
-    db_title_norm = func.lower(
-        func.replace(
-            func.replace(
-                func.replace(Paper.title, "\u00a0", " "),
-                "\u202f",
-                " "
-            ),
-            "  ",
-            " "
-        )
-    )
-
-    # 精準匹配（將雙空白變單空白）
-    exact = db_title_norm == title_norm
-
-    # 模糊匹配（不再用 %lowered_title%）
-    fuzzy = db_title_norm.ilike(f"%{title_norm[:20]}%")  # 前20字強匹配
-
-    query = (
-        db.query(Paper)
-        .options(joinedload(Paper.authors).joinedload(PaperAuthor.author))
-        .filter(or_(exact, fuzzy))
-    )
-
-    results = query.distinct().limit(limit).all()
-
-    if results:
-        return results
+    # (1) 標題近似重複比對（MinHash/LSH 索引，可容忍詞序調換與少量修改）
+    duplicate_index.ensure_ready(db)
+    author_names = None
+    if DUPLICATE_INCLUDE_AUTHORS and paper_data.author_ids:
+        author_names = list(db.execute(select(Author.name).where(Author.id.in_(paper_data.author_ids))).scalars())
+    ranked = duplicate_index.query(paper_signature(paper_data.title, author_names), limit)
 
     # 找不到時回傳空陣列，直接建立新資料
-    return []
-
-def merge_paper(db: Session, paper_id: int, new_data: PaperCreate, mode: str, fields: List[str] = None):
+    return hydrate_papers(db, [paper_id for paper_id, _ in ranked], dict(ranked))
+
+def check_duplicates_batch(db: Session, papers: List[PaperCreate], limit: int = 5) -> List[Dict[str, Any]]:
+    """
+    批次檢查待匯入論文是否已存在：一次查詢比對所有標準化 DOI、一次查詢比對所有標題鍵，
+    其餘再以記憶體中的 MinHash/LSH 索引找近似標題；同一批次內的重複也一併標出
+    """
+    if len(papers) > DUPLICATE_CHECK_MAX_BATCH:
+        raise ValueError(f"每次最多檢查 {DUPLICATE_CHECK_MAX_BATCH} 篇論文")
+    doi_keys = [normalize_doi(paper.doi) for paper in papers]
+    title_keys = [paper_title_key(paper.title) for paper in papers]
+
+    doi_matches: Dict[str, int] = {}
+    wanted_dois = {key for key in doi_keys if key}
+    if wanted_dois:
+        doi_matches = dict(db.execute(
+            select(Paper.doi_key, Paper.id).where(Paper.doi_key.in_(wanted_dois))
+        ).all())
+
+    title_matches: Dict[str, List[int]] = {}
+    wanted_titles = {key for key in title_keys if key}
+    if wanted_titles:
+        rows = db.execute(
+            select(Paper.title_key, Paper.id).where(Paper.title_key.in_(wanted_titles)).order_by(Paper.id)
+        ).all()
+        for title_key, paper_id in rows:
+            title_matches.setdefault(title_key, []).append(paper_id)
+
+    author_names: Dict[int, str] = {}
+    if DUPLICATE_INCLUDE_AUTHORS:
+        author_ids = {author_id for paper in papers for author_id in paper.author_ids or []}
+        if author_ids:
+            author_names = dict(db.execute(select(Author.id, Author.name).where(Author.id.in_(author_ids))).all())
+    duplicate_index.ensure_ready(db)
+
+    results = []
+    first_by_doi: Dict[str, int] = {}
+    first_by_title: Dict[str, int] = {}
+    for index, paper in enumerate(papers):
+        doi_key, title_key = doi_keys[index], title_keys[index]
+        result = {"index": index, "status": "new", "candidate_ids": [], "batch_duplicate_of": None}
+        if doi_key and doi_key in doi_matches:
+            result.update(status="doi_match", candidate_ids=[doi_matches[doi_key]])
+        elif title_key and title_key in title_matches:
+            result.update(status="title_match", candidate_ids=title_matches[title_key][:limit])
+        else:
+            names = [author_names[author_id] for author_id in paper.author_ids or [] if author_id in author_names]
+            ranked = duplicate_index.query(paper_signature(paper.title, names or None), limit)
+            if ranked:
+                result.update(status="similar", candidate_ids=[paper_id for paper_id, _ in ranked])
+
+        if doi_key and doi_key in first_by_doi:
+            result["batch_duplicate_of"] = first_by_doi[doi_key]
+        elif title_key and title_key in first_by_title:
+            result["batch_duplicate_of"] = first_by_title[title_key]
+        if doi_key:
+            first_by_doi.setdefault(doi_key, index)
+        if title_key:
+            first_by_title.setdefault(title_key, index)
+        results.append(result)
+    return results
+
+def find_duplicate_papers(db: Session, paper_id: int, limit: int = 5):
+    """找出與指定論文標題近似重複的其他論文；論文不存在時回傳 None"""
+    duplicate_index.ensure_ready(db)
+    signature = duplicate_index.signatures.get(paper_id)
+    if signature is None:
+        paper = db.get(Paper, paper_id)
+        if paper is None:
+            return None
+        signature = paper_signature(paper.title, [relation.author.name for relation in paper.authors])
+    ranked = duplicate_index.query(signature, limit, exclude=paper_id)
+    return hydrate_papers(db, [duplicate_id for duplicate_id, _ in ranked], dict(ranked))
+
+def find_similar_papers(db: Session, paper_id: Optional[int] = None, paper_data: Optional[PaperCreate] = None, limit: int = 10):
+    """以標題、摘要與關鍵字的 TF-IDF 餘弦相似度，找出與指定論文（或尚未入庫的論文資料）最相似的論文"""
+    similarity_index.ensure_ready(db)
+    if paper_id is not None:
+        ranked = similarity_index.similar_to_paper(paper_id, limit)
+        if ranked is None:
+            return None
+    else:
+        counts = paper_term_counts(paper_data.title, paper_data.abstract, paper_data.keywords)
+        ranked = similarity_index.similar_to_documents([counts], limit)[0]
+    return hydrate_papers(db, [similar_id for similar_id, _ in ranked], dict(ranked))
+
+def merge_paper(db: Session, paper_id: int, new_data: PaperCreate, mode: str, fields: List[str] = None, commit: bool = True):
     paper = db.query(Paper).filter(Paper.id == paper_id).first()
     if not paper:
         return None
@@ -594,7 +872,7 @@ def merge_paper(db: Session, paper_id: int, new_data: PaperCreate, mode: str, fi
     if mode == "overwrite":
         # 直接覆蓋（完整更新）
         update = PaperUpdate(**new_data.model_dump())
-        return update_paper(db, paper_id, update)
+        return update_paper(db, paper_id, update, commit)
 
     if mode == "merge_fields":
         if not fields:
@@ -608,6 +886,135 @@ def merge_paper(db: Session, paper_id: int, new_data: PaperCreate, mode: str, fi
                 update_dict[f] = raw[f]
 
         update = PaperUpdate(**update_dict)
-        return update_paper(db, paper_id, update)
+        return update_paper(db, paper_id, update, commit)
+
+    return paper
+
+# Duplicate cluster operations
+def get_duplicate_clusters(db: Session, run_id: Optional[int] = None, status: Optional[str] = 'open', skip: int = 0, limit: int = 100):
+    """列出重複論文群組（預設為最近一次完成的掃描），成員附上論文的標題、DOI 與年份"""
+    if run_id is None:
+        run_id = db.execute(
+            select(DuplicateScanRun.id)
+            .where(DuplicateScanRun.status == 'completed')
+            .order_by(desc(DuplicateScanRun.id))
+            .limit(1)
+        ).scalar()
+        if run_id is None:
+            return []
+    
+    query = db.query(DuplicateCluster).options(selectinload(DuplicateCluster.members)).filter(DuplicateCluster.run_id == run_id)
+    if status:
+        query = query.filter(DuplicateCluster.status == status)
+    clusters = query.order_by(desc(DuplicateCluster.size), DuplicateCluster.id).offset(skip).limit(limit).all()
+    
+    paper_ids = {member.paper_id for cluster in clusters for member in cluster.members}
+    papers = {
+        row.id: row for row in db.execute(
+            select(Paper.id, Paper.title, Paper.doi, Paper.publication_year).where(Paper.id.in_(paper_ids))
+        )
+    } if paper_ids else {}
+    
+    results = []
+    for cluster in clusters:
+        members = []
+        for member in cluster.members:
+            paper = papers.get(member.paper_id)
+            members.append({
+                "paper_id": member.paper_id,
+                "score": member.score,
+                "match": member.match,
+                "title": paper.title if paper else None,
+                "doi": paper.doi if paper else None,
+                "publication_year": paper.publication_year if paper else None,
+            })
+        results.append({
+            "id": cluster.id,
+            "run_id": cluster.run_id,
+            "size": cluster.size,
+            "status": cluster.status,
+            "kept_paper_id": cluster.kept_paper_id,
+            "members": members,
+        })
+    return results
+
+def paper_to_create(paper: Paper) -> PaperCreate:
+    """將既有論文轉為 merge_paper 使用的 PaperCreate（資料來自資料庫，略過欄位驗證）"""
+    return PaperCreate.model_construct(
+        title=paper.title,
+        abstract=paper.abstract,
+        publication_year=paper.publication_year,
+        document_type=paper.document_type,
+        doi=paper.doi,
+        isbn=paper.isbn,
+        citation_count=paper.citation_count,
+        venue_id=paper.venue_id,
+        keywords=paper.keywords,
+        url=paper.url,
+        author_ids=[relation.author_id for relation in sorted(paper.authors, key=lambda r: r.author_order)],
+        tag_ids=[relation.tag_id for relation in paper.tags]
+    )
 
-    return paper
\ No newline at end of file
+def resolve_duplicate_clusters(db: Session, requests: List[DuplicateResolveRequest]) -> List[Dict[str, Any]]:
+    """
+    批次處理重複群組：保留一篇論文，其餘成員先刪除再以 merge_paper 合併進保留的論文。
+    每個群組在一個交易中完成，合併失敗時整個群組回滾，重複論文不會被刪除，群組維持 open。
+    """
+    results = []
+    for request in requests:
+        cluster = db.query(DuplicateCluster).options(selectinload(DuplicateCluster.members)).filter(
+            DuplicateCluster.id == request.cluster_id
+        ).first()
+        if cluster is None or cluster.status != 'open':
+            results.append({"cluster_id": request.cluster_id, "status": "skipped", "message": "群組不存在或已處理"})
+            continue
+        
+        member_ids = [member.paper_id for member in cluster.members]
+        existing = set(db.execute(select(Paper.id).where(Paper.id.in_(member_ids))).scalars())
+        keep_id = request.keep_paper_id if request.keep_paper_id is not None else min(existing, default=None)
+        if keep_id is None or keep_id not in existing or keep_id not in member_ids:
+            results.append({"cluster_id": request.cluster_id, "status": "skipped", "message": "保留的論文不在此群組中或已被刪除"})
+            continue
+        
+        removed = []
+        try:
+            for paper_id in member_ids:
+                if paper_id == keep_id or paper_id not in existing:
+                    continue
+                duplicate = get_paper(db, paper_id)
+                data = paper_to_create(duplicate)
+                # 在同一個交易中先刪除重複論文（尚未提交），合併其 DOI 時不會違反唯一約束
+                db.execute(delete(Paper).where(Paper.id == paper_id))
+                merge_paper(db, keep_id, data, request.mode, request.fields, commit=False)
+                removed.append(paper_id)
+            
+            cluster.status = 'resolved'
+            cluster.kept_paper_id = keep_id
+            cluster.resolved_at = func.now()
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            results.append({"cluster_id": request.cluster_id, "status": "failed", "message": str(e)})
+            continue
+        
+        bump_data_version()
+        for paper_id in removed:
+            remove_paper(paper_id)
+            remove_paper_similarity(paper_id)
+            remove_paper_duplicates(paper_id)
+        kept = get_paper(db, keep_id)
+        index_paper(kept)
+        index_paper_similarity(kept)
+        index_paper_duplicates(kept)
+        results.append({"cluster_id": request.cluster_id, "status": "resolved", "kept_paper_id": keep_id, "removed_paper_ids": removed})
+    return results
+
+def dismiss_duplicate_cluster(db: Session, cluster_id: int) -> bool:
+    """將群組標記為非重複"""
+    cluster = db.query(DuplicateCluster).filter(DuplicateCluster.id == cluster_id).first()
+    if not cluster:
+        return False
+    cluster.status = 'dismissed'
+    cluster.resolved_at = func.now()
+    db.commit()
+    return True
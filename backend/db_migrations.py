@@ -0,0 +1,189 @@
+from typing import Dict
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from normalization import author_name_key, venue_name_key, normalize_doi, paper_title_key
+
+# 遷移鎖的 ID，避免多個 worker 同時執行 DDL
+MIGRATION_LOCK_ID = 7310021
+
+# 冪等的結構升級語句，讓舊資料庫與 database/init.sql 保持一致
+MIGRATIONS = [
+    # 加權全文搜索向量
+    "ALTER TABLE papers ADD COLUMN IF NOT EXISTS search_vector TSVECTOR",
+    """
+    CREATE OR REPLACE FUNCTION papers_search_vector_update()
+    RETURNS TRIGGER AS $$
+    BEGIN
+        IF TG_OP = 'INSERT'
+           OR NEW.title IS DISTINCT FROM OLD.title
+           OR NEW.keywords IS DISTINCT FROM OLD.keywords
+           OR NEW.abstract IS DISTINCT FROM OLD.abstract
+           OR NEW.search_vector IS NULL THEN
+            NEW.search_vector :=
+                setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+                setweight(to_tsvector('english', coalesce(array_to_string(NEW.keywords, ' '), '')), 'B') ||
+                setweight(to_tsvector('english', coalesce(NEW.abstract, '')), 'C');
+        END IF;
+        RETURN NEW;
+    END;
+    $$ language 'plpgsql'
+    """,
+    "DROP TRIGGER IF EXISTS papers_search_vector_trigger ON papers",
+    """
+    CREATE TRIGGER papers_search_vector_trigger BEFORE INSERT OR UPDATE ON papers
+        FOR EACH ROW EXECUTE FUNCTION papers_search_vector_update()
+    """,
+    # 回填舊資料（觸發器會在 search_vector 為 NULL 時重新計算）
+    "UPDATE papers SET search_vector = NULL WHERE search_vector IS NULL",
+    "CREATE INDEX IF NOT EXISTS idx_papers_search_vector ON papers USING gin(search_vector)",
+    # 游標分頁排序鍵
+    "CREATE INDEX IF NOT EXISTS idx_papers_year_id ON papers(publication_year, id)",
+    # 三元組索引，支援複雜搜索中的 contains（ILIKE '%...%'）與 equals
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS idx_papers_title_trgm ON papers USING gin(title gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS idx_papers_abstract_trgm ON papers USING gin(abstract gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS idx_authors_name_trgm ON authors USING gin(name gin_trgm_ops)",
+    # 重複論文掃描結果（成員不設指向 papers 的外鍵，掃描與寫入結果時不鎖定 papers）
+    """
+    CREATE TABLE IF NOT EXISTS duplicate_scan_runs (
+        id SERIAL PRIMARY KEY,
+        status VARCHAR(20) NOT NULL DEFAULT 'running',
+        started_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+        finished_at TIMESTAMP WITH TIME ZONE,
+        papers_scanned INTEGER DEFAULT 0,
+        clusters_found INTEGER DEFAULT 0,
+        error TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS duplicate_clusters (
+        id SERIAL PRIMARY KEY,
+        run_id INTEGER NOT NULL REFERENCES duplicate_scan_runs(id) ON DELETE CASCADE,
+        size INTEGER NOT NULL,
+        status VARCHAR(20) NOT NULL DEFAULT 'open',
+        kept_paper_id INTEGER,
+        resolved_at TIMESTAMP WITH TIME ZONE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS duplicate_cluster_members (
+        id SERIAL PRIMARY KEY,
+        cluster_id INTEGER NOT NULL REFERENCES duplicate_clusters(id) ON DELETE CASCADE,
+        paper_id INTEGER NOT NULL,
+        score DOUBLE PRECISION NOT NULL,
+        match VARCHAR(20) NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_duplicate_clusters_run_status ON duplicate_clusters(run_id, status)",
+    "CREATE INDEX IF NOT EXISTS idx_duplicate_cluster_members_cluster ON duplicate_cluster_members(cluster_id)",
+    # 作者標準化姓名鍵，供匯入時的查找與 ON CONFLICT 建立作者；回填見 backfill_author_name_keys
+    "ALTER TABLE authors ADD COLUMN IF NOT EXISTS name_key VARCHAR(255)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_authors_name_key ON authors(name_key)",
+    # 標準化 DOI，讓 'https://doi.org/10.1/X' 與 '10.1/x' 視為同一篇；回填見 backfill_paper_doi_keys
+    "ALTER TABLE papers ADD COLUMN IF NOT EXISTS doi_key VARCHAR(255)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_papers_doi_key ON papers(doi_key)",
+    # 標準化標題（不唯一），供批次重複檢查以單一查詢比對；回填見 backfill_paper_title_keys
+    "ALTER TABLE papers ADD COLUMN IF NOT EXISTS title_key VARCHAR(500)",
+    "CREATE INDEX IF NOT EXISTS idx_papers_title_key ON papers(title_key)",
+    # 期刊/會議標準化名稱，供批次匯入以 ON CONFLICT 建立；回填見 backfill_venue_name_keys
+    "ALTER TABLE venues ADD COLUMN IF NOT EXISTS name_key VARCHAR(500)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_venues_name_key ON venues(name_key)",
+    # 背景匯入工作與其逐列錯誤訊息
+    """
+    CREATE TABLE IF NOT EXISTS import_jobs (
+        id SERIAL PRIMARY KEY,
+        filename VARCHAR(500),
+        status VARCHAR(20) NOT NULL DEFAULT 'queued',
+        cancel_requested BOOLEAN NOT NULL DEFAULT FALSE,
+        total_rows INTEGER DEFAULT 0,
+        processed_rows INTEGER DEFAULT 0,
+        successful_imports INTEGER DEFAULT 0,
+        failed_imports INTEGER DEFAULT 0,
+        error TEXT,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+        started_at TIMESTAMP WITH TIME ZONE,
+        finished_at TIMESTAMP WITH TIME ZONE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS import_job_errors (
+        id SERIAL PRIMARY KEY,
+        job_id INTEGER NOT NULL REFERENCES import_jobs(id) ON DELETE CASCADE,
+        message TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_import_job_errors_job ON import_job_errors(job_id, id)",
+]
+
+# 回填時每次 UPDATE 的列數
+BACKFILL_BATCH_SIZE = 10000
+
+def _update_column(conn: Connection, table: str, column: str, values: Dict[int, str]):
+    """以 unnest 陣列分批更新指定欄位（比逐列 executemany 少很多往返）"""
+    items = list(values.items())
+    statement = text(
+        f"UPDATE {table} AS t SET {column} = u.value "
+        "FROM unnest(CAST(:ids AS INTEGER[]), CAST(:values AS TEXT[])) AS u(id, value) "
+        "WHERE t.id = u.id"
+    )
+    for start in range(0, len(items), BACKFILL_BATCH_SIZE):
+        batch = items[start:start + BACKFILL_BATCH_SIZE]
+        conn.execute(statement, {"ids": [row_id for row_id, _ in batch], "values": [value for _, value in batch]})
+
+def backfill_author_name_keys(conn: Connection):
+    """為舊作者補上 name_key；標準化後同名的作者只有 id 最小者取得鍵，其餘維持 NULL"""
+    used = set(conn.execute(text("SELECT name_key FROM authors WHERE name_key IS NOT NULL")).scalars())
+    updates = {}
+    for author_id, name in conn.execute(text("SELECT id, name FROM authors WHERE name_key IS NULL ORDER BY id")):
+        name_key = author_name_key(name)
+        if name_key and name_key not in used:
+            used.add(name_key)
+            updates[author_id] = name_key
+    _update_column(conn, "authors", "name_key", updates)
+
+def backfill_venue_name_keys(conn: Connection):
+    """為舊期刊/會議補上 name_key；標準化後同名者只有 id 最小者取得鍵，其餘維持 NULL"""
+    used = set(conn.execute(text("SELECT name_key FROM venues WHERE name_key IS NOT NULL")).scalars())
+    updates = {}
+    for venue_id, name in conn.execute(text("SELECT id, name FROM venues WHERE name_key IS NULL ORDER BY id")):
+        name_key = venue_name_key(name)
+        if name_key and name_key not in used:
+            used.add(name_key)
+            updates[venue_id] = name_key
+    _update_column(conn, "venues", "name_key", updates)
+
+def backfill_paper_doi_keys(conn: Connection):
+    """為舊論文補上 doi_key；標準化後 DOI 相同的論文只有 id 最小者取得鍵，其餘留給重複論文掃描處理"""
+    used = set(conn.execute(text("SELECT doi_key FROM papers WHERE doi_key IS NOT NULL")).scalars())
+    updates = {}
+    rows = conn.execute(text("SELECT id, doi FROM papers WHERE doi_key IS NULL AND doi IS NOT NULL ORDER BY id"))
+    for paper_id, doi in rows:
+        doi_key = normalize_doi(doi)
+        if doi_key and doi_key not in used:
+            used.add(doi_key)
+            updates[paper_id] = doi_key
+    _update_column(conn, "papers", "doi_key", updates)
+
+def backfill_paper_title_keys(conn: Connection):
+    """為舊論文補上 title_key（只有標點的標題為空字串，不會重複回填）"""
+    rows = conn.execute(text("SELECT id, title FROM papers WHERE title_key IS NULL"))
+    _update_column(conn, "papers", "title_key", {paper_id: paper_title_key(title) for paper_id, title in rows})
+
+# 無法以 SQL 表達、需在 Python 中計算的資料回填，於結構升級後執行
+DATA_MIGRATIONS = [
+    backfill_author_name_keys,
+    backfill_venue_name_keys,
+    backfill_paper_doi_keys,
+    backfill_paper_title_keys,
+]
+
+def apply_migrations(engine: Engine):
+    """在單一交易中依序執行所有結構升級語句"""
+    with engine.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:lock_id)"), {"lock_id": MIGRATION_LOCK_ID})
+        for statement in MIGRATIONS:
+            conn.execute(text(statement))
+        for migrate in DATA_MIGRATIONS:
+            migrate(conn)
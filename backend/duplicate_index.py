@@ -0,0 +1,191 @@
+import os
+import threading
+import time
+import zlib
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from models import Paper, PaperAuthor, Author
+from normalization import title_shingles
+from bm25_index import find_paper_changes
+
+# 重複論文偵測設定
+DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", "0.5"))  # 估計的 Jaccard 相似度下限
+DUPLICATE_INCLUDE_AUTHORS = os.getenv("DUPLICATE_INCLUDE_AUTHORS", "false").lower() == "true"
+DUPLICATE_SYNC_INTERVAL = float(os.getenv("DUPLICATE_SYNC_INTERVAL", "60"))  # 秒
+
+# MinHash 簽章長度 = 分段數 × 每段列數；16 × 4 的 LSH 約在 Jaccard 0.5 附近開始命中
+LSH_BANDS = 16
+LSH_ROWS = 4
+NUM_PERMUTATIONS = LSH_BANDS * LSH_ROWS
+
+# 固定種子的雜湊排列參數 (a * x + b) mod 2^32，a 為奇數時為 32 位元整數上的排列；
+# 以 uint32 溢位運算取代質數取模，批次計算快數倍
+_rng = np.random.RandomState(20240611)
+PERM_A = (_rng.randint(0, 1 << 31, size=NUM_PERMUTATIONS).astype(np.uint32) << np.uint32(1)) | np.uint32(1)
+PERM_B = _rng.randint(0, 1 << 31, size=NUM_PERMUTATIONS).astype(np.uint32)
+
+def minhash_signature(shingles: Set[str]) -> Optional[np.ndarray]:
+    """計算 shingle 集合的 MinHash 簽章，空集合回傳 None"""
+    if not shingles:
+        return None
+    hashes = np.fromiter(
+        (zlib.crc32(shingle.encode("utf-8")) for shingle in shingles),
+        dtype=np.uint32, count=len(shingles)
+    )
+    permuted = PERM_A[:, None] * hashes[None, :] + PERM_B[:, None]
+    return permuted.min(axis=1)
+
+def minhash_signatures(shingle_sets: List[Set[str]]) -> Tuple[np.ndarray, np.ndarray]:
+    """批次計算多個 shingle 集合的 MinHash 簽章，回傳 (簽章矩陣, 是否有簽章)；空集合的列為 0"""
+    lengths = np.fromiter((len(shingles) for shingles in shingle_sets), dtype=np.int64, count=len(shingle_sets))
+    signatures = np.zeros((len(shingle_sets), NUM_PERMUTATIONS), dtype=np.uint32)
+    present = lengths > 0
+    if not present.any():
+        return signatures, present
+    hashes = np.fromiter(
+        (zlib.crc32(shingle.encode("utf-8")) for shingles in shingle_sets for shingle in shingles),
+        dtype=np.uint32, count=int(lengths.sum())
+    )
+    permuted = PERM_A[:, None] * hashes[None, :] + PERM_B[:, None]
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])[present]
+    signatures[present] = np.minimum.reduceat(permuted, starts, axis=1).T
+    return signatures, present
+
+def band_keys(signature: np.ndarray) -> List[bytes]:
+    return [signature[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes() for band in range(LSH_BANDS)]
+
+class DuplicateIndex:
+    """以 MinHash 簽章與 LSH 分段桶尋找標題近似重複的論文（行程內記憶體索引）"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.signatures: Dict[int, np.ndarray] = {}
+        # 沒有可用簽章的論文（空標題），同步時仍算作已索引
+        self.unsigned: Set[int] = set()
+        self.buckets: List[Dict[bytes, Set[int]]] = [{} for _ in range(LSH_BANDS)]
+        self.built = False
+        self.last_sync = 0.0
+        self.watermark = None
+
+    def add(self, paper_id: int, signature: Optional[np.ndarray]):
+        """新增或更新一篇論文的簽章"""
+        with self._lock:
+            self.remove(paper_id)
+            if signature is None:
+                self.unsigned.add(paper_id)
+                return
+            self.signatures[paper_id] = signature
+            for band, key in enumerate(band_keys(signature)):
+                self.buckets[band].setdefault(key, set()).add(paper_id)
+
+    def remove(self, paper_id: int):
+        with self._lock:
+            self.unsigned.discard(paper_id)
+            signature = self.signatures.pop(paper_id, None)
+            if signature is None:
+                return
+            for band, key in enumerate(band_keys(signature)):
+                bucket = self.buckets[band].get(key)
+                if bucket is not None:
+                    bucket.discard(paper_id)
+                    if not bucket:
+                        del self.buckets[band][key]
+
+    def query(self, signature: Optional[np.ndarray], limit: int, threshold: float = DUPLICATE_THRESHOLD,
+              exclude: Optional[int] = None) -> List[Tuple[int, float]]:
+        """回傳估計相似度不低於 threshold 的 (論文 id, 相似度)，依相似度排序"""
+        if signature is None:
+            return []
+        with self._lock:
+            candidates = set()
+            for band, key in enumerate(band_keys(signature)):
+                candidates.update(self.buckets[band].get(key, ()))
+            candidates.discard(exclude)
+            scored = [
+                (paper_id, float(np.count_nonzero(self.signatures[paper_id] == signature)) / NUM_PERMUTATIONS)
+                for paper_id in candidates
+            ]
+        scored = [item for item in scored if item[1] >= threshold]
+        scored.sort(key=lambda item: (-item[1], item[0]))
+        return scored[:limit]
+
+    def build(self, db: Session):
+        """從 papers 表完整建立索引"""
+        with self._lock:
+            self.signatures = {}
+            self.unsigned = set()
+            self.buckets = [{} for _ in range(LSH_BANDS)]
+            watermark = None
+            for paper_id, signature, updated_at in iter_paper_signatures(db):
+                self.add(paper_id, signature)
+                if updated_at is not None and (watermark is None or updated_at > watermark):
+                    watermark = updated_at
+            self.watermark = watermark
+            self.built = True
+            self.last_sync = time.monotonic()
+
+    def sync(self, db: Session):
+        """補上不經過本行程的變更"""
+        with self._lock:
+            indexed = np.fromiter(
+                [*self.signatures, *self.unsigned], dtype=np.int64, count=len(self.signatures) + len(self.unsigned)
+            )
+            watermark = self.watermark
+        changed, removed = find_paper_changes(db, watermark, np.sort(indexed))
+        for paper_id, signature, updated_at in iter_paper_signatures(db, changed):
+            self.add(paper_id, signature)
+            with self._lock:
+                if updated_at is not None and (self.watermark is None or updated_at > self.watermark):
+                    self.watermark = updated_at
+        for paper_id in removed:
+            self.remove(paper_id)
+        self.last_sync = time.monotonic()
+
+    def ensure_ready(self, db: Session):
+        """第一次使用時建立索引，之後定期與資料庫同步"""
+        if not self.built:
+            with self._lock:
+                if not self.built:
+                    self.build(db)
+                    return
+        if time.monotonic() - self.last_sync >= DUPLICATE_SYNC_INTERVAL:
+            self.sync(db)
+
+def paper_signature(title: Optional[str], author_names: Optional[List[str]] = None) -> Optional[np.ndarray]:
+    """論文的 MinHash 簽章（依設定決定是否納入作者姓氏）"""
+    return minhash_signature(title_shingles(title, author_names if DUPLICATE_INCLUDE_AUTHORS else None))
+
+def iter_paper_signatures(db: Session, paper_ids: Optional[Iterable[int]] = None, batch_size: int = 2000):
+    """依 id 順序逐批讀取論文，產生 (id, 簽章, updated_at)"""
+    query = db.query(Paper.id, Paper.title, Paper.updated_at)
+    authors_query = db.query(PaperAuthor.paper_id, Author.name).join(Author, Author.id == PaperAuthor.author_id)
+    if paper_ids is not None:
+        paper_ids = list(paper_ids)
+        if not paper_ids:
+            return
+        query = query.filter(Paper.id.in_(paper_ids))
+        authors_query = authors_query.filter(PaperAuthor.paper_id.in_(paper_ids))
+
+    authors: Dict[int, List[str]] = {}
+    if DUPLICATE_INCLUDE_AUTHORS:
+        for paper_id, name in authors_query:
+            authors.setdefault(paper_id, []).append(name)
+
+    for row in query.order_by(Paper.id).yield_per(batch_size):
+        yield row.id, paper_signature(row.title, authors.get(row.id)), row.updated_at
+
+# 行程內共用的重複論文索引
+duplicate_index = DuplicateIndex()
+
+def index_paper_duplicates(paper: Paper):
+    """論文新增或更新後更新重複論文索引（尚未建立時略過，建立時會讀到最新資料）"""
+    if duplicate_index.built:
+        author_names = [relation.author.name for relation in paper.authors] if DUPLICATE_INCLUDE_AUTHORS else None
+        duplicate_index.add(paper.id, paper_signature(paper.title, author_names))
+
+def remove_paper_duplicates(paper_id: int):
+    if duplicate_index.built:
+        duplicate_index.remove(paper_id)
@@ -0,0 +1,238 @@
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Tuple
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from sqlalchemy import select, insert, delete, func
+from sqlalchemy.orm import Session
+
+from models import Paper, DuplicateScanRun, DuplicateCluster, DuplicateClusterMember
+from normalization import normalize_doi, title_shingles
+from duplicate_index import minhash_signatures, NUM_PERMUTATIONS, LSH_BANDS, LSH_ROWS
+
+# 全庫重複掃描設定：標題 MinHash 估計相似度下限
+DUPLICATE_SCAN_THRESHOLD = float(os.getenv("DUPLICATE_SCAN_THRESHOLD", "0.8"))
+
+# 每次讀取的論文數
+SCAN_BATCH_SIZE = 5000
+# 標題相似的論文，出版年份最多相差幾年仍視為候選
+YEAR_TOLERANCE = 1
+# 同一分塊超過此數量時視為過於常見的標題（如 "Editorial"），不做兩兩比較
+MAX_BLOCK_SIZE = 200
+# 超過此時間仍為 running 的掃描視為已中斷
+STALE_RUN_AFTER = timedelta(hours=1)
+# 驗證候選配對時每批的配對數
+PAIR_CHUNK_SIZE = 1_000_000
+
+def load_papers(db: Session):
+    """以 id 鍵集分批讀取比對所需欄位；每批讀完即結束交易，不長時間持有快照"""
+    ids, years, doi_keys, signatures, has_title = [], [], [], [], []
+    last_id = 0
+    while True:
+        rows = db.execute(
+            select(Paper.id, Paper.doi, Paper.title, Paper.publication_year)
+            .where(Paper.id > last_id)
+            .order_by(Paper.id)
+            .limit(SCAN_BATCH_SIZE)
+        ).all()
+        db.commit()
+        if not rows:
+            break
+        ids.extend(row.id for row in rows)
+        years.extend(row.publication_year or 0 for row in rows)
+        doi_keys.extend(normalize_doi(row.doi) for row in rows)
+        batch_signatures, present = minhash_signatures([title_shingles(row.title) for row in rows])
+        signatures.append(batch_signatures)
+        has_title.append(present)
+        last_id = rows[-1].id
+
+    if not ids:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), [], \
+            np.zeros((0, NUM_PERMUTATIONS), dtype=np.uint32), np.zeros(0, dtype=bool)
+    return (
+        np.asarray(ids, dtype=np.int64),
+        np.asarray(years, dtype=np.int64),
+        doi_keys,
+        np.vstack(signatures),
+        np.concatenate(has_title),
+    )
+
+def doi_pairs(doi_keys: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """標準化 DOI 相同的論文兩兩相連（以鏈狀相連即足以形成群組）"""
+    groups: Dict[str, List[int]] = {}
+    for row, key in enumerate(doi_keys):
+        if key:
+            groups.setdefault(key, []).append(row)
+    left, right = [], []
+    for rows in groups.values():
+        left.extend(rows[:-1])
+        right.extend(rows[1:])
+    return np.asarray(left, dtype=np.int64), np.asarray(right, dtype=np.int64)
+
+def title_candidate_pairs(signatures: np.ndarray, years: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """以 LSH 分段為分塊鍵，產生同一分塊內、年份相差不超過 YEAR_TOLERANCE 的候選配對"""
+    left_parts, right_parts = [], []
+    for band in range(LSH_BANDS):
+        # 將分段內的數列合併為一個雜湊值；碰撞只會多出候選，稍後仍會驗證
+        keys = signatures[:, band * LSH_ROWS:(band + 1) * LSH_ROWS].astype(np.uint64)
+        band_hash = keys[:, 0].copy()
+        for column in range(1, LSH_ROWS):
+            band_hash = band_hash * np.uint64(1000003) ^ keys[:, column]
+
+        order = np.lexsort((years, band_hash))
+        sorted_hash = band_hash[order]
+        starts = np.flatnonzero(np.r_[True, sorted_hash[1:] != sorted_hash[:-1]])
+        ends = np.r_[starts[1:], len(order)]
+        for start, end in zip(starts[ends - starts > 1], ends[ends - starts > 1]):
+            if end - start > MAX_BLOCK_SIZE:
+                continue
+            rows = order[start:end]
+            i, j = np.triu_indices(len(rows), 1)
+            close = np.abs(years[rows[i]] - years[rows[j]]) <= YEAR_TOLERANCE
+            left_parts.append(rows[i[close]])
+            right_parts.append(rows[j[close]])
+
+    if not left_parts:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+    left = np.concatenate(left_parts)
+    right = np.concatenate(right_parts)
+    low, high = np.minimum(left, right), np.maximum(left, right)
+    # 去除在多個分段重複出現的配對
+    unique = np.unique(low * len(signatures) + high)
+    return unique // len(signatures), unique % len(signatures)
+
+def signature_similarity(signatures: np.ndarray, left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """分批計算配對的 MinHash 估計相似度"""
+    scores = np.empty(len(left), dtype=np.float64)
+    for start in range(0, len(left), PAIR_CHUNK_SIZE):
+        end = start + PAIR_CHUNK_SIZE
+        agree = signatures[left[start:end]] == signatures[right[start:end]]
+        scores[start:end] = agree.sum(axis=1) / NUM_PERMUTATIONS
+    return scores
+
+def find_duplicate_clusters(db: Session) -> Tuple[int, List[List[Tuple[int, float, str]]]]:
+    """掃描全部論文，回傳 (論文數, 群組列表)；每個群組為 (論文 id, 相似度, 比對方式) 的列表"""
+    ids, years, doi_keys, signatures, has_title = load_papers(db)
+    count = len(ids)
+    if count == 0:
+        return 0, []
+
+    doi_left, doi_right = doi_pairs(doi_keys)
+    title_left, title_right = title_candidate_pairs(signatures, years)
+    # 標題為空的論文沒有可比對的簽章；兩篇都有 DOI 但不同時視為不同的論文
+    doi_codes = np.asarray([hash(key) if key else 0 for key in doi_keys], dtype=np.int64)
+    left_doi, right_doi = doi_codes[title_left], doi_codes[title_right]
+    comparable = (
+        has_title[title_left] & has_title[title_right]
+        & ((left_doi == 0) | (right_doi == 0) | (left_doi == right_doi))
+    )
+    title_left, title_right = title_left[comparable], title_right[comparable]
+    similar = signature_similarity(signatures, title_left, title_right) >= DUPLICATE_SCAN_THRESHOLD
+
+    left = np.concatenate([doi_left, title_left[similar]])
+    right = np.concatenate([doi_right, title_right[similar]])
+    graph = sparse.coo_matrix((np.ones(len(left), dtype=np.int8), (left, right)), shape=(count, count))
+    _, labels = connected_components(graph, directed=False)
+
+    sizes = np.bincount(labels)
+    grouped = np.flatnonzero(sizes[labels] > 1)
+    grouped = grouped[np.argsort(labels[grouped], kind="stable")]
+    boundaries = np.flatnonzero(np.diff(labels[grouped])) + 1
+
+    clusters = []
+    for rows in np.split(grouped, boundaries):
+        clusters.extend(split_component(rows, ids, doi_keys, signatures, has_title))
+    return count, clusters
+
+def split_component(rows: np.ndarray, ids: np.ndarray, doi_keys: List[str], signatures: np.ndarray,
+                    has_title: np.ndarray) -> List[List[Tuple[int, float, str]]]:
+    """
+    將一個連通分量（rows 依 id 遞增）拆成群組。代表論文為剩餘論文中 id 最小（最早建立）者，
+    成員必須與代表論文本身 DOI 相同，或標題估計相似度達 DUPLICATE_SCAN_THRESHOLD（兩篇都有 DOI 時須相同）；
+    只經由其他論文鏈狀相連的論文不會併入，改與剩餘的論文另行分組，避免合併時刪除不同的論文。
+    """
+    clusters = []
+    while len(rows) > 1:
+        representative, others = rows[0], rows[1:]
+        representative_doi = doi_keys[representative]
+        scores = signature_similarity(signatures, np.full(len(others), representative), others)
+        members = [(int(ids[representative]), 1.0, 'representative')]
+        remaining = []
+        for row, score in zip(others, scores):
+            doi_key = doi_keys[row]
+            if doi_key and doi_key == representative_doi:
+                members.append((int(ids[row]), 1.0, 'doi'))
+            elif (
+                has_title[row] and has_title[representative]
+                and not (doi_key and representative_doi)
+                and score >= DUPLICATE_SCAN_THRESHOLD
+            ):
+                members.append((int(ids[row]), float(score), 'title'))
+            else:
+                remaining.append(row)
+        if len(members) > 1:
+            clusters.append(members)
+        rows = np.asarray(remaining, dtype=np.int64)
+    return clusters
+
+def store_clusters(db: Session, run_id: int, clusters: List[List[Tuple[int, float, str]]], batch_size: int = 1000):
+    """寫入掃描結果，並移除先前掃描中尚未處理的群組"""
+    for start in range(0, len(clusters), batch_size):
+        batch = clusters[start:start + batch_size]
+        cluster_ids = db.execute(
+            insert(DuplicateCluster).returning(DuplicateCluster.id, sort_by_parameter_order=True),
+            [{"run_id": run_id, "size": len(members), "status": "open"} for members in batch]
+        ).scalars().all()
+        db.execute(insert(DuplicateClusterMember), [
+            {"cluster_id": cluster_id, "paper_id": paper_id, "score": score, "match": match}
+            for cluster_id, members in zip(cluster_ids, batch)
+            for paper_id, score, match in members
+        ])
+    db.execute(delete(DuplicateCluster).where(
+        DuplicateCluster.run_id != run_id,
+        DuplicateCluster.status == 'open'
+    ))
+
+def start_duplicate_scan(db: Session) -> DuplicateScanRun:
+    """建立一筆新的掃描紀錄；已有進行中的掃描時拋出 ValueError"""
+    running = db.query(DuplicateScanRun).filter(
+        DuplicateScanRun.status == 'running',
+        DuplicateScanRun.started_at > datetime.now(timezone.utc) - STALE_RUN_AFTER
+    ).first()
+    if running:
+        raise ValueError(f"已有進行中的重複論文掃描（#{running.id}）")
+    run = DuplicateScanRun(status='running')
+    db.add(run)
+    db.commit()
+    db.refresh(run)
+    return run
+
+def run_duplicate_scan(session_factory, run_id: int):
+    """背景任務：掃描全庫重複論文並寫入結果"""
+    db = session_factory()
+    try:
+        started = time.perf_counter()
+        scanned, clusters = find_duplicate_clusters(db)
+        store_clusters(db, run_id, clusters)
+        run = db.get(DuplicateScanRun, run_id)
+        run.status = 'completed'
+        run.papers_scanned = scanned
+        run.clusters_found = len(clusters)
+        run.finished_at = func.now()
+        db.commit()
+        print(f"重複論文掃描完成：{scanned} 篇論文，{len(clusters)} 個群組，{time.perf_counter() - started:.1f} 秒")
+    except Exception as e:
+        db.rollback()
+        run = db.get(DuplicateScanRun, run_id)
+        if run is not None:
+            run.status = 'failed'
+            run.error = str(e)
+            run.finished_at = func.now()
+            db.commit()
+        print(f"重複論文掃描失敗: {e}")
+    finally:
+        db.close()
@@ -1,86 +1,128 @@
+import numpy as np
 import pandas as pd
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List, Dict, Any, Optional, Tuple
-import re
-import uuid
+from typing import BinaryIO, Callable, Collection, Iterable, Iterator, List, Dict, Any, Optional, Tuple
 import tempfile
+import shutil
+import re
 import os
-import io
-from models import Paper, Author, PaperAuthor, Venue
-from crud import create_author, create_venue, get_author, get_venue
-from schemas import ExcelImportResult, PaperResponse, ExcelPreviewData, ExcelColumnInfo, ExcelImportConfig, FieldMapping
+from datetime import date, datetime
+from bulk_import import import_chunk, load_paper_keys, validation_error, IMPORT_CHUNK_SIZE
+from parallel_parse import parse_files_parallel
+import readers
+from normalization import normalize_doi, paper_title_key
+from preview_store import PreviewEntry, FrameCache, COPY_BUFFER_SIZE, create_preview, get_preview, claim_preview, discard_preview, cached_frames
+from schemas import (
+    ExcelImportResult, PaperResponse, ExcelPreviewData, ExcelColumnInfo, ExcelImportConfig, FieldMapping,
+    ImportDryRunResult, ImportDryRunRow
+)
+
+# 直接導入（不經預覽）的上傳文件暫存目錄（未設定時使用系統暫存目錄）
+IMPORT_TEMP_DIR = os.getenv("IMPORT_TEMP_DIR") or None
+# 預覽時分塊統計欄位的列數
+PREVIEW_CHUNK_SIZE = 10000
+# 串流導入時最多回傳的錯誤訊息數
+STREAMING_MAX_ERRORS = 1000
 
-# 臨時文件存儲
-TEMP_FILES = {}
+def save_upload(source: BinaryIO, filename: str) -> str:
+    """將上傳內容分段複製到磁碟上的暫存文件，回傳路徑（不把整個文件讀入記憶體）"""
+    suffix = os.path.splitext(filename)[1].lower()
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix, prefix="import-", dir=IMPORT_TEMP_DIR) as target:
+        shutil.copyfileobj(source, target, COPY_BUFFER_SIZE)
+        return target.name
 
-def preview_file(file_content: bytes, filename: str) -> ExcelPreviewData:
-    """預覽文件內容（支持Excel、CSV、TSV）"""
+def remove_temp_file(path: str):
     try:
-        # 根據文件擴展名讀取不同格式的文件
-        file_ext = filename.lower().split('.')[-1]
-        
-        if file_ext in ['xlsx', 'xls']:
-            df = pd.read_excel(file_content)
-        elif file_ext == 'csv':
-            df = pd.read_csv(io.BytesIO(file_content))
-        elif file_ext == 'tsv':
-            df = pd.read_csv(io.BytesIO(file_content), sep='\t')
-        else:
-            raise Exception(f"不支持的文件格式: {file_ext}")
-        
-        
-        # 生成預覽數據
-        columns = []
-        for col_name in df.columns:
-            col_data = df[col_name]
-            
-            # 獲取樣本值（非空的前5個值）
-            sample_values = []
-            for val in col_data.dropna():
-                if len(sample_values) < 5:
-                    sample_values.append(str(val))
-                else:
-                    break
-            
-            # 確定數據類型
-            data_type = "text"
-            if col_data.dtype in ['int64', 'float64']:
-                data_type = "number"
-            elif pd.api.types.is_datetime64_any_dtype(col_data):
-                data_type = "date"
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def read_frames(
+    path: str,
+    filename: str,
+    chunksize: Optional[int] = IMPORT_CHUNK_SIZE,
+    usecols: Optional[Collection[str]] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    依文件類型從讀取器註冊表讀取資料表。CSV/TSV 與文獻格式（WoS 純文字、BibTeX、RIS、EndNote XML）
+    以 chunksize 分塊串流讀取，記憶體用量與文件大小無關；Excel 整個工作表一次讀入。各塊的索引連續，可直接換算行號。
+    指定 usecols 時只建立映射會用到的欄位。
+    """
+    return readers.read_frames(path, filename, chunksize, usecols)
+
+def mapped_columns(field_mappings: List[FieldMapping]) -> List[str]:
+    """欄位配置中實際映射到的文件欄位"""
+    return list(dict.fromkeys(mapping.excel_column for mapping in field_mappings if mapping.excel_column))
+
+def preview_frames(entry: PreviewEntry, usecols: Optional[Collection[str]] = None) -> Iterator[pd.DataFrame]:
+    """導入預覽過的文件：優先讀取預覽時的 Parquet 快取，沒有快取時重新解析原始文件"""
+    frames = cached_frames(entry, usecols)
+    if frames is None:
+        frames = read_frames(entry.path, entry.filename, usecols=usecols)
+    return frames
+
+def preview_file(source: BinaryIO, filename: str) -> Tuple[ExcelPreviewData, str]:
+    """
+    將上傳內容存入預覽存放區並預覽（支持Excel、CSV、TSV）。分塊統計欄位，大文件也不會整個載入記憶體；
+    解析後的各塊同時快取為 Parquet，導入時不必再次解析。
+    """
+    entry = create_preview(source, filename)
+    try:
+        cache = FrameCache(entry)
+        columns = None
+        samples: Dict[str, List[str]] = {}
+        non_null_counts: Dict[str, int] = {}
+        sample_rows = []
+        total_rows = 0
+        for df in read_frames(entry.path, filename, PREVIEW_CHUNK_SIZE):
+            cache.append(df)
+            if columns is None:
+                # 確定數據類型（以第一塊推斷）
+                columns = []
+                for col_name in df.columns:
+                    col_data = df[col_name]
+                    data_type = "text"
+                    if col_data.dtype in ['int64', 'float64']:
+                        data_type = "number"
+                    elif pd.api.types.is_datetime64_any_dtype(col_data):
+                        data_type = "date"
+                    columns.append((col_name, data_type))
+                    samples[col_name] = []
+                    non_null_counts[col_name] = 0
+                
+                # 獲取樣本行（前5行）
+                for _, row in df.head(5).iterrows():
+                    sample_rows.append({col: None if pd.isna(row[col]) else str(row[col]) for col in df.columns})
             
-            columns.append(ExcelColumnInfo(
+            total_rows += len(df)
+            for col_name, _ in columns:
+                col_data = df[col_name]
+                non_null_counts[col_name] += int(col_data.notna().sum())
+                # 獲取樣本值（非空的前5個值）
+                if len(samples[col_name]) < 5:
+                    for val in col_data.dropna().head(5 - len(samples[col_name])):
+                        samples[col_name].append(str(val))
+        cache.finish()
+        
+        column_infos = [
+            ExcelColumnInfo(
                 name=col_name,
-                sample_values=sample_values,
+                sample_values=samples[col_name],
                 data_type=data_type,
-                non_null_count=int(col_data.notna().sum())
-            ))
-        
-        # 獲取樣本行（前5行）
-        sample_rows = []
-        for idx, row in df.head(5).iterrows():
-            row_dict = {}
-            for col in df.columns:
-                value = row[col]
-                if pd.isna(value):
-                    row_dict[col] = None
-                else:
-                    row_dict[col] = str(value)
-            sample_rows.append(row_dict)
-        
-        # 生成臨時文件ID並存儲文件內容和文件名
-        file_id = str(uuid.uuid4())
-        TEMP_FILES[file_id] = (file_content, filename)
+                non_null_count=non_null_counts[col_name]
+            )
+            for col_name, data_type in columns or []
+        ]
         
         return ExcelPreviewData(
-            columns=columns,
+            columns=column_infos,
             sample_rows=sample_rows,
-            total_rows=len(df),
+            total_rows=total_rows,
             filename=filename
-        ), file_id
+        ), entry.file_id
         
     except Exception as e:
+        discard_preview(entry)
         raise Exception(f"讀取文件預覽時出錯: {str(e)}")
 
 def get_default_field_mappings() -> List[Dict[str, Any]]:
@@ -151,191 +193,38 @@ def get_default_field_mappings() -> List[Dict[str, Any]]:
         }
     ]
 
-def map_excel_row_to_paper_with_config(row: pd.Series, field_mappings: List[FieldMapping], db: Session) -> Tuple[Optional[Dict[str, Any]], List[str]]:
-    """使用配置的欄位映射將Excel行映射為論文數據"""
-    errors = []
+def map_frame_with_config(df: pd.DataFrame, field_mappings: List[FieldMapping]) -> Tuple[List[Tuple[int, Dict[str, Any]]], List[str]]:
+    """使用配置的欄位映射，以整欄向量化運算將資料表映射為論文數據（作者與期刊/會議以名稱表示，由批次匯入統一解析）"""
+    mapping_dict = {mapping.target_field: mapping.excel_column for mapping in field_mappings}
     
-    try:
-        # 創建映射字典
-        mapping_dict = {mapping.target_field: mapping.excel_column for mapping in field_mappings}
-        
-        # 基本字段映射
-        title = clean_string(row.get(mapping_dict.get('title')))
-        if not title:
-            errors.append("標題為空")
-            return None, errors
-        
-        abstract = clean_string(row.get(mapping_dict.get('abstract')))
-        doi = clean_string(row.get(mapping_dict.get('doi')))
-        
-        # 處理發表年份
-        publication_year = None
-        year_column = mapping_dict.get('publication_year')
-        if year_column and year_column in row and not pd.isna(row[year_column]):
-            try:
-                publication_year = int(row[year_column])
-            except:
-                publication_year = extract_year_from_date(str(row[year_column]))
-        
-        if not publication_year:
-            errors.append("無法確定發表年份")
-            return None, errors
-        
-        # 引用數
-        citation_count = 0
-        citation_column = mapping_dict.get('citation_count')
-        if citation_column and citation_column in row and not pd.isna(row[citation_column]):
-            try:
-                citation_count = int(row[citation_column])
-            except:
-                citation_count = 0
-        
-        # 處理期刊/會議
-        venue_id = None
-        venue_column = mapping_dict.get('venue')
-        if venue_column:
-            source_title = clean_string(row.get(venue_column))
-            if source_title:
-                venue = get_or_create_venue(db, source_title, "journal")
-                if venue:
-                    venue_id = venue.id
-        
-        # 處理關鍵字
-        keywords = []
-        keywords_column = mapping_dict.get('keywords')
-        if keywords_column:
-            keywords_str = clean_string(row.get(keywords_column))
-            if keywords_str:
-                keywords = parse_keywords(keywords_str)
-        
-        # 處理作者
-        author_ids = []
-        authors_column = mapping_dict.get('authors')
-        if authors_column:
-            authors_str = clean_string(row.get(authors_column))
-            if authors_str:
-                authors = parse_authors(authors_str)
-                for author_name in authors:
-                    author = get_or_create_author(db, author_name)
-                    if author:
-                        author_ids.append(author.id)
-        
-        # 處理URL
-        url = None
-        url_column = mapping_dict.get('url')
-        if url_column:
-            url = clean_string(row.get(url_column))
-        
-        paper_data = {
-            'title': title,
-            'abstract': abstract,
-            'publication_year': publication_year,
-            'doi': doi,
-            'citation_count': citation_count,
-            'venue_id': venue_id,
-            'keywords': keywords,
-            'author_ids': author_ids,
-            'url': url
-        }
-        
-        return paper_data, errors
-        
-    except Exception as e:
-        errors.append(f"處理行數據時出錯: {str(e)}")
-        return None, errors
+    fields = {
+        'title': clean_column(df, mapping_dict.get('title')),
+        'abstract': clean_column(df, mapping_dict.get('abstract')),
+        'publication_year': parse_years(frame_column(df, mapping_dict.get('publication_year'))),
+        'doi': clean_column(df, mapping_dict.get('doi')),
+        'citation_count': parse_counts(frame_column(df, mapping_dict.get('citation_count'))),
+        'venue': clean_column(df, mapping_dict.get('venue')),
+        'venue_type': pd.Series('journal', index=df.index, dtype=object),
+        'keywords': split_column(frame_column(df, mapping_dict.get('keywords'))),
+        'authors': split_column(frame_column(df, mapping_dict.get('authors'))),
+        'url': clean_column(df, mapping_dict.get('url')),
+    }
+    return collect_records(df, fields)
 
-def import_file_with_config(config: ExcelImportConfig, db: Session) -> ExcelImportResult:
+def import_file_with_config(config: ExcelImportConfig, db: Session, streaming: bool = False) -> ExcelImportResult:
     """使用配置導入文件（支持Excel、CSV、TSV）"""
     try:
-        # 從臨時存儲中獲取文件內容和文件名
-        file_data = TEMP_FILES.get(config.preview_file_id)
-        if not file_data:
-            raise Exception("預覽文件已過期，請重新上傳")
-        
-        file_content, filename = file_data
-        
-        # 根據文件擴展名讀取不同格式的文件
-        file_ext = filename.lower().split('.')[-1]
-        
-        if file_ext in ['xlsx', 'xls']:
-            df = pd.read_excel(file_content)
-        elif file_ext == 'csv':
-            df = pd.read_csv(io.BytesIO(file_content))
-        elif file_ext == 'tsv':
-            df = pd.read_csv(io.BytesIO(file_content), sep='\t')
-        else:
-            raise Exception(f"不支持的文件格式: {file_ext}")
-        
-        total_rows = len(df)
-        successful_imports = 0
-        failed_imports = 0
-        errors = []
-        imported_papers = []
-        
-        for index, row in df.iterrows():
-            try:
-                paper_data, row_errors = map_excel_row_to_paper_with_config(row, config.field_mappings, db)
-                
-                if paper_data:
-                    # 創建論文
-                    from schemas import PaperCreate
-                    paper_create = PaperCreate(**paper_data)
-                    
-                    # 檢查DOI是否已存在
-                    if paper_data.get('doi'):
-                        existing_paper = db.query(Paper).filter(Paper.doi == paper_data['doi']).first()
-                        if existing_paper:
-                            errors.append(f"行 {index + 1}: DOI {paper_data['doi']} 已存在")
-                            failed_imports += 1
-                            continue
-                    
-                    # 檢查標題是否已存在
-                    existing_paper = db.query(Paper).filter(Paper.title == paper_data['title']).first()
-                    if existing_paper:
-                        errors.append(f"行 {index + 1}: 標題 '{paper_data['title'][:50]}...' 已存在")
-                        failed_imports += 1
-                        continue
-                    
-                    try:
-                        from crud import create_paper
-                        new_paper = create_paper(db, paper_create)
-                        imported_papers.append(new_paper)
-                        successful_imports += 1
-                    except Exception as create_error:
-                        # 如果創建失敗，回滾事務
-                        db.rollback()
-                        error_msg = str(create_error)
-                        if "duplicate key value violates unique constraint" in error_msg:
-                            if "paper_authors_paper_id_author_id_key" in error_msg:
-                                errors.append(f"行 {index + 1}: 作者關聯重複")
-                            else:
-                                errors.append(f"行 {index + 1}: 數據重複")
-                        else:
-                            errors.append(f"行 {index + 1}: 創建論文失敗 - {error_msg}")
-                        failed_imports += 1
-                        
-                else:
-                    failed_imports += 1
-                    for error in row_errors:
-                        errors.append(f"行 {index + 1}: {error}")
-                        
-            except Exception as e:
-                # 如果發生任何其他錯誤，回滾事務
-                db.rollback()
-                failed_imports += 1
-                errors.append(f"行 {index + 1}: {str(e)}")
-        
-        # 清理臨時文件
-        if config.preview_file_id in TEMP_FILES:
-            del TEMP_FILES[config.preview_file_id]
-        
-        return ExcelImportResult(
-            total_rows=total_rows,
-            successful_imports=successful_imports,
-            failed_imports=failed_imports,
-            errors=errors,
-            imported_papers=imported_papers
-        )
+        # 從預覽存放區取走文件（其他請求或 worker 無法再導入同一份）
+        entry = claim_preview(config.preview_file_id)
+        try:
+            return import_rows(
+                db, preview_frames(entry, mapped_columns(config.field_mappings)),
+                lambda frame: map_frame_with_config(frame, config.field_mappings),
+                streaming
+            )
+        finally:
+            # 清理預覽文件
+            discard_preview(entry)
         
     except Exception as e:
         return ExcelImportResult(
@@ -346,261 +235,303 @@ def import_file_with_config(config: ExcelImportConfig, db: Session) -> ExcelImpo
             imported_papers=[]
         )
 
-def clean_string(value: Any) -> Optional[str]:
-    """清理字符串，處理NaN和空值"""
-    if pd.isna(value) or value == '' or str(value).strip() == '':
-        return None
-    return str(value).strip()
-
-def parse_authors(authors_str: str) -> List[str]:
-    """解析作者字符串，Web of Science格式通常是 'Author1, A; Author2, B; Author3, C'"""
-    if not authors_str:
-        return []
+def import_rows(
+    db: Session,
+    frames: Iterable[pd.DataFrame],
+    map_frame: Callable[[pd.DataFrame], Tuple[List[Tuple[int, Dict[str, Any]]], List[str]]],
+    streaming: bool = False,
+    progress: Optional[Callable[[int, int, int, List[str]], None]] = None
+) -> ExcelImportResult:
+    """
+    逐塊映射資料表後交給批次匯入，每 IMPORT_CHUNK_SIZE 列寫入並提交一次。
+    streaming 為 True 時不保留新論文、錯誤訊息最多 STREAMING_MAX_ERRORS 筆，記憶體用量與文件大小無關。
+    每個區塊提交後呼叫 progress(已讀取列數, 已處理列數, 成功數, 新增的錯誤訊息)；
+    progress 拋出的例外會中止導入，已提交的區塊保留。
+    資料表的 attrs['source']（多文件導入時的來源名稱）會加在該表的錯誤訊息之前，
+    attrs['error'] 表示該來源無法解析。
+    """
+    total_rows = 0
+    successful_imports = 0
+    omitted_errors = 0
+    errors = []
+    reported_errors = 0
+    imported_papers = []
+    
+    def report(processed_rows: int):
+        nonlocal reported_errors
+        if progress is not None:
+            new_errors = errors[reported_errors:]
+            reported_errors = len(errors)
+            progress(total_rows, processed_rows, successful_imports, new_errors)
+    
+    def add_errors(messages: List[str], source: Optional[str] = None):
+        nonlocal omitted_errors
+        if source:
+            messages = [f"{source} {message}" for message in messages]
+        if streaming:
+            room = max(STREAMING_MAX_ERRORS - len(errors), 0)
+            omitted_errors += max(len(messages) - room, 0)
+            messages = messages[:room]
+        errors.extend(messages)
+    
+    for df in frames:
+        source = df.attrs.get("source")
+        if df.attrs.get("error"):
+            add_errors([f"{source}: {df.attrs['error']}"])
+            report(total_rows)
+            continue
+        
+        # 行號以各資料表的索引計算，多個資料表時以讀取過的列數換算已處理列數
+        rows_before = total_rows
+        first_row = int(df.index[0]) + 1 if len(df) else 1
+        total_rows += len(df)
+        records, map_errors = map_frame(df)
+        add_errors(map_errors, source)
+        
+        for start in range(0, len(records), IMPORT_CHUNK_SIZE):
+            chunk = records[start:start + IMPORT_CHUNK_SIZE]
+            try:
+                paper_ids, papers, chunk_errors = import_chunk(db, chunk, keep_papers=not streaming)
+            except Exception as e:
+                db.rollback()
+                paper_ids, papers, chunk_errors = [], [], [f"行 {chunk[0][0]}-{chunk[-1][0]}: 批次寫入失敗 - {str(e)}"]
+            successful_imports += len(paper_ids)
+            if not streaming:
+                # 在下一個區塊提交（使物件過期）前轉為回應模型，避免最後逐篇重新載入
+                imported_papers.extend(PaperResponse.model_validate(paper) for paper in papers)
+            add_errors(chunk_errors, source)
+            report(rows_before + chunk[-1][0] - first_row + 1)
+        report(total_rows)
     
-    # 分割作者，使用分號
-    authors = []
-    for author in authors_str.split(';'):
-        author = author.strip()
-        if author:
-            authors.append(author)
+    if omitted_errors:
+        errors.append(f"另有 {omitted_errors} 個錯誤未列出")
     
-    return authors
+    return ExcelImportResult(
+        total_rows=total_rows,
+        successful_imports=successful_imports,
+        failed_imports=total_rows - successful_imports,
+        errors=errors,
+        imported_papers=imported_papers
+    )
 
-def parse_keywords(keywords_str: str) -> List[str]:
-    """解析關鍵字，通常用分號分隔"""
-    if not keywords_str:
-        return []
+# 映射錯誤訊息中的行號與原因
+ROW_ERROR_PATTERN = re.compile(r"^行 (\d+): (.*)$", re.DOTALL)
+
+def dry_run_file_with_config(config: ExcelImportConfig, db: Session) -> ImportDryRunResult:
+    """試導入預覽過的文件：只分類各列，不寫入資料庫，也不取走預覽文件（之後仍可正式導入）"""
+    entry = get_preview(config.preview_file_id)
+    return dry_run_rows(db, preview_frames(entry, mapped_columns(config.field_mappings)), lambda frame: map_frame_with_config(frame, config.field_mappings))
+
+def dry_run_rows(
+    db: Session,
+    frames: Iterable[pd.DataFrame],
+    map_frame: Callable[[pd.DataFrame], Tuple[List[Tuple[int, Dict[str, Any]]], List[str]]]
+) -> ImportDryRunResult:
+    """
+    以與導入相同的映射與驗證規則分類每一列：新論文、DOI 或標題與資料庫重複、與文件中前面的列重複或無效。
+    現有論文的 DOI 與標題鍵只查詢一次載入雜湊表，比對與文件內去重以整欄運算完成。
+    """
+    doi_ids, title_ids = load_paper_keys(db)
+    total_rows = 0
+    invalid: List[Tuple[int, str]] = []
+    row_numbers, dois, titles = [], [], []
+    for df in frames:
+        total_rows += len(df)
+        records, errors = map_frame(df)
+        for message in errors:
+            match = ROW_ERROR_PATTERN.match(message)
+            if match:
+                invalid.append((int(match[1]), match[2]))
+        for row_number, data in records:
+            error = validation_error(data)
+            if error is not None:
+                invalid.append((row_number, str(error)))
+                continue
+            row_numbers.append(row_number)
+            dois.append(data.get('doi'))
+            titles.append(data['title'])
     
-    keywords = []
-    for keyword in keywords_str.split(';'):
-        keyword = keyword.strip()
-        if keyword:
-            keywords.append(keyword)
+    doi_keys = pd.Series(dois, dtype=object).map(normalize_doi)
+    title_keys = pd.Series(titles, dtype=object).map(paper_title_key)
+    doi_matches = doi_keys.map(doi_ids)
+    title_matches = title_keys.map(title_ids)
+    status = pd.Series(
+        np.select([doi_matches.notna(), title_matches.notna()], ['doi_duplicate', 'title_duplicate'], 'new'),
+        dtype=object
+    )
+    # 與文件中前面的新列 DOI 或標題相同（導入時前面的列會先寫入，這些列因此被判為已存在）
+    new = status == 'new'
+    repeated = ((doi_keys != "") & doi_keys.where(new).duplicated()) | ((title_keys != "") & title_keys.where(new).duplicated())
+    status[new & repeated] = 'file_duplicate'
+    existing = doi_matches.fillna(title_matches)
+    
+    rows = [
+        ImportDryRunRow(row=row, status=row_status, existing_paper_id=None if pd.isna(paper_id) else int(paper_id))
+        for row, row_status, paper_id in zip(row_numbers, status.tolist(), existing.tolist())
+    ]
+    rows.extend(ImportDryRunRow(row=row, status='invalid', message=message) for row, message in invalid)
+    rows.sort(key=lambda item: item.row)
     
-    return keywords
+    counts = status.value_counts()
+    return ImportDryRunResult(
+        total_rows=total_rows,
+        new=int(counts.get('new', 0)),
+        doi_duplicates=int(counts.get('doi_duplicate', 0)),
+        title_duplicates=int(counts.get('title_duplicate', 0)),
+        file_duplicates=int(counts.get('file_duplicate', 0)),
+        invalid=len(invalid),
+        rows=rows
+    )
+
+# 從日期字串中擷取年份的正則表達式
+YEAR_PATTERN = r'\b(\d{4})\b'
+# 作者與關鍵字的分隔符號（連同前後空白）
+LIST_SEPARATOR = r'\s*(?:;\s*)+'
+
+def frame_column(df: pd.DataFrame, column: Optional[str]) -> pd.Series:
+    """取得資料表的欄位；未映射或不存在時回傳全為空值的欄位"""
+    if not column or column not in df.columns:
+        return pd.Series(None, index=df.index, dtype=object)
+    return df[column]
+
+def clean_column(df: pd.DataFrame, column: Optional[str]) -> pd.Series:
+    """整欄清理字符串：去除前後空白，NaN 與空字串轉為 None"""
+    values = frame_column(df, column).astype("string").str.strip()
+    values = values.mask(values == "")
+    return values.astype(object).where(values.notna(), None)
+
+def split_dates(values: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """
+    分出日期值（Excel 日期儲存格讀成 datetime64 欄位，或 object 欄位中的 datetime/date），
+    回傳 (日期值的年份, 其餘的值)；直接轉數字會得到 epoch 整數。
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.dt.year.astype("float64"), pd.Series(np.nan, index=values.index)
+    is_date = values.map(lambda value: isinstance(value, (datetime, date))).astype(bool)
+    if not is_date.any():
+        return pd.Series(np.nan, index=values.index), values
+    years = values.where(is_date).map(lambda value: value.year, na_action="ignore").astype("float64")
+    return years, values.mask(is_date)
 
-def extract_year_from_date(date_str: str) -> Optional[int]:
-    """從日期字符串中提取年份"""
-    if not date_str:
-        return None
+def parse_years(values: pd.Series) -> pd.Series:
+    """整欄解析年份：日期值取其年份，能轉為數字者取整數，其餘以正則擷取四位數年份；無法解析者為 NaN"""
+    date_years, values = split_dates(values)
+    numeric = pd.to_numeric(values, errors="coerce")
+    extracted = values.astype("string").str.extract(YEAR_PATTERN, expand=False)
+    return np.trunc(date_years.fillna(numeric).fillna(pd.to_numeric(extracted, errors="coerce")))
+
+def parse_counts(values: pd.Series) -> pd.Series:
+    """整欄解析引用數，無法轉為數字者為 0"""
+    return np.trunc(pd.to_numeric(values, errors="coerce").fillna(0)).astype("int64")
+
+def split_column(values: pd.Series) -> pd.Series:
+    """整欄以分號切分作者或關鍵字，去除空白與空項目"""
+    # 先以正則將分隔符號（含前後空白與連續分號）統一為單一分號，再用非正則的切分
+    joined = values.astype("string").str.replace(LIST_SEPARATOR, ";", regex=True).str.strip().str.strip(";")
+    parts = joined.mask(joined == "").str.split(";")
+    return pd.Series([items if isinstance(items, list) else [] for items in parts], index=values.index, dtype=object)
+
+def collect_records(df: pd.DataFrame, fields: Dict[str, pd.Series]) -> Tuple[List[Tuple[int, Dict[str, Any]]], List[str]]:
+    """以布林遮罩標出無效的列，回傳 (有效列的 (行號, 論文數據), 錯誤訊息)"""
+    row_numbers = df.index + 1
+    title_missing = fields['title'].isna().to_numpy()
+    year_missing = (fields['publication_year'].isna() | (fields['publication_year'] == 0)).to_numpy() & ~title_missing
     
-    # 嘗試提取年份的正則表達式
-    year_match = re.search(r'\b(\d{4})\b', str(date_str))
-    if year_match:
-        return int(year_match.group(1))
+    errors = [f"行 {row_number}: 標題為空" for row_number in row_numbers[title_missing]]
+    errors.extend(f"行 {row_number}: 無法確定發表年份" for row_number in row_numbers[year_missing])
     
-    return None
+    valid = ~(title_missing | year_missing)
+    columns = {name: values[valid] for name, values in fields.items()}
+    columns['publication_year'] = columns['publication_year'].astype("int64")
+    names = list(columns)
+    records = [
+        (int(row_number), dict(zip(names, values)))
+        for row_number, *values in zip(row_numbers[valid], *(columns[name].tolist() for name in names))
+    ]
+    return records, errors
 
-def get_or_create_author(db: Session, author_name: str) -> Optional[Author]:
-    """獲取或創建作者"""
-    try:
-        # 清理作者名稱
-        clean_name = author_name.strip()
-        if not clean_name:
-            return None
-            
-        # 先嘗試按名稱查找（區分大小寫）
-        author = db.query(Author).filter(Author.name == clean_name).first()
-        if author:
-            return author
-        
-        # 嘗試不區分大小寫的查找
-        author = db.query(Author).filter(func.lower(Author.name) == func.lower(clean_name)).first()
-        if author:
-            return author
-        
-        # 如果不存在，創建新作者
-        try:
-            from schemas import AuthorCreate
-            author_data = AuthorCreate(name=clean_name)
-            new_author = create_author(db, author_data)
-            return new_author
-        except Exception as create_error:
-            # 如果創建時發生重複錯誤，再次嘗試查找（可能是併發創建）
-            if "duplicate key" in str(create_error).lower():
-                db.rollback()
-                author = db.query(Author).filter(Author.name == clean_name).first()
-                if author:
-                    return author
-            raise create_error
-            
-    except Exception as e:
-        print(f"創建或獲取作者 {author_name} 時出錯: {e}")
-        db.rollback()
-        return None
+# map_wos_frame 會讀取的欄位，導入 WoS 匯出時只建立這些欄位
+WOS_COLUMNS = readers.RECORD_COLUMNS
 
-def get_or_create_venue(db: Session, venue_name: str, venue_type: str = "journal") -> Optional[Venue]:
-    """獲取或創建期刊/會議"""
-    try:
-        # 先嘗試按名稱查找
-        venue = db.query(Venue).filter(Venue.name == venue_name).first()
-        if venue:
-            return venue
-        
-        # 如果不存在，創建新期刊/會議
-        from schemas import VenueCreate
-        venue_data = VenueCreate(name=venue_name, type=venue_type)
-        return create_venue(db, venue_data)
-    except Exception as e:
-        print(f"創建或獲取期刊/會議 {venue_name} 時出錯: {e}")
-        return None
+def map_wos_frame(df: pd.DataFrame) -> Tuple[List[Tuple[int, Dict[str, Any]]], List[str]]:
+    """以整欄向量化運算將 Web of Science 匯出的資料表映射為論文數據"""
+    # 發表年份優先使用 Publication Year，缺少時從 Publication Date 擷取
+    date_years, years = split_dates(frame_column(df, 'Publication Year'))
+    years = date_years.fillna(pd.to_numeric(years, errors="coerce"))
+    years = np.trunc(years.fillna(parse_years(frame_column(df, 'Publication Date'))))
+    
+    # 根據Publication Type判斷類型
+    publication_type = clean_column(df, 'Publication Type').str.upper()
+    venue_type = pd.Series('journal', index=df.index, dtype=object).mask(
+        publication_type.isin(['P', 'PROCEEDINGS']), 'conference'
+    )
+    
+    # 合併兩種關鍵字並去重（保留順序）
+    keywords = [
+        list(dict.fromkeys(author_keywords + keywords_plus))
+        for author_keywords, keywords_plus in zip(
+            split_column(frame_column(df, 'Author Keywords')),
+            split_column(frame_column(df, 'Keywords Plus'))
+        )
+    ]
+    
+    fields = {
+        'title': clean_column(df, 'Article Title'),
+        'abstract': clean_column(df, 'Abstract'),
+        'publication_year': years,
+        'doi': clean_column(df, 'DOI'),
+        'citation_count': parse_counts(frame_column(df, 'Times Cited, WoS Core')),
+        'url': clean_column(df, 'URL'),
+        'venue': clean_column(df, 'Source Title'),
+        'venue_type': venue_type,
+        'keywords': pd.Series(keywords, index=df.index, dtype=object),
+        'authors': split_column(frame_column(df, 'Authors')),
+    }
+    return collect_records(df, fields)
 
-def map_excel_row_to_paper(row: pd.Series, db: Session) -> Tuple[Optional[Dict[str, Any]], List[str]]:
-    """將Excel行映射為論文數據"""
-    errors = []
+def dedupe_across_frames(
+    map_frame: Callable[[pd.DataFrame], Tuple[List[Tuple[int, Dict[str, Any]]], List[str]]]
+) -> Callable[[pd.DataFrame], Tuple[List[Tuple[int, Dict[str, Any]]], List[str]]]:
+    """包裝映射函數：跨資料表以標準化 DOI 或標題去除重複的列，只保留最先讀到的一筆"""
+    seen: Dict[Tuple[str, str], str] = {}
+    
+    def map_unique(df: pd.DataFrame):
+        records, errors = map_frame(df)
+        source = df.attrs.get("source")
+        unique = []
+        for row_number, data in records:
+            keys = [key for key in (('doi', normalize_doi(data.get('doi'))), ('title', paper_title_key(data.get('title')))) if key[1]]
+            first = next((seen[key] for key in keys if key in seen), None)
+            if first is not None:
+                errors.append(f"行 {row_number}: 與 {first} 重複")
+                continue
+            for key in keys:
+                seen[key] = f"{source} 行 {row_number}" if source else f"行 {row_number}"
+            unique.append((row_number, data))
+        return unique, errors
     
+    return map_unique
+
+def import_files(db: Session, files: List[Tuple[str, str]], streaming: bool = False) -> ExcelImportResult:
+    """
+    一次導入多個 Web of Science 匯出文件（路徑, 原始文件名）：每個文件的每個工作表在行程池中平行解析，
+    依解析完成的順序導入，跨文件重複的論文只導入一次。
+    """
     try:
-        # 基本字段映射
-        title = clean_string(row.get('Article Title'))
-        if not title:
-            errors.append("標題為空")
-            return None, errors
-        
-        abstract = clean_string(row.get('Abstract'))
-        doi = clean_string(row.get('DOI'))
-        
-        # 處理發表年份
-        publication_year = None
-        if 'Publication Year' in row and not pd.isna(row['Publication Year']):
-            publication_year = int(row['Publication Year'])
-        elif 'Publication Date' in row:
-            publication_year = extract_year_from_date(str(row['Publication Date']))
-        
-        if not publication_year:
-            errors.append("無法確定發表年份")
-            return None, errors
-        
-        # 引用數
-        citation_count = 0
-        if 'Times Cited, WoS Core' in row and not pd.isna(row['Times Cited, WoS Core']):
-            try:
-                citation_count = int(row['Times Cited, WoS Core'])
-            except:
-                citation_count = 0
-        
-        # 處理期刊/會議
-        venue_id = None
-        source_title = clean_string(row.get('Source Title'))
-        if source_title:
-            # 根據Publication Type判斷類型
-            venue_type = "journal"
-            if 'Publication Type' in row:
-                pub_type = clean_string(row['Publication Type'])
-                if pub_type and pub_type.upper() in ['P', 'PROCEEDINGS']:
-                    venue_type = "conference"
-            
-            venue = get_or_create_venue(db, source_title, venue_type)
-            if venue:
-                venue_id = venue.id
-        
-        # 處理關鍵字
-        keywords = []
-        if 'Author Keywords' in row:
-            author_keywords = parse_keywords(clean_string(row['Author Keywords']) or "")
-            keywords.extend(author_keywords)
-        
-        if 'Keywords Plus' in row:
-            keywords_plus = parse_keywords(clean_string(row['Keywords Plus']) or "")
-            keywords.extend(keywords_plus)
-        
-        # 去重
-        keywords = list(set(keywords))
-        
-        # 處理作者
-        author_ids = []
-        if 'Authors' in row:
-            authors_str = clean_string(row['Authors'])
-            if authors_str:
-                authors = parse_authors(authors_str)
-                for author_name in authors:
-                    author = get_or_create_author(db, author_name)
-                    if author:
-                        author_ids.append(author.id)
-        
-        paper_data = {
-            'title': title,
-            'abstract': abstract,
-            'publication_year': publication_year,
-            'doi': doi,
-            'citation_count': citation_count,
-            'venue_id': venue_id,
-            'keywords': keywords,
-            'author_ids': author_ids
-        }
-        
-        return paper_data, errors
-        
+        return import_rows(db, parse_files_parallel(files, WOS_COLUMNS), dedupe_across_frames(map_wos_frame), streaming)
     except Exception as e:
-        errors.append(f"處理行數據時出錯: {str(e)}")
-        return None, errors
+        return ExcelImportResult(
+            total_rows=0,
+            successful_imports=0,
+            failed_imports=0,
+            errors=[f"讀取文件時出錯: {str(e)}"],
+            imported_papers=[]
+        )
 
-def import_file(db: Session, file_content: bytes, filename: str) -> ExcelImportResult:
+def import_file(db: Session, path: str, filename: str, streaming: bool = False) -> ExcelImportResult:
     """導入文件（支持Excel、CSV、TSV）"""
     try:
-        # 根據文件擴展名讀取不同格式的文件
-        file_ext = filename.lower().split('.')[-1]
-        
-        if file_ext in ['xlsx', 'xls']:
-            df = pd.read_excel(file_content)
-        elif file_ext == 'csv':
-            df = pd.read_csv(io.BytesIO(file_content))
-        elif file_ext == 'tsv':
-            df = pd.read_csv(io.BytesIO(file_content), sep='\t')
-        else:
-            raise Exception(f"不支持的文件格式: {file_ext}")
-        
-        total_rows = len(df)
-        successful_imports = 0
-        failed_imports = 0
-        errors = []
-        imported_papers = []
-        
-        for index, row in df.iterrows():
-            try:
-                paper_data, row_errors = map_excel_row_to_paper(row, db)
-                
-                if paper_data:
-                    # 創建論文
-                    from schemas import PaperCreate
-                    paper_create = PaperCreate(**paper_data)
-                    
-                    # 檢查DOI是否已存在
-                    if paper_data.get('doi'):
-                        existing_paper = db.query(Paper).filter(Paper.doi == paper_data['doi']).first()
-                        if existing_paper:
-                            errors.append(f"行 {index + 1}: DOI {paper_data['doi']} 已存在")
-                            failed_imports += 1
-                            continue
-                    
-                    # 檢查標題是否已存在
-                    existing_paper = db.query(Paper).filter(Paper.title == paper_data['title']).first()
-                    if existing_paper:
-                        errors.append(f"行 {index + 1}: 標題 '{paper_data['title'][:50]}...' 已存在")
-                        failed_imports += 1
-                        continue
-                    
-                    from crud import create_paper
-                    new_paper = create_paper(db, paper_create)
-                    imported_papers.append(new_paper)
-                    successful_imports += 1
-                    
-                else:
-                    failed_imports += 1
-                    for error in row_errors:
-                        errors.append(f"行 {index + 1}: {error}")
-                        
-            except Exception as e:
-                failed_imports += 1
-                errors.append(f"行 {index + 1}: {str(e)}")
-        
-        return ExcelImportResult(
-            total_rows=total_rows,
-            successful_imports=successful_imports,
-            failed_imports=failed_imports,
-            errors=errors,
-            imported_papers=imported_papers
-        )
-        
+        return import_rows(db, read_frames(path, filename, usecols=WOS_COLUMNS), map_wos_frame, streaming)
     except Exception as e:
         return ExcelImportResult(
             total_rows=0,
@@ -610,64 +541,10 @@ def import_file(db: Session, file_content: bytes, filename: str) -> ExcelImportR
             imported_papers=[]
         )
 
-def import_excel_file(db: Session, file_content: bytes) -> ExcelImportResult:
+def import_excel_file(db: Session, path: str) -> ExcelImportResult:
     """導入Excel文件（兼容性函數）"""
     try:
-        # 讀取Excel文件
-        df = pd.read_excel(file_content)
-        
-        total_rows = len(df)
-        successful_imports = 0
-        failed_imports = 0
-        errors = []
-        imported_papers = []
-        
-        for index, row in df.iterrows():
-            try:
-                paper_data, row_errors = map_excel_row_to_paper(row, db)
-                
-                if paper_data:
-                    # 創建論文
-                    from schemas import PaperCreate
-                    paper_create = PaperCreate(**paper_data)
-                    
-                    # 檢查DOI是否已存在
-                    if paper_data.get('doi'):
-                        existing_paper = db.query(Paper).filter(Paper.doi == paper_data['doi']).first()
-                        if existing_paper:
-                            errors.append(f"行 {index + 1}: DOI {paper_data['doi']} 已存在")
-                            failed_imports += 1
-                            continue
-                    
-                    # 檢查標題是否已存在
-                    existing_paper = db.query(Paper).filter(Paper.title == paper_data['title']).first()
-                    if existing_paper:
-                        errors.append(f"行 {index + 1}: 標題 '{paper_data['title'][:50]}...' 已存在")
-                        failed_imports += 1
-                        continue
-                    
-                    from crud import create_paper
-                    new_paper = create_paper(db, paper_create)
-                    imported_papers.append(new_paper)
-                    successful_imports += 1
-                    
-                else:
-                    failed_imports += 1
-                    for error in row_errors:
-                        errors.append(f"行 {index + 1}: {error}")
-                        
-            except Exception as e:
-                failed_imports += 1
-                errors.append(f"行 {index + 1}: {str(e)}")
-        
-        return ExcelImportResult(
-            total_rows=total_rows,
-            successful_imports=successful_imports,
-            failed_imports=failed_imports,
-            errors=errors,
-            imported_papers=imported_papers
-        )
-        
+        return import_rows(db, read_frames(path, "upload.xlsx", usecols=WOS_COLUMNS), map_wos_frame)
     except Exception as e:
         return ExcelImportResult(
             total_rows=0,
@@ -675,4 +552,4 @@ def import_excel_file(db: Session, file_content: bytes) -> ExcelImportResult:
             failed_imports=0,
             errors=[f"讀取Excel文件時出錯: {str(e)}"],
             imported_papers=[]
-        ) 
\ No newline at end of file
+        )
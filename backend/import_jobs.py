@@ -0,0 +1,149 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List, Optional
+
+import pandas as pd
+
+from sqlalchemy import insert, update, func
+from sqlalchemy.orm import Session
+
+from models import ImportJob, ImportJobError
+from excel_import import import_rows
+
+# 同時執行的背景匯入工作數，其餘在佇列中等待
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", "2"))
+
+# 行程內的匯入工作池
+executor = ThreadPoolExecutor(max_workers=IMPORT_WORKERS, thread_name_prefix="import")
+
+class ImportCancelled(Exception):
+    """使用者取消了匯入工作"""
+
+def submit_import_job(
+    session_factory,
+    filename: str,
+    open_frames: Callable[[], Iterable[pd.DataFrame]],
+    map_frame: Callable,
+    cleanup: Callable[[], None]
+) -> ImportJob:
+    """建立匯入工作紀錄並排入工作池；工作結束後呼叫 cleanup 刪除暫存文件"""
+    db = session_factory()
+    try:
+        job = ImportJob(filename=filename, status='queued')
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        db.expunge(job)
+    except Exception:
+        cleanup()
+        raise
+    finally:
+        db.close()
+    executor.submit(run_import_job, session_factory, job.id, open_frames, map_frame, cleanup)
+    return job
+
+def cancel_import_job(db: Session, job_id: int) -> Optional[ImportJob]:
+    """要求取消匯入工作；佇列中的工作直接取消，執行中的工作在目前區塊提交後停止。已結束時拋出 ValueError"""
+    job = db.get(ImportJob, job_id)
+    if job is None:
+        return None
+    # 以條件更新設定旗標，與工作開始執行的狀態轉換互不覆蓋
+    db.execute(
+        update(ImportJob)
+        .where(ImportJob.id == job_id, ImportJob.status == 'queued')
+        .values(status='cancelled', cancel_requested=True, finished_at=func.now())
+    )
+    db.execute(
+        update(ImportJob)
+        .where(ImportJob.id == job_id, ImportJob.status == 'running')
+        .values(cancel_requested=True)
+    )
+    db.commit()
+    db.refresh(job)
+    if not job.cancel_requested:
+        raise ValueError(f"匯入工作已結束（{job.status}）")
+    return job
+
+def get_import_job_errors(db: Session, job_id: int, after_id: int = 0, limit: int = 100) -> List[ImportJobError]:
+    """依 id 遞增回傳 after_id 之後的錯誤訊息，輪詢時以最後一筆的 id 續讀"""
+    return db.query(ImportJobError).filter(
+        ImportJobError.job_id == job_id,
+        ImportJobError.id > after_id
+    ).order_by(ImportJobError.id).limit(limit).all()
+
+def fail_interrupted_jobs(session_factory):
+    """服務啟動時將上次未完成的工作標記為失敗（工作池與暫存文件都已不存在）"""
+    db = session_factory()
+    try:
+        db.execute(
+            update(ImportJob)
+            .where(ImportJob.status.in_(['queued', 'running']))
+            .values(status='failed', error="服務重新啟動，匯入中斷", finished_at=func.now())
+        )
+        db.commit()
+    finally:
+        db.close()
+
+def run_import_job(
+    session_factory,
+    job_id: int,
+    open_frames: Callable[[], Iterable[pd.DataFrame]],
+    map_frame: Callable,
+    cleanup: Callable[[], None]
+):
+    """工作池執行緒：串流匯入文件，每個區塊提交後更新進度並檢查是否被取消"""
+    db = session_factory()
+    job_db = session_factory()
+    try:
+        # 以條件更新開始工作，避免與取消佇列中工作的請求互相覆蓋
+        started = job_db.execute(
+            update(ImportJob)
+            .where(ImportJob.id == job_id, ImportJob.status == 'queued')
+            .values(status='running', started_at=func.now())
+        ).rowcount
+        job_db.commit()
+        if not started:
+            return
+        job = job_db.get(ImportJob, job_id)
+        stored_errors = 0
+
+        def progress(total_rows: int, processed_rows: int, successful_imports: int, new_errors: List[str]):
+            nonlocal stored_errors
+            job.total_rows = total_rows
+            job.processed_rows = processed_rows
+            job.successful_imports = successful_imports
+            job.failed_imports = processed_rows - successful_imports
+            stored_errors += len(new_errors)
+            if new_errors:
+                job_db.execute(insert(ImportJobError), [{"job_id": job_id, "message": message} for message in new_errors])
+            job_db.commit()
+            # 提交後屬性已過期，讀取時會重新載入，可看到其他請求設定的取消旗標
+            if job.cancel_requested:
+                raise ImportCancelled()
+
+        try:
+            result = import_rows(db, open_frames(), map_frame, streaming=True, progress=progress)
+            job.status = 'completed'
+            # 錯誤數超過上限時最後附加的摘要
+            for message in result.errors[stored_errors:]:
+                job_db.add(ImportJobError(job_id=job_id, message=message))
+            print(f"匯入工作 #{job_id} 完成：{result.successful_imports}/{result.total_rows} 列")
+        except ImportCancelled:
+            job.status = 'cancelled'
+            print(f"匯入工作 #{job_id} 已取消")
+        job.finished_at = func.now()
+        job_db.commit()
+    except Exception as e:
+        db.rollback()
+        job_db.rollback()
+        job = job_db.get(ImportJob, job_id)
+        if job is not None:
+            job.status = 'failed'
+            job.error = str(e)
+            job.finished_at = func.now()
+            job_db.commit()
+        print(f"匯入工作 #{job_id} 失敗: {e}")
+    finally:
+        db.close()
+        job_db.close()
+        cleanup()
@@ -1,11 +1,12 @@
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Query
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Query, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import os
 from datetime import datetime
 
-from database import get_db, engine
+from database import get_db, engine, SessionLocal
+from db_migrations import apply_migrations
 from models import Base, Paper, Author, PaperAuthor, Tag, PaperTag, Venue
 from schemas import (
     PaperCreate, PaperResponse, PaperUpdate,
@@ -13,6 +14,7 @@ from schemas import (
     TagCreate, TagResponse,
     VenueCreate, VenueResponse,
     YearCount, VenueCount, TagCount,
+    PaperPage, FacetedPaperPage,
     SearchFilters,
     ComplexSearchQuery,
     ExcelImportResult,
@@ -20,24 +22,51 @@ from schemas import (
     ExcelImportConfig,
     BatchTagOperation,
     BatchTagResult,
+    DuplicateScanRunResponse, DuplicateClusterResponse,
+    DuplicateResolveRequest, DuplicateResolveResult, DuplicateCheckResult,
+    ImportJobResponse, ImportJobErrorResponse, ImportDryRunResult,
     PDFInfoResponse
 )
 from crud import (
-    create_paper, get_papers, get_paper, update_paper, delete_paper,
+    create_paper, get_papers, get_papers_page, get_paper, update_paper, delete_paper,
+    find_similar_papers, find_duplicate_papers,
     get_year_distribution, get_venue_distribution, get_tag_distribution,
     create_author, get_authors,
     create_tag, get_tags,
     create_venue, get_venues,
-    search_papers, search_papers_complex, search_related_papers,
+    search_papers, search_papers_complex, search_related_papers, check_duplicates_batch,
+    search_papers_page, search_papers_complex_page,
+    search_papers_faceted, search_papers_complex_faceted,
+    count_search_papers, count_search_papers_complex,
     batch_add_tags_to_papers, batch_remove_tags_from_papers,
-    count_all_papers, count_papers_with_tag
+    count_all_papers, count_papers_with_tag,
+    get_duplicate_clusters, resolve_duplicate_clusters, dismiss_duplicate_cluster
 )
+from result_cache import search_cache, make_cache_key
+from bm25_index import init_search_index, save_search_index
+from duplicate_scan import start_duplicate_scan, run_duplicate_scan
+from models import DuplicateScanRun, ImportJob
+from query_compiler import compile_filter_group, compiled_cache_info
 from minio_client import upload_file, download_file, delete_file
-from excel_import import import_excel_file, preview_file, get_default_field_mappings, import_file_with_config, import_file
+from excel_import import (
+    import_excel_file, preview_file, get_default_field_mappings, import_file_with_config, import_file, import_files,
+    dry_run_file_with_config,
+    dedupe_across_frames, save_upload, remove_temp_file, read_frames, preview_frames, mapped_columns, map_frame_with_config, map_wos_frame, WOS_COLUMNS
+)
+from preview_store import claim_preview, discard_preview
+from parallel_parse import parse_files_parallel
+from readers import is_supported, UNSUPPORTED_FORMAT_DETAIL
+from import_jobs import submit_import_job, cancel_import_job, get_import_job_errors, fail_interrupted_jobs
 from pdf_parser import parse_pdf_for_metadata
 
 # 創建數據庫表
 Base.metadata.create_all(bind=engine)
+# 升級既有資料庫結構（全文搜索向量、索引等）
+apply_migrations(engine)
+# 載入（或重建）行程內 BM25 搜索索引，SEARCH_ENGINE=bm25 時才啟用
+init_search_index(SessionLocal)
+# 上次執行時未完成的背景匯入工作已無法繼續
+fail_interrupted_jobs(SessionLocal)
 
 app = FastAPI(
     title="研究室論文管理系統 API",
@@ -45,6 +74,11 @@ app = FastAPI(
     version="1.0.0"
 )
 
+@app.on_event("shutdown")
+def save_search_index_on_shutdown():
+    """關閉服務前將索引的增量更新寫入磁碟"""
+    save_search_index()
+
 # CORS 設置
 app.add_middleware(
     CORSMiddleware,
@@ -85,8 +119,26 @@ async def read_papers(
     db: Session = Depends(get_db)
 ):
     """獲取論文列表"""
-    papers = get_papers(db, skip=skip, limit=limit)
-    return papers
+    key = make_cache_key("papers", skip, limit)
+    return search_cache.get_or_compute(key, lambda: [
+        PaperResponse.model_validate(paper) for paper in get_papers(db, skip=skip, limit=limit)
+    ])
+
+@app.get("/papers/paged/", response_model=PaperPage)
+async def read_papers_paged(
+    cursor: Optional[str] = Query(None, description="上一頁回傳的 next_cursor"),
+    limit: int = Query(100, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    """以游標分頁獲取論文列表"""
+    def compute():
+        papers, next_cursor = get_papers_page(db, cursor=cursor, limit=limit)
+        return PaperPage(items=papers, next_cursor=next_cursor)
+
+    try:
+        return search_cache.get_or_compute(make_cache_key("papers_paged", cursor, limit), compute)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/papers/{paper_id}", response_model=PaperResponse)
 async def read_paper(paper_id: int, db: Session = Depends(get_db)):
@@ -103,7 +155,10 @@ async def update_paper_endpoint(
     db: Session = Depends(get_db)
 ):
     """更新論文信息"""
-    updated_paper = update_paper(db=db, paper_id=paper_id, paper=paper)
+    try:
+        updated_paper = update_paper(db=db, paper_id=paper_id, paper=paper)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     if updated_paper is None:
         raise HTTPException(status_code=404, detail="論文未找到")
     return updated_paper
@@ -119,6 +174,7 @@ async def delete_paper_endpoint(paper_id: int, db: Session = Depends(get_db)):
 # 多條件搜索端點
 @app.get("/papers/search/", response_model=List[PaperResponse])
 async def search_papers_endpoint(
+    keyword: Optional[str] = Query(None, description="全文關鍵字（標題、關鍵字、摘要）"),
     title_keyword: Optional[str] = Query(None, description="標題關鍵字"),
     author_name: Optional[str] = Query(None, description="作者姓名"),
     year_from: Optional[int] = Query(None, description="起始年份"),
@@ -128,12 +184,46 @@ async def search_papers_endpoint(
     abstract_keyword: Optional[str] = Query(None, description="摘要關鍵字"),
     venue_id: Optional[int] = Query(None, description="期刊/會議ID"),
     tags: Optional[List[str]] = Query(None, description="標籤"),
+    sort_by: Optional[str] = Query(None, description="排序方式，'relevance' 依全文相關度排序"),
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db)
 ):
     """多條件搜索論文"""
     filters = SearchFilters(
+        keyword=keyword,
+        title_keyword=title_keyword,
+        author_name=author_name,
+        year_from=year_from,
+        year_to=year_to,
+        min_citations=min_citations,
+        max_citations=max_citations,
+        abstract_keyword=abstract_keyword,
+        venue_id=venue_id,
+        tags=tags,
+        sort_by=sort_by
+    )
+    key = make_cache_key("search", filters.model_dump(), skip, limit)
+    return search_cache.get_or_compute(key, lambda: [
+        PaperResponse.model_validate(paper) for paper in search_papers(db=db, filters=filters, skip=skip, limit=limit)
+    ])
+
+def search_filters_from_query(
+    keyword: Optional[str] = Query(None, description="全文關鍵字（標題、關鍵字、摘要）"),
+    title_keyword: Optional[str] = Query(None, description="標題關鍵字"),
+    author_name: Optional[str] = Query(None, description="作者姓名"),
+    year_from: Optional[int] = Query(None, description="起始年份"),
+    year_to: Optional[int] = Query(None, description="結束年份"),
+    min_citations: Optional[int] = Query(None, description="最小引用數"),
+    max_citations: Optional[int] = Query(None, description="最大引用數"),
+    abstract_keyword: Optional[str] = Query(None, description="摘要關鍵字"),
+    venue_id: Optional[int] = Query(None, description="期刊/會議ID"),
+    tags: Optional[List[str]] = Query(None, description="標籤"),
+    sort_by: Optional[str] = Query(None, description="排序方式，'relevance' 依全文相關度排序")
+) -> SearchFilters:
+    """從查詢字串構建搜索條件（供分頁與分面搜索端點共用）"""
+    return SearchFilters(
+        keyword=keyword,
         title_keyword=title_keyword,
         author_name=author_name,
         year_from=year_from,
@@ -142,9 +232,50 @@ async def search_papers_endpoint(
         max_citations=max_citations,
         abstract_keyword=abstract_keyword,
         venue_id=venue_id,
-        tags=tags
+        tags=tags,
+        sort_by=sort_by
     )
-    return search_papers(db=db, filters=filters, skip=skip, limit=limit)
+
+@app.get("/papers/search/paged/", response_model=PaperPage)
+async def search_papers_paged_endpoint(
+    filters: SearchFilters = Depends(search_filters_from_query),
+    cursor: Optional[str] = Query(None, description="上一頁回傳的 next_cursor"),
+    limit: int = Query(100, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    """多條件搜索論文（游標分頁）"""
+    def compute():
+        papers, next_cursor = search_papers_page(db=db, filters=filters, cursor=cursor, limit=limit)
+        page = PaperPage(items=papers, next_cursor=next_cursor)
+        # 只在第一頁計算總數，後續頁沿用第一頁的結果
+        if cursor is None:
+            page.total, page.total_is_exact = count_search_papers(db, filters)
+        return page
+
+    try:
+        return search_cache.get_or_compute(make_cache_key("search_paged", filters.model_dump(), cursor, limit), compute)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/papers/search/faceted/", response_model=FacetedPaperPage)
+async def search_papers_faceted_endpoint(
+    filters: SearchFilters = Depends(search_filters_from_query),
+    cursor: Optional[str] = Query(None, description="上一頁回傳的 next_cursor"),
+    limit: int = Query(100, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    """多條件搜索論文，並回傳結果集的年份、期刊/會議、標籤與文件類型分布"""
+    def compute():
+        papers, next_cursor, facets = search_papers_faceted(db=db, filters=filters, cursor=cursor, limit=limit)
+        return FacetedPaperPage(
+            items=papers, next_cursor=next_cursor, facets=facets,
+            total=facets["total"], total_is_exact=True
+        )
+
+    try:
+        return search_cache.get_or_compute(make_cache_key("search_faceted", filters.model_dump(), cursor, limit), compute)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 # 複雜查詢搜索端點
 @app.post("/papers/search/complex/", response_model=List[PaperResponse])
@@ -155,7 +286,56 @@ async def search_papers_complex_endpoint(
     db: Session = Depends(get_db)
 ):
     """處理複雜的 AND/OR 搜索查詢"""
-    return search_papers_complex(db=db, query_data=query, skip=skip, limit=limit)
+    # 以標準化後的查詢形狀與參數作為快取鍵，忽略前端產生的條件 ID
+    compiled, params = compile_filter_group(query.root)
+    key = make_cache_key("search_complex", compiled.shape, params, skip, limit)
+    return search_cache.get_or_compute(key, lambda: [
+        PaperResponse.model_validate(paper) for paper in search_papers_complex(db=db, query_data=query, skip=skip, limit=limit)
+    ])
+
+@app.post("/papers/search/complex/paged/", response_model=PaperPage)
+async def search_papers_complex_paged_endpoint(
+    query: ComplexSearchQuery,
+    cursor: Optional[str] = Query(None, description="上一頁回傳的 next_cursor"),
+    limit: int = Query(100, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    """處理複雜的 AND/OR 搜索查詢（游標分頁）"""
+    def compute():
+        papers, next_cursor = search_papers_complex_page(db=db, query_data=query, cursor=cursor, limit=limit)
+        page = PaperPage(items=papers, next_cursor=next_cursor)
+        if cursor is None:
+            page.total, page.total_is_exact = count_search_papers_complex(db, query)
+        return page
+
+    compiled, params = compile_filter_group(query.root)
+    key = make_cache_key("search_complex_paged", compiled.shape, params, cursor, limit)
+    try:
+        return search_cache.get_or_compute(key, compute)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/papers/search/complex/faceted/", response_model=FacetedPaperPage)
+async def search_papers_complex_faceted_endpoint(
+    query: ComplexSearchQuery,
+    cursor: Optional[str] = Query(None, description="上一頁回傳的 next_cursor"),
+    limit: int = Query(100, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    """處理複雜的 AND/OR 搜索查詢，並回傳結果集的分面統計"""
+    def compute():
+        papers, next_cursor, facets = search_papers_complex_faceted(db=db, query_data=query, cursor=cursor, limit=limit)
+        return FacetedPaperPage(
+            items=papers, next_cursor=next_cursor, facets=facets,
+            total=facets["total"], total_is_exact=True
+        )
+
+    compiled, params = compile_filter_group(query.root)
+    key = make_cache_key("search_complex_faceted", compiled.shape, params, cursor, limit)
+    try:
+        return search_cache.get_or_compute(key, compute)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 # 內容比對搜索端點 (Phase 2: B_QUERY)
 @app.post("/papers/search/related/", response_model=List[PaperResponse])
@@ -167,6 +347,53 @@ async def search_related_papers_endpoint(
     related_papers = search_related_papers(db=db, paper_data=paper_data, limit=5)
     return related_papers
 
+@app.post("/papers/search/related/batch/", response_model=List[DuplicateCheckResult])
+async def check_duplicates_batch_endpoint(
+    papers: List[PaperCreate],
+    limit: int = Query(5, ge=1, le=20),
+    db: Session = Depends(get_db)
+):
+    """匯入預覽用：一次檢查多篇待匯入論文的重複狀態與候選論文 ID"""
+    try:
+        return check_duplicates_batch(db, papers, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# 近似重複論文端點（MinHash/LSH）
+@app.get("/papers/{paper_id}/duplicates/", response_model=List[PaperResponse])
+async def duplicate_papers_endpoint(
+    paper_id: int,
+    limit: int = Query(5, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    """找出與指定論文標題近似重複的論文，score 為估計的 Jaccard 相似度"""
+    papers = find_duplicate_papers(db=db, paper_id=paper_id, limit=limit)
+    if papers is None:
+        raise HTTPException(status_code=404, detail="論文未找到")
+    return papers
+
+# 相似論文搜索端點（TF-IDF 餘弦相似度）
+@app.get("/papers/{paper_id}/similar/", response_model=List[PaperResponse])
+async def similar_papers_endpoint(
+    paper_id: int,
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """找出與指定論文主題最相似的論文"""
+    papers = find_similar_papers(db=db, paper_id=paper_id, limit=limit)
+    if papers is None:
+        raise HTTPException(status_code=404, detail="論文未找到")
+    return papers
+
+@app.post("/papers/similar/", response_model=List[PaperResponse])
+async def similar_papers_by_data_endpoint(
+    paper_data: PaperCreate,
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """根據尚未入庫的論文資料（標題、摘要、關鍵字），找出主題最相似的現有論文"""
+    return find_similar_papers(db=db, paper_data=paper_data, limit=limit)
+
 # 批量標籤操作端點
 @app.post("/papers/batch-tags/", response_model=BatchTagResult)
 async def batch_tag_operation(
@@ -194,6 +421,14 @@ async def count_papers_by_tag(tag_name: str, db: Session = Depends(get_db)):
     count = count_papers_with_tag(db, tag_name)
     return {"tag_name": tag_name, "count": count}
 
+@app.get("/cache/stats/")
+async def cache_stats():
+    """搜索結果快取與查詢編譯快取的命中統計"""
+    return {
+        "result_cache": search_cache.stats(),
+        "compiled_query_cache": compiled_cache_info()
+    }
+
 @app.get("/papers/stats/year-distribution", response_model=List[YearCount])
 async def get_paper_year_distribution(db: Session = Depends(get_db)):
     """統計所有論文的年份分布"""
@@ -219,11 +454,56 @@ async def merge_paper_endpoint(
 ):
     from crud import merge_paper
 
-    merged = merge_paper(db, paper_id, new_data, mode, fields)
+    try:
+        merged = merge_paper(db, paper_id, new_data, mode, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     if merged is None:
         raise HTTPException(status_code=404, detail="論文未找到")
     return merged
 
+# 全庫重複論文掃描端點
+@app.post("/duplicates/scan/", response_model=DuplicateScanRunResponse, status_code=202)
+async def start_duplicate_scan_endpoint(background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    """在背景掃描全部論文（DOI、標題 MinHash 與年份分塊），找出重複論文群組"""
+    try:
+        run = start_duplicate_scan(db)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    background_tasks.add_task(run_duplicate_scan, SessionLocal, run.id)
+    return run
+
+@app.get("/duplicates/scan/{run_id}", response_model=DuplicateScanRunResponse)
+async def get_duplicate_scan_endpoint(run_id: int, db: Session = Depends(get_db)):
+    """查詢重複論文掃描的執行狀態"""
+    run = db.get(DuplicateScanRun, run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="掃描紀錄未找到")
+    return run
+
+@app.get("/duplicates/clusters/", response_model=List[DuplicateClusterResponse])
+async def list_duplicate_clusters_endpoint(
+    run_id: Optional[int] = Query(None, description="掃描 ID，預設為最近一次完成的掃描"),
+    status: Optional[str] = Query('open', description="群組狀態：open、resolved 或 dismissed"),
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    """列出重複論文群組與各成員的相似度"""
+    return get_duplicate_clusters(db, run_id=run_id, status=status, skip=skip, limit=limit)
+
+@app.post("/duplicates/clusters/resolve/", response_model=List[DuplicateResolveResult])
+async def resolve_duplicate_clusters_endpoint(requests: List[DuplicateResolveRequest], db: Session = Depends(get_db)):
+    """批次處理重複群組：保留一篇論文，並以 merge_paper 合併其餘成員"""
+    return resolve_duplicate_clusters(db, requests)
+
+@app.post("/duplicates/clusters/{cluster_id}/dismiss/")
+async def dismiss_duplicate_cluster_endpoint(cluster_id: int, db: Session = Depends(get_db)):
+    """將群組標記為非重複"""
+    if not dismiss_duplicate_cluster(db, cluster_id):
+        raise HTTPException(status_code=404, detail="群組未找到")
+    return {"message": "群組已標記為非重複"}
+
 # 文件上傳下載端點
 @app.post("/papers/{paper_id}/upload-pdf/")
 async def upload_paper_pdf(
@@ -275,7 +555,10 @@ async def download_paper_pdf(paper_id: int, db: Session = Depends(get_db)):
 @app.post("/authors/", response_model=AuthorResponse)
 async def create_author_endpoint(author: AuthorCreate, db: Session = Depends(get_db)):
     """創建新作者"""
-    return create_author(db=db, author=author)
+    try:
+        return create_author(db=db, author=author)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
 @app.get("/authors/", response_model=List[AuthorResponse])
 async def read_authors(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
@@ -297,7 +580,10 @@ async def read_tags(db: Session = Depends(get_db)):
 @app.post("/venues/", response_model=VenueResponse)
 async def create_venue_endpoint(venue: VenueCreate, db: Session = Depends(get_db)):
     """創建新期刊/會議"""
-    return create_venue(db=db, venue=venue)
+    try:
+        return create_venue(db=db, venue=venue)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
 @app.get("/venues/", response_model=List[VenueResponse])
 async def read_venues(db: Session = Depends(get_db)):
@@ -339,20 +625,17 @@ async def extract_pdf_info_endpoint(
 
 # 文件預覽端點
 @app.post("/papers/preview-file/")
-async def preview_file_endpoint(
+def preview_file_endpoint(
     file: UploadFile = File(...)
 ):
-    """預覽文件內容和欄位（支持Excel、CSV、TSV）"""
+    """預覽文件內容和欄位（支持Excel、CSV、TSV、WoS純文字、BibTeX、RIS、EndNote XML）"""
     # 驗證文件類型
-    if not file.filename.lower().endswith(('.xlsx', '.xls', '.csv', '.tsv')):
-        raise HTTPException(status_code=400, detail="只支持Excel文件 (.xlsx, .xls)、CSV文件 (.csv) 和TSV文件 (.tsv)")
+    if not is_supported(file.filename):
+        raise HTTPException(status_code=400, detail=UNSUPPORTED_FORMAT_DETAIL)
     
     try:
-        # 讀取文件內容
-        file_content = await file.read()
-        
-        # 預覽數據
-        preview_data, file_id = preview_file(file_content, file.filename)
+        # 將上傳內容存入預覽存放區並預覽數據（導入時再從存放區讀取）
+        preview_data, file_id = preview_file(file.file, file.filename)
         
         # 獲取默認欄位映射
         default_mappings = get_default_field_mappings()
@@ -368,7 +651,7 @@ async def preview_file_endpoint(
 
 # Excel 預覽端點（兼容性）
 @app.post("/papers/preview-excel/")
-async def preview_excel_endpoint(
+def preview_excel_endpoint(
     file: UploadFile = File(...)
 ):
     """預覽Excel文件內容和欄位"""
@@ -377,11 +660,8 @@ async def preview_excel_endpoint(
         raise HTTPException(status_code=400, detail="只支持Excel文件 (.xlsx, .xls)")
     
     try:
-        # 讀取文件內容
-        file_content = await file.read()
-        
-        # 預覽數據
-        preview_data, file_id = preview_file(file_content, file.filename)
+        # 將上傳內容存入預覽存放區並預覽數據（導入時再從存放區讀取）
+        preview_data, file_id = preview_file(file.file, file.filename)
         
         # 獲取默認欄位映射
         default_mappings = get_default_field_mappings()
@@ -397,56 +677,95 @@ async def preview_excel_endpoint(
 
 # 文件配置導入端點
 @app.post("/papers/import-file-with-config/", response_model=ExcelImportResult)
-async def import_file_with_config_endpoint(
+def import_file_with_config_endpoint(
     config: ExcelImportConfig,
+    streaming: bool = Query(False, description="串流模式：逐塊提交，回應不含新論文且錯誤訊息有上限"),
     db: Session = Depends(get_db)
 ):
-    """使用欄位配置導入文件（支持Excel、CSV、TSV）"""
+    """使用欄位配置導入文件（支持Excel、CSV、TSV、WoS純文字、BibTeX、RIS、EndNote XML）"""
     try:
-        result = import_file_with_config(config, db)
+        result = import_file_with_config(config, db, streaming)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"文件導入失敗: {str(e)}")
 
+@app.post("/papers/import-file-with-config/dry-run/", response_model=ImportDryRunResult)
+def dry_run_import_file_endpoint(config: ExcelImportConfig, db: Session = Depends(get_db)):
+    """試導入：統計並逐列標示新論文、與資料庫重複（DOI/標題）、文件內重複與無效的列，不寫入任何資料"""
+    try:
+        return dry_run_file_with_config(config, db)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"試導入失敗: {str(e)}")
+
 # Excel 配置導入端點（兼容性）
 @app.post("/papers/import-excel-with-config/", response_model=ExcelImportResult)
-async def import_excel_with_config_endpoint(
+def import_excel_with_config_endpoint(
     config: ExcelImportConfig,
+    streaming: bool = Query(False, description="串流模式：逐塊提交，回應不含新論文且錯誤訊息有上限"),
     db: Session = Depends(get_db)
 ):
     """使用欄位配置導入Excel文件"""
     try:
-        result = import_file_with_config(config, db)
+        result = import_file_with_config(config, db, streaming)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Excel導入失敗: {str(e)}")
 
 # 文件導入端點
 @app.post("/papers/import-file/", response_model=ExcelImportResult)
-async def import_file_endpoint(
+def import_file_endpoint(
     file: UploadFile = File(...),
+    streaming: bool = Query(False, description="串流模式：逐塊提交，回應不含新論文且錯誤訊息有上限"),
     db: Session = Depends(get_db)
 ):
-    """從文件導入論文數據（支持Excel、CSV、TSV）"""
+    """從文件導入論文數據（支持Excel、CSV、TSV、WoS純文字、BibTeX、RIS、EndNote XML）"""
     # 驗證文件類型
-    if not file.filename.lower().endswith(('.xlsx', '.xls', '.csv', '.tsv')):
-        raise HTTPException(status_code=400, detail="只支持Excel文件 (.xlsx, .xls)、CSV文件 (.csv) 和TSV文件 (.tsv)")
+    if not is_supported(file.filename):
+        raise HTTPException(status_code=400, detail=UNSUPPORTED_FORMAT_DETAIL)
     
     try:
-        # 讀取文件內容
-        file_content = await file.read()
+        # 將上傳內容寫入暫存文件，CSV/TSV 以固定列數分塊讀取
+        path = save_upload(file.file, file.filename)
         
         # 導入數據
-        result = import_file(db, file_content, file.filename)
+        try:
+            result = import_file(db, path, file.filename, streaming)
+        finally:
+            remove_temp_file(path)
         
         return result
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"文件導入失敗: {str(e)}")
 
+# 多文件導入端點
+@app.post("/papers/import-files/", response_model=ExcelImportResult)
+def import_files_endpoint(
+    files: List[UploadFile] = File(...),
+    streaming: bool = Query(False, description="串流模式：逐塊提交，回應不含新論文且錯誤訊息有上限"),
+    db: Session = Depends(get_db)
+):
+    """一次導入多個 Web of Science 匯出文件：各文件與工作表平行解析，跨文件重複的論文只導入一次"""
+    for file in files:
+        if not is_supported(file.filename):
+            raise HTTPException(status_code=400, detail=f"{file.filename}: {UNSUPPORTED_FORMAT_DETAIL}")
+    
+    paths = []
+    try:
+        for file in files:
+            paths.append(save_upload(file.file, file.filename))
+        return import_files(db, list(zip(paths, [file.filename for file in files])), streaming)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"文件導入失敗: {str(e)}")
+    finally:
+        for path in paths:
+            remove_temp_file(path)
+
 # Excel 導入端點（兼容性）
 @app.post("/papers/import-excel/", response_model=ExcelImportResult)
-async def import_excel_endpoint(
+def import_excel_endpoint(
     file: UploadFile = File(...),
     db: Session = Depends(get_db)
 ):
@@ -456,17 +775,104 @@ async def import_excel_endpoint(
         raise HTTPException(status_code=400, detail="只支持Excel文件 (.xlsx, .xls)")
     
     try:
-        # 讀取文件內容
-        file_content = await file.read()
+        # 將上傳內容寫入暫存文件
+        path = save_upload(file.file, file.filename)
         
         # 導入數據
-        result = import_excel_file(db, file_content)
+        try:
+            result = import_excel_file(db, path)
+        finally:
+            remove_temp_file(path)
         
         return result
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Excel導入失敗: {str(e)}")
 
+# 背景匯入工作端點
+@app.post("/import-jobs/", response_model=ImportJobResponse, status_code=202)
+def create_import_job_endpoint(config: ExcelImportConfig):
+    """以預覽過的文件與欄位配置建立背景匯入工作，立即回傳工作紀錄供輪詢進度"""
+    try:
+        entry = claim_preview(config.preview_file_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    field_mappings = config.field_mappings
+    return submit_import_job(
+        SessionLocal, entry.filename,
+        lambda: preview_frames(entry, mapped_columns(field_mappings)),
+        lambda frame: map_frame_with_config(frame, field_mappings),
+        lambda: discard_preview(entry)
+    )
+
+@app.post("/import-jobs/upload/", response_model=ImportJobResponse, status_code=202)
+def upload_import_job_endpoint(file: UploadFile = File(...)):
+    """上傳 Web of Science 匯出文件並建立背景匯入工作"""
+    if not is_supported(file.filename):
+        raise HTTPException(status_code=400, detail=UNSUPPORTED_FORMAT_DETAIL)
+    path, filename = save_upload(file.file, file.filename), file.filename
+    return submit_import_job(
+        SessionLocal, filename,
+        lambda: read_frames(path, filename, usecols=WOS_COLUMNS),
+        map_wos_frame,
+        lambda: remove_temp_file(path)
+    )
+
+@app.post("/import-jobs/upload-files/", response_model=ImportJobResponse, status_code=202)
+def upload_files_import_job_endpoint(files: List[UploadFile] = File(...)):
+    """上傳多個 Web of Science 匯出文件並建立背景匯入工作（平行解析，跨文件去重）"""
+    for file in files:
+        if not is_supported(file.filename):
+            raise HTTPException(status_code=400, detail=f"{file.filename}: {UNSUPPORTED_FORMAT_DETAIL}")
+    uploads = [(save_upload(file.file, file.filename), file.filename) for file in files]
+    
+    def cleanup():
+        for path, _ in uploads:
+            remove_temp_file(path)
+    
+    return submit_import_job(
+        SessionLocal, ", ".join(filename for _, filename in uploads)[:500],
+        lambda: parse_files_parallel(uploads, WOS_COLUMNS),
+        dedupe_across_frames(map_wos_frame),
+        cleanup
+    )
+
+@app.get("/import-jobs/", response_model=List[ImportJobResponse])
+def list_import_jobs_endpoint(limit: int = Query(20, ge=1, le=100), db: Session = Depends(get_db)):
+    """列出最近的匯入工作"""
+    return db.query(ImportJob).order_by(ImportJob.id.desc()).limit(limit).all()
+
+@app.get("/import-jobs/{job_id}", response_model=ImportJobResponse)
+def get_import_job_endpoint(job_id: int, db: Session = Depends(get_db)):
+    """查詢匯入工作的狀態與進度（已讀取、已處理、成功與失敗列數）"""
+    job = db.get(ImportJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="匯入工作未找到")
+    return job
+
+@app.get("/import-jobs/{job_id}/errors", response_model=List[ImportJobErrorResponse])
+def get_import_job_errors_endpoint(
+    job_id: int,
+    after_id: int = Query(0, ge=0, description="只回傳此錯誤 id 之後的訊息，用於增量輪詢"),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    """分段讀取匯入工作目前為止的錯誤訊息（工作執行中即可讀取）"""
+    if db.get(ImportJob, job_id) is None:
+        raise HTTPException(status_code=404, detail="匯入工作未找到")
+    return get_import_job_errors(db, job_id, after_id, limit)
+
+@app.post("/import-jobs/{job_id}/cancel/", response_model=ImportJobResponse)
+def cancel_import_job_endpoint(job_id: int, db: Session = Depends(get_db)):
+    """取消匯入工作；執行中的工作在目前區塊提交後停止，已匯入的論文保留"""
+    try:
+        job = cancel_import_job(db, job_id)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if job is None:
+        raise HTTPException(status_code=404, detail="匯入工作未找到")
+    return job
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
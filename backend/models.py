@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Boolean, DECIMAL, ARRAY, UniqueConstraint
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Boolean, DECIMAL, ARRAY, Float, UniqueConstraint
+from sqlalchemy.orm import relationship, deferred
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.sql import func
 from database import Base
 
@@ -8,6 +9,7 @@ class Author(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False)
+    name_key = Column(String(255))  # 標準化姓名，唯一索引見 db_migrations
     email = Column(String(255), unique=True)
     affiliation = Column(String(500))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -20,6 +22,7 @@ class Venue(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(500), nullable=False)
+    name_key = Column(String(500))  # 標準化名稱，唯一索引見 db_migrations
     type = Column(String(50), nullable=False)  # 'journal' or 'conference'
     impact_factor = Column(DECIMAL(5,3))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -32,10 +35,12 @@ class Paper(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(1000), nullable=False)
+    title_key = Column(String(500))  # 標準化標題（paper_title_key），索引見 db_migrations
     abstract = Column(Text)
     document_type = Column(String(50), default='paper', nullable=False) # 新增：文件類型
     publication_year = Column(Integer, nullable=False)
     doi = Column(String(255), unique=True, nullable=True) # 修改：設為 nullable=True
+    doi_key = Column(String(255))  # 標準化 DOI（normalize_doi），唯一索引見 db_migrations
     isbn = Column(String(50), nullable=True)
     citation_count = Column(Integer, default=0)
     venue_id = Column(Integer, ForeignKey("venues.id"))
@@ -45,6 +50,8 @@ class Paper(Base):
     keywords = Column(ARRAY(String))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # 全文搜索向量（title=A, keywords=B, abstract=C），由資料庫觸發器維護
+    search_vector = deferred(Column(TSVECTOR))
     
     # 關聯關係
     venue = relationship("Venue", back_populates="papers")
@@ -102,4 +109,73 @@ class Citation(Base):
     
     # 關聯關係
     citing_paper = relationship("Paper", foreign_keys=[citing_paper_id], back_populates="cited_papers")
-    cited_paper = relationship("Paper", foreign_keys=[cited_paper_id], back_populates="citing_papers") 
\ No newline at end of file
+    cited_paper = relationship("Paper", foreign_keys=[cited_paper_id], back_populates="citing_papers") 
+
+class DuplicateScanRun(Base):
+    __tablename__ = "duplicate_scan_runs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    status = Column(String(20), nullable=False, default='running')  # 'running', 'completed' or 'failed'
+    started_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True))
+    papers_scanned = Column(Integer, default=0)
+    clusters_found = Column(Integer, default=0)
+    error = Column(Text)
+    
+    # 關聯關係
+    clusters = relationship("DuplicateCluster", back_populates="run")
+
+class DuplicateCluster(Base):
+    __tablename__ = "duplicate_clusters"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    run_id = Column(Integer, ForeignKey("duplicate_scan_runs.id", ondelete="CASCADE"), nullable=False)
+    size = Column(Integer, nullable=False)
+    status = Column(String(20), nullable=False, default='open')  # 'open', 'resolved' or 'dismissed'
+    kept_paper_id = Column(Integer)
+    resolved_at = Column(DateTime(timezone=True))
+    
+    # 關聯關係
+    run = relationship("DuplicateScanRun", back_populates="clusters")
+    members = relationship("DuplicateClusterMember", back_populates="cluster", order_by="DuplicateClusterMember.paper_id")
+
+class DuplicateClusterMember(Base):
+    __tablename__ = "duplicate_cluster_members"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    cluster_id = Column(Integer, ForeignKey("duplicate_clusters.id", ondelete="CASCADE"), nullable=False)
+    paper_id = Column(Integer, nullable=False)  # 不設外鍵，掃描時不鎖定 papers
+    score = Column(Float, nullable=False)  # 與群組代表論文（id 最小者）的相似度
+    match = Column(String(20), nullable=False)  # 'representative', 'doi' or 'title'
+    
+    # 關聯關係
+    cluster = relationship("DuplicateCluster", back_populates="members")
+
+class ImportJob(Base):
+    __tablename__ = "import_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    filename = Column(String(500))
+    status = Column(String(20), nullable=False, default='queued')  # 'queued', 'running', 'completed', 'failed' or 'cancelled'
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    total_rows = Column(Integer, default=0)  # 已讀取的列數（串流讀取時隨進度增加）
+    processed_rows = Column(Integer, default=0)
+    successful_imports = Column(Integer, default=0)
+    failed_imports = Column(Integer, default=0)
+    error = Column(Text)  # 整個工作失敗的原因
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+    
+    # 關聯關係
+    errors = relationship("ImportJobError", back_populates="job", cascade="all, delete-orphan")
+
+class ImportJobError(Base):
+    __tablename__ = "import_job_errors"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey("import_jobs.id", ondelete="CASCADE"), nullable=False)
+    message = Column(Text, nullable=False)
+    
+    # 關聯關係
+    job = relationship("ImportJob", back_populates="errors")
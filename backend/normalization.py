@@ -0,0 +1,93 @@
+import re
+import unicodedata
+from typing import List, Optional, Set
+
+# 標題比對時忽略的標點與符號
+PUNCTUATION_PATTERN = re.compile(r"[^\w\s]|_")
+# DOI 常見的網址或標籤前綴
+DOI_PREFIX_PATTERN = re.compile(r"^(https?://(dx\.)?doi\.org/|doi:\s*)", re.IGNORECASE)
+# 標題字元 shingle 的長度
+SHINGLE_SIZE = 3
+# 作者姓名鍵的最大長度（與 authors.name_key 欄位一致）
+NAME_KEY_LENGTH = 255
+# 期刊/會議名稱鍵的最大長度（與 venues.name_key 欄位一致）
+VENUE_KEY_LENGTH = 500
+# 標題鍵的最大長度（與 papers.title_key 欄位一致，確保 B-tree 索引項目不超過上限）
+TITLE_KEY_LENGTH = 500
+
+def normalize_text(s: str):
+    if not s:
+        return ""
+    s = unicodedata.normalize("NFKC", s)
+    s = s.replace("\u00a0", " ").replace("\u202f", " ")
+    s = " ".join(s.split())  # 移除多餘空白
+    return s.strip().lower()
+
+def normalize_doi(doi: Optional[str]) -> str:
+    """DOI 比對用的標準形式：去除網址前綴與空白並轉小寫（DOI 不分大小寫）"""
+    if not doi:
+        return ""
+    return DOI_PREFIX_PATTERN.sub("", doi.strip()).strip().lower()
+
+def normalize_title(title: Optional[str]) -> str:
+    """標題比對用的標準形式：標準化空白與大小寫，並移除標點"""
+    return " ".join(PUNCTUATION_PATTERN.sub(" ", normalize_text(title)).split())
+
+def paper_title_key(title: Optional[str]) -> str:
+    """標題精確比對用的鍵（normalize_title 並截斷），存於 papers.title_key"""
+    return normalize_title(title)[:TITLE_KEY_LENGTH]
+
+def venue_name_key(name: Optional[str]) -> str:
+    """期刊/會議名稱比對用的唯一鍵：只標準化大小寫與空白，保留標點（縮寫刊名的句點有區別意義）"""
+    return normalize_text(name)[:VENUE_KEY_LENGTH]
+
+def author_surname(name: Optional[str]) -> str:
+    """取出作者姓氏：'Smith, J.' 取逗號前，'John Smith' 取最後一個詞"""
+    name = normalize_text(name)
+    if not name:
+        return ""
+    if "," in name:
+        return name.split(",", 1)[0].strip()
+    return name.split()[-1]
+
+def _name_words(text: str) -> List[str]:
+    return PUNCTUATION_PATTERN.sub(" ", text).split()
+
+def author_name_key(name: Optional[str]) -> str:
+    """
+    作者姓名比對用的唯一鍵：NFKC 標準化、casefold，標點與空白合併為單一空格。
+    WoS 的「姓, 名」格式中，名字部分全為縮寫時合併為縮寫字串，
+    因此 'Smith, J. A.'、'SMITH, JA'、'Smith, J.-A.' 皆為 'smith, ja'。
+    """
+    if not name:
+        return ""
+    name = unicodedata.normalize("NFKC", name)
+    surname, comma, given = name.partition(",")
+    if not comma:
+        return " ".join(_name_words(name)).casefold()[:NAME_KEY_LENGTH]
+
+    surname_key = " ".join(_name_words(surname)).casefold()
+    given_words = _name_words(given)
+    # 單一字母或全大寫的短詞（如 'JA'）視為縮寫
+    if all(len(word) == 1 or (word.isupper() and len(word) <= 3) for word in given_words):
+        given_key = "".join(given_words).casefold()
+    else:
+        given_key = " ".join(given_words).casefold()
+    if not surname_key or not given_key:
+        return (surname_key or given_key)[:NAME_KEY_LENGTH]
+    return f"{surname_key}, {given_key}"[:NAME_KEY_LENGTH]
+
+def title_shingles(title: Optional[str], author_names: Optional[List[str]] = None) -> Set[str]:
+    """標題的字元 shingle 集合（對詞序調換與少量修改不敏感），可附加作者姓氏"""
+    text = normalize_title(title)
+    shingles = set()
+    if len(text) <= SHINGLE_SIZE:
+        if text:
+            shingles.add(text)
+    else:
+        shingles.update(text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1))
+    for name in author_names or []:
+        surname = author_surname(name)
+        if surname:
+            shingles.add(f"@{surname}")
+    return shingles
@@ -0,0 +1,31 @@
+import base64
+import json
+from typing import Any, List, Optional
+
+# 分頁排序方式：依年份（新到舊）或依全文相關度
+SORT_BY_YEAR = 'year'
+SORT_BY_RELEVANCE = 'relevance'
+
+def encode_cursor(sort: str, values: List[Any]) -> str:
+    """將排序鍵值編碼為不透明的游標字串"""
+    payload = json.dumps({"s": sort, "k": values}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: Optional[str], sort: str) -> Optional[List[Any]]:
+    """解碼游標字串，格式錯誤或排序方式不符時拋出 ValueError"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        values = payload["k"]
+        cursor_sort = payload["s"]
+    except Exception:
+        raise ValueError("無效的分頁游標")
+    if cursor_sort != sort or not isinstance(values, list) or len(values) != 2:
+        raise ValueError("分頁游標與目前的排序方式不符")
+    if any(isinstance(value, bool) or not isinstance(value, (int, float)) for value in values):
+        raise ValueError("無效的分頁游標")
+    if sort == SORT_BY_YEAR and not all(isinstance(value, int) for value in values):
+        raise ValueError("無效的分頁游標")
+    return values
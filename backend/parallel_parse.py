@@ -0,0 +1,106 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Collection, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+import readers
+from readers import file_extension
+
+# 平行解析上傳文件的行程數
+IMPORT_PARSE_PROCESSES = int(os.getenv("IMPORT_PARSE_PROCESSES", "0")) or os.cpu_count() or 1
+
+# 行程內共用的解析行程池（第一次使用時建立）
+_executor: Optional[ProcessPoolExecutor] = None
+
+def get_executor() -> ProcessPoolExecutor:
+    """
+    以 forkserver 建立子行程：伺服器行程帶有資料庫連線與工作執行緒，直接 fork 可能繼承被鎖住的鎖；
+    子行程只匯入本模組與 pandas，不會重新執行 main 的啟動流程。
+    """
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=IMPORT_PARSE_PROCESSES,
+            mp_context=multiprocessing.get_context("forkserver")
+        )
+    return _executor
+
+def reset_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+def sheet_names(path: str, filename: str) -> List[Optional[str]]:
+    """列出文件中要解析的工作表；CSV/TSV 與文獻格式只有一個（None）"""
+    file_ext = file_extension(filename)
+    if file_ext == 'xls':
+        import xlrd
+        # on_demand 只讀取工作表目錄，不解析內容
+        workbook = xlrd.open_workbook(path, on_demand=True)
+        try:
+            return workbook.sheet_names()
+        finally:
+            workbook.release_resources()
+    if file_ext == 'xlsx':
+        with pd.ExcelFile(path) as workbook:
+            return list(workbook.sheet_names)
+    if readers.is_supported(filename):
+        return [None]
+    raise ValueError(f"不支持的文件格式: {file_ext}")
+
+def parse_sheet(path: str, filename: str, sheet: Optional[str], usecols: Optional[Collection[str]] = None) -> pd.DataFrame:
+    """子行程：解析一個工作表（或整個 CSV/TSV、文獻格式文件），只建立 usecols 中的欄位"""
+    if sheet is not None:
+        return readers.read_excel(path, sheet_name=sheet, usecols=usecols)
+    return pd.concat(readers.read_frames(path, filename, None, usecols))
+
+def source_label(filename: str, sheet: Optional[str], sheet_count: int) -> str:
+    return f"{filename} [{sheet}]" if sheet is not None and sheet_count > 1 else filename
+
+def failed_frame(source: str, error: Exception) -> pd.DataFrame:
+    df = pd.DataFrame()
+    df.attrs["source"] = source
+    df.attrs["error"] = f"解析失敗 - {error}"
+    return df
+
+def parse_files_parallel(files: List[Tuple[str, str]], usecols: Optional[Collection[str]] = None) -> Iterator[pd.DataFrame]:
+    """
+    在行程池中平行解析多個文件（路徑, 原始文件名）的每個工作表，依完成順序產生資料表，
+    讓導入在其他工作表仍在解析時就開始寫入。資料表的 attrs['source'] 為來源文件與工作表名稱；
+    無法解析的文件或工作表產生空的資料表，attrs['error'] 為錯誤原因，其餘文件照常導入。
+    """
+    executor = get_executor()
+    futures = {}
+    try:
+        for path, filename in files:
+            try:
+                sheets = sheet_names(path, filename)
+            except Exception as e:
+                yield failed_frame(filename, e)
+                continue
+            for sheet in sheets:
+                future = executor.submit(parse_sheet, path, filename, sheet, usecols)
+                futures[future] = source_label(filename, sheet, len(sheets))
+        for future in as_completed(futures):
+            try:
+                df = future.result()
+            except BrokenProcessPool as e:
+                # 子行程異常結束（例如記憶體不足）後行程池無法再使用，下次重新建立
+                reset_executor()
+                yield failed_frame(futures[future], e)
+                continue
+            except Exception as e:
+                yield failed_frame(futures[future], e)
+                continue
+            if df.empty:
+                continue
+            df.attrs["source"] = futures[future]
+            yield df
+    finally:
+        # 導入中途失敗時不再解析尚未開始的工作表
+        for future in futures:
+            future.cancel()
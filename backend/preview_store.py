@@ -0,0 +1,183 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from typing import BinaryIO, Collection, Iterator, Optional
+
+import pandas as pd
+
+try:
+    import pyarrow.parquet as pq  # 解析結果快取為 Parquet 需要 pyarrow
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+# 預覽文件存放目錄：同一台主機上的所有 worker 行程共用
+PREVIEW_STORE_DIR = os.getenv("PREVIEW_STORE_DIR") or os.path.join(tempfile.gettempdir(), "paper-import-previews")
+# 預覽後未導入的文件保留秒數
+PREVIEW_TTL = int(os.getenv("PREVIEW_TTL", "3600"))
+# 預覽文件（含解析快取）的總容量上限，超過時由最舊的開始刪除
+PREVIEW_STORE_MAX_MB = int(os.getenv("PREVIEW_STORE_MAX_MB", "2048"))
+
+# 已被導入取走的項目在行程中斷時留下的目錄，超過此秒數後清除
+CLAIMED_TTL = 24 * 3600
+# 複製上傳內容時每次讀取的位元組數
+COPY_BUFFER_SIZE = 1024 * 1024
+
+META_FILE = "meta.json"
+FRAMES_DIR = "frames"
+FRAMES_COMPLETE = "complete"
+CLAIMED_SUFFIX = ".claimed"
+
+class PreviewEntry:
+    """預覽存放區中的一個上傳文件：目錄內含原始文件、中繼資料與（可選的）分塊解析結果"""
+
+    def __init__(self, file_id: str, directory: str, filename: str):
+        self.file_id = file_id
+        self.directory = directory
+        self.filename = filename
+
+    @property
+    def path(self) -> str:
+        """原始上傳文件的路徑（保留副檔名，供 pandas 判斷格式）"""
+        return os.path.join(self.directory, "upload" + os.path.splitext(self.filename)[1].lower())
+
+    @property
+    def frames_dir(self) -> str:
+        return os.path.join(self.directory, FRAMES_DIR)
+
+def _entry_size(directory: str) -> int:
+    total = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+def evict_previews():
+    """刪除過期的預覽文件；總容量超過上限時再由最舊的開始刪除"""
+    if not os.path.isdir(PREVIEW_STORE_DIR):
+        return
+    now = time.time()
+    entries = []
+    for name in os.listdir(PREVIEW_STORE_DIR):
+        directory = os.path.join(PREVIEW_STORE_DIR, name)
+        try:
+            modified = os.path.getmtime(directory)
+        except OSError:
+            continue
+        ttl = CLAIMED_TTL if name.endswith(CLAIMED_SUFFIX) else PREVIEW_TTL
+        if now - modified > ttl:
+            shutil.rmtree(directory, ignore_errors=True)
+        elif not name.endswith(CLAIMED_SUFFIX):
+            entries.append((modified, _entry_size(directory), directory))
+
+    total = sum(size for _, size, _ in entries)
+    limit = PREVIEW_STORE_MAX_MB * 1024 * 1024
+    for _, size, directory in sorted(entries):
+        if total <= limit:
+            break
+        shutil.rmtree(directory, ignore_errors=True)
+        total -= size
+
+def create_preview(source: BinaryIO, filename: str) -> PreviewEntry:
+    """將上傳內容分段寫入新的預覽目錄；中繼資料最後寫入，其他行程只會看到完整的項目"""
+    evict_previews()
+    os.makedirs(PREVIEW_STORE_DIR, exist_ok=True)
+    file_id = str(uuid.uuid4())
+    entry = PreviewEntry(file_id, os.path.join(PREVIEW_STORE_DIR, file_id), filename)
+    os.makedirs(entry.directory)
+    try:
+        with open(entry.path, "wb") as target:
+            shutil.copyfileobj(source, target, COPY_BUFFER_SIZE)
+        temp_meta = os.path.join(entry.directory, META_FILE + ".tmp")
+        with open(temp_meta, "w", encoding="utf-8") as f:
+            json.dump({"filename": filename, "created": time.time()}, f, ensure_ascii=False)
+        os.replace(temp_meta, os.path.join(entry.directory, META_FILE))
+    except Exception:
+        shutil.rmtree(entry.directory, ignore_errors=True)
+        raise
+    return entry
+
+def get_preview(file_id: str) -> PreviewEntry:
+    """讀取預覽文件但不取走（例如試導入），過期或不存在時拋出 ValueError"""
+    try:
+        file_id = str(uuid.UUID(file_id))
+        directory = os.path.join(PREVIEW_STORE_DIR, file_id)
+        with open(os.path.join(directory, META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        if time.time() - meta["created"] > PREVIEW_TTL:
+            raise ValueError(file_id)
+    except (OSError, ValueError, TypeError, KeyError):
+        raise ValueError("預覽文件已過期，請重新上傳")
+    return PreviewEntry(file_id, directory, meta["filename"])
+
+def claim_preview(file_id: str) -> PreviewEntry:
+    """
+    取走預覽文件供導入使用：以原子的目錄改名確保同一個文件只會被一個請求或 worker 導入。
+    導入結束後由呼叫者以 discard_preview 刪除。過期或不存在時拋出 ValueError。
+    """
+    entry = get_preview(file_id)
+    claimed = entry.directory + CLAIMED_SUFFIX
+    try:
+        os.rename(entry.directory, claimed)
+    except OSError:
+        # 已被其他請求取走
+        raise ValueError("預覽文件已過期，請重新上傳")
+    # 更新修改時間，避免長時間的導入被視為中斷而清除
+    os.utime(claimed)
+    return PreviewEntry(entry.file_id, claimed, entry.filename)
+
+def discard_preview(entry: PreviewEntry):
+    shutil.rmtree(entry.directory, ignore_errors=True)
+
+class FrameCache:
+    """
+    預覽時逐塊把解析後的資料表寫成 Parquet（每塊一個文件，保留各塊的欄位型別與列索引），
+    導入時直接讀取，不必再解析 CSV 或 Excel。沒有 pyarrow 或某塊無法轉換時放棄快取。
+    """
+
+    def __init__(self, entry: PreviewEntry):
+        self.entry = entry
+        self.count = 0
+        self.enabled = PARQUET_AVAILABLE
+        if self.enabled:
+            os.makedirs(entry.frames_dir, exist_ok=True)
+
+    def append(self, df: pd.DataFrame):
+        if not self.enabled:
+            return
+        try:
+            # 欄位名稱須為字串（Excel 的數字表頭等）
+            df.rename(columns=str).to_parquet(os.path.join(self.entry.frames_dir, f"{self.count:06d}.parquet"))
+            self.count += 1
+        except Exception as e:
+            # 例如同一欄混有數字與文字的 object 欄位
+            print(f"預覽文件 {self.entry.file_id} 無法快取為 Parquet，導入時將重新解析: {e}")
+            self.abandon()
+
+    def abandon(self):
+        self.enabled = False
+        shutil.rmtree(self.entry.frames_dir, ignore_errors=True)
+
+    def finish(self):
+        if self.enabled:
+            open(os.path.join(self.entry.frames_dir, FRAMES_COMPLETE), "w").close()
+
+def read_cached_frame(path: str, columns: Optional[Collection[str]]) -> pd.DataFrame:
+    if columns is None:
+        return pd.read_parquet(path)
+    # 只讀取存在的欄位（Parquet 是欄式儲存，未映射的欄位不會被解碼）
+    names = set(pq.read_schema(path).names)
+    return pd.read_parquet(path, columns=[column for column in columns if column in names])
+
+def cached_frames(entry: PreviewEntry, columns: Optional[Collection[str]] = None) -> Optional[Iterator[pd.DataFrame]]:
+    """回傳預覽時快取的資料表（依塊順序，可只讀取指定欄位）；沒有完整快取時回傳 None"""
+    if not PARQUET_AVAILABLE or not os.path.exists(os.path.join(entry.frames_dir, FRAMES_COMPLETE)):
+        return None
+    names = sorted(name for name in os.listdir(entry.frames_dir) if name.endswith(".parquet"))
+    return (read_cached_frame(os.path.join(entry.frames_dir, name), columns) for name in names)
@@ -0,0 +1,226 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, or_, exists, select, desc, tuple_, bindparam, Integer
+from models import Paper, Author, PaperAuthor, Tag, PaperTag
+from schemas import FilterGroup, FilterCondition
+
+# 快取的查詢形狀數量上限
+COMPILED_CACHE_SIZE = 256
+
+def author_exists(condition):
+    """作者條件：論文存在符合條件的作者（EXISTS 子查詢）"""
+    return exists().where(
+        PaperAuthor.paper_id == Paper.id,
+        PaperAuthor.author_id == Author.id,
+        condition
+    )
+
+def tag_exists(condition):
+    """標籤條件：論文存在符合條件的標籤（EXISTS 子查詢）"""
+    return exists().where(
+        PaperTag.paper_id == Paper.id,
+        PaperTag.tag_id == Tag.id,
+        condition
+    )
+
+def contains_pattern(value) -> str:
+    """將使用者輸入轉為 ILIKE 子字串模式，並轉義其中的萬用字元"""
+    escaped = str(value).replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+def first_tag(value) -> str:
+    return value[0] if isinstance(value, list) else str(value)
+
+# 單一條件的編譯規則：(欄位, 標準化操作符) -> (轉換值的函數, 以參數構建條件的函數)
+LEAF_RULES: Dict[Tuple[str, str], Tuple[Callable[[Any], Any], Callable[[Any], Any]]] = {
+    ('title_keyword', 'contains'): (contains_pattern, lambda p: Paper.title.ilike(p, escape='\\')),
+    ('title_keyword', 'equals'): (str, lambda p: Paper.title == p),
+    ('abstract_keyword', 'contains'): (contains_pattern, lambda p: Paper.abstract.ilike(p, escape='\\')),
+    ('abstract_keyword', 'equals'): (str, lambda p: Paper.abstract == p),
+    ('author_name', 'contains'): (contains_pattern, lambda p: author_exists(Author.name.ilike(p, escape='\\'))),
+    ('author_name', 'equals'): (str, lambda p: author_exists(Author.name == p)),
+    ('year_from', 'ge'): (int, lambda p: Paper.publication_year >= p),
+    ('year_from', 'equals'): (int, lambda p: Paper.publication_year == p),
+    ('year_to', 'le'): (int, lambda p: Paper.publication_year <= p),
+    ('year_to', 'equals'): (int, lambda p: Paper.publication_year == p),
+    ('min_citations', 'ge'): (int, lambda p: Paper.citation_count >= p),
+    ('min_citations', 'equals'): (int, lambda p: Paper.citation_count == p),
+    ('max_citations', 'le'): (int, lambda p: Paper.citation_count <= p),
+    ('max_citations', 'equals'): (int, lambda p: Paper.citation_count == p),
+    ('venue_id', 'equals'): (int, lambda p: Paper.venue_id == p),
+    ('tags', 'in'): (list, lambda p: tag_exists(Tag.name.in_(p))),
+    ('tags', 'equals'): (first_tag, lambda p: tag_exists(Tag.name == p)),
+}
+
+# 前端操作符到標準化操作符（greater_than 與 greater_equal 一向都以 >= 處理）
+OPERATOR_ALIASES = {
+    'greater_than': 'ge',
+    'greater_equal': 'ge',
+    'less_than': 'le',
+    'less_equal': 'le',
+}
+
+def normalize_condition(condition: FilterCondition):
+    """將單一條件標準化為 ('leaf', 規則鍵, 值)，無效或空值的條件回傳 None"""
+    value = condition.value
+
+    # 如果值為空，跳過此條件
+    if not value or (isinstance(value, str) and value.strip() == ''):
+        return None
+
+    operator = OPERATOR_ALIASES.get(condition.operator, condition.operator)
+    key = (condition.field, operator)
+    if key not in LEAF_RULES:
+        return None
+    if key == ('tags', 'in') and not isinstance(value, list):
+        return None
+
+    convert, _ = LEAF_RULES[key]
+    try:
+        return ('leaf', key, convert(value))
+    except (ValueError, TypeError):
+        # 如果類型轉換失敗，跳過此條件
+        return None
+
+def node_shape(node) -> str:
+    """節點的形狀字串（不含值），作為快取鍵與排序依據"""
+    if node[0] == 'leaf':
+        return f"{node[1][0]}:{node[1][1]}"
+    return f"{node[0]}({','.join(node_shape(child) for child in node[1])})"
+
+def normalize_group(group: FilterGroup):
+    """
+    將查詢樹標準化：移除空條件、攤平相同操作符的巢狀群組、
+    只有一個子節點的群組直接以子節點取代，並依形狀排序可交換的子節點。
+    """
+    operator = 'AND' if group.operator == 'AND' else 'OR'
+    children = []
+
+    for condition in group.conditions:
+        node = normalize_condition(condition)
+        if node is not None:
+            children.append(node)
+
+    for subgroup in group.groups:
+        node = normalize_group(subgroup)
+        if node is None:
+            continue
+        if node[0] == operator:
+            children.extend(node[1])
+        else:
+            children.append(node)
+
+    if not children:
+        return None
+    if len(children) == 1:
+        return children[0]
+
+    children.sort(key=node_shape)
+    return (operator, children)
+
+def collect_values(node, values: List[Any]):
+    """依遍歷順序收集所有條件值"""
+    if node[0] == 'leaf':
+        values.append(node[2])
+    else:
+        for child in node[1]:
+            collect_values(child, values)
+
+def build_where(node, counter: List[int]):
+    """以具名參數構建 WHERE 條件（值在執行時才綁定）"""
+    if node[0] == 'leaf':
+        key = node[1]
+        name = f"p{counter[0]}"
+        counter[0] += 1
+        _, build = LEAF_RULES[key]
+        return build(bindparam(name, expanding=(key == ('tags', 'in'))))
+
+    clauses = [build_where(child, counter) for child in node[1]]
+    return and_(*clauses) if node[0] == 'AND' else or_(*clauses)
+
+class CompiledFilter:
+    """某一查詢形狀的已構建 WHERE 條件，以及由它衍生的 SELECT 語句"""
+
+    def __init__(self, shape: str, where):
+        self.shape = shape
+        self.where = where
+        self._statements = {}
+        self._lock = threading.Lock()
+
+    def conditions(self) -> list:
+        return [self.where] if self.where is not None else []
+
+    def statement(self, kind: str, builder: Callable[[list], Any]):
+        """取得（必要時構建並快取）此形狀的語句，kind 區分不同用途"""
+        stmt = self._statements.get(kind)
+        if stmt is None:
+            with self._lock:
+                stmt = self._statements.get(kind)
+                if stmt is None:
+                    stmt = builder(self.conditions())
+                    self._statements[kind] = stmt
+        return stmt
+
+_compiled_cache: "OrderedDict[str, CompiledFilter]" = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0}
+
+def compile_filter_group(group: FilterGroup) -> Tuple[CompiledFilter, Dict[str, Any]]:
+    """將查詢樹編譯為 (快取的 CompiledFilter, 綁定參數)"""
+    node = normalize_group(group)
+    shape = node_shape(node) if node is not None else ''
+
+    values: List[Any] = []
+    if node is not None:
+        collect_values(node, values)
+    params = {f"p{i}": value for i, value in enumerate(values)}
+
+    with _cache_lock:
+        compiled = _compiled_cache.get(shape)
+        if compiled is not None:
+            _compiled_cache.move_to_end(shape)
+            _cache_stats["hits"] += 1
+            return compiled, params
+        _cache_stats["misses"] += 1
+
+    where = build_where(node, [0]) if node is not None else None
+    compiled = CompiledFilter(shape, where)
+    with _cache_lock:
+        compiled = _compiled_cache.setdefault(shape, compiled)
+        _compiled_cache.move_to_end(shape)
+        while len(_compiled_cache) > COMPILED_CACHE_SIZE:
+            _compiled_cache.popitem(last=False)
+    return compiled, params
+
+def compiled_cache_info() -> Dict[str, int]:
+    """編譯快取的命中統計"""
+    with _cache_lock:
+        return {"size": len(_compiled_cache), "max_size": COMPILED_CACHE_SIZE, **_cache_stats}
+
+def offset_ids_statement(conditions: list):
+    """依 id 排序、以 offset 分頁的論文 ID 查詢"""
+    return (
+        select(Paper.id)
+        .where(*conditions)
+        .order_by(Paper.id)
+        .offset(bindparam('skip', type_=Integer))
+        .limit(bindparam('limit', type_=Integer))
+    )
+
+def keyset_ids_statement(conditions: list, after_cursor: bool):
+    """依 (publication_year, id) 由大到小排序的鍵集分頁 ID 查詢"""
+    keys = (Paper.publication_year, Paper.id)
+    where = list(conditions)
+    if after_cursor:
+        where.append(tuple_(*keys) < tuple_(
+            bindparam('cursor_year', type_=Integer),
+            bindparam('cursor_id', type_=Integer)
+        ))
+    return (
+        select(*keys)
+        .where(*where)
+        .order_by(*[desc(key) for key in keys])
+        .limit(bindparam('limit', type_=Integer))
+    )
@@ -0,0 +1,361 @@
+import os
+import re
+import xml.etree.ElementTree as ET
+from typing import Callable, Collection, Dict, Iterable, Iterator, List, Optional
+
+import pandas as pd
+
+try:
+    import python_calamine  # noqa: F401  以 Rust 實作的 Excel 解析器，比 xlrd/openpyxl 的逐格物件模型快得多
+    # pandas 2.2 起才支持 engine="calamine"
+    CALAMINE_AVAILABLE = tuple(int(part) for part in pd.__version__.split(".")[:2]) >= (2, 2)
+except ImportError:
+    CALAMINE_AVAILABLE = False
+
+# Excel 解析引擎：calamine（已安裝時使用，失敗時退回預設引擎）或 default（xlrd/openpyxl）
+IMPORT_EXCEL_ENGINE = os.getenv("IMPORT_EXCEL_ENGINE", "calamine")
+
+# 文獻格式解析後的欄位，與 Web of Science 匯出的欄位名稱相同，預覽、默認映射與 WoS 映射都可直接沿用
+RECORD_COLUMNS = [
+    "Publication Type", "Authors", "Article Title", "Source Title", "Author Keywords", "Keywords Plus",
+    "Abstract", "Times Cited, WoS Core", "Publication Year", "Publication Date", "DOI", "URL",
+]
+
+# 文字格式的讀取編碼（WoS 匯出常帶 BOM）
+TEXT_ENCODING = "utf-8-sig"
+
+# 讀取器：(文件路徑, 每塊列數或 None, 要讀取的欄位或 None) -> 資料表區塊；各塊的索引連續，行號為索引 + 1
+Reader = Callable[[str, Optional[int], Optional[Collection[str]]], Iterator[pd.DataFrame]]
+
+READERS: Dict[str, Reader] = {}
+
+def register_reader(*extensions: str):
+    """以副檔名註冊讀取器"""
+    def decorator(reader: Reader) -> Reader:
+        for extension in extensions:
+            READERS[extension] = reader
+        return reader
+    return decorator
+
+def file_extension(filename: str) -> str:
+    return filename.lower().rsplit('.', 1)[-1] if '.' in filename else ''
+
+def supported_extensions() -> List[str]:
+    return ['.' + extension for extension in READERS]
+
+def is_supported(filename: str) -> bool:
+    return file_extension(filename) in READERS
+
+def read_frames(
+    path: str,
+    filename: str,
+    chunksize: Optional[int],
+    usecols: Optional[Collection[str]] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    依副檔名選擇讀取器，產生資料表區塊（chunksize 為 None 時整個文件為一塊）。
+    指定 usecols 時只建立這些欄位（文件中不存在的欄位略過），其餘欄位不轉換為 pandas 物件。
+    """
+    reader = READERS.get(file_extension(filename))
+    if reader is None:
+        raise Exception(f"不支持的文件格式: {file_extension(filename)}")
+    return reader(path, chunksize, usecols)
+
+def column_filter(usecols: Optional[Collection[str]]) -> Optional[Callable[[object], bool]]:
+    """轉為 pandas 的 usecols 判斷函數；以字串比對，Excel 的數字表頭也能對應到預覽時的欄位名稱"""
+    if usecols is None:
+        return None
+    wanted = set(usecols)
+    return lambda column: str(column) in wanted
+
+def record_frames(
+    records: Iterable[Dict[str, str]],
+    chunksize: Optional[int],
+    usecols: Optional[Collection[str]] = None
+) -> Iterator[pd.DataFrame]:
+    """將逐筆產生的紀錄分批組成資料表，記憶體中只保留一塊"""
+    columns = RECORD_COLUMNS if usecols is None else [column for column in RECORD_COLUMNS if column in usecols]
+    batch: List[Dict[str, str]] = []
+    start = 0
+    for record in records:
+        batch.append(record)
+        if chunksize and len(batch) >= chunksize:
+            yield pd.DataFrame(batch, columns=columns, index=pd.RangeIndex(start, start + len(batch)))
+            start += len(batch)
+            batch = []
+    if batch or start == 0:
+        yield pd.DataFrame(batch, columns=columns, index=pd.RangeIndex(start, start + len(batch)))
+
+def read_excel(path: str, sheet_name=0, usecols: Optional[Collection[str]] = None) -> pd.DataFrame:
+    """
+    讀取一個 Excel 工作表。優先使用 calamine 引擎；未安裝、被設定停用或解析失敗時退回 xlrd/openpyxl，
+    兩者產生相同的欄位與列。
+    """
+    if CALAMINE_AVAILABLE and IMPORT_EXCEL_ENGINE == "calamine":
+        try:
+            return pd.read_excel(path, sheet_name=sheet_name, usecols=column_filter(usecols), engine="calamine")
+        except Exception as e:
+            print(f"calamine 無法解析 {os.path.basename(path)}，改用預設引擎: {e}")
+    return pd.read_excel(path, sheet_name=sheet_name, usecols=column_filter(usecols))
+
+@register_reader('xlsx', 'xls')
+def read_excel_frames(path: str, chunksize: Optional[int], usecols: Optional[Collection[str]]) -> Iterator[pd.DataFrame]:
+    # Excel 無法分塊解析，整個工作表一次讀入
+    yield read_excel(path, usecols=usecols)
+
+@register_reader('csv')
+def read_csv_frames(path: str, chunksize: Optional[int], usecols: Optional[Collection[str]]) -> Iterator[pd.DataFrame]:
+    if chunksize:
+        yield from pd.read_csv(path, chunksize=chunksize, usecols=column_filter(usecols))
+    else:
+        yield pd.read_csv(path, usecols=column_filter(usecols))
+
+@register_reader('tsv')
+def read_tsv_frames(path: str, chunksize: Optional[int], usecols: Optional[Collection[str]]) -> Iterator[pd.DataFrame]:
+    if chunksize:
+        yield from pd.read_csv(path, sep='\t', chunksize=chunksize, usecols=column_filter(usecols))
+    else:
+        yield pd.read_csv(path, sep='\t', usecols=column_filter(usecols))
+
+# Web of Science 純文字匯出的欄位標籤
+WOS_TAGS = {
+    "PT": "Publication Type", "AU": "Authors", "TI": "Article Title", "SO": "Source Title",
+    "DE": "Author Keywords", "ID": "Keywords Plus", "AB": "Abstract", "TC": "Times Cited, WoS Core",
+    "PY": "Publication Year", "PD": "Publication Date", "DI": "DOI",
+}
+# 每行一個值的多值標籤，以分號連接
+WOS_LIST_TAGS = {"AU"}
+WOS_LINE_PATTERN = re.compile(r"^([A-Z][A-Z0-9]) (.*)$")
+
+def wos_text_records(path: str) -> Iterator[Dict[str, str]]:
+    """逐行解析 WoS 純文字匯出（'TI ' 等兩字元標籤，續行以三個空白開頭，'ER' 結束一筆紀錄）"""
+    record: Dict[str, List[str]] = {}
+    tag = None
+    with open(path, encoding=TEXT_ENCODING, errors="replace") as f:
+        for line in f:
+            line = line.rstrip("\r\n")
+            if line.startswith("   ") and tag:
+                record.setdefault(tag, []).append(line.strip())
+                continue
+            if line.strip() == "ER":
+                if record:
+                    yield {
+                        WOS_TAGS[tag]: ("; " if tag in WOS_LIST_TAGS else " ").join(values)
+                        for tag, values in record.items() if tag in WOS_TAGS
+                    }
+                record, tag = {}, None
+                continue
+            match = WOS_LINE_PATTERN.match(line)
+            if match:
+                tag = match[1]
+                record.setdefault(tag, []).append(match[2].strip())
+            elif line.strip() in ("EF", ""):
+                tag = None
+
+@register_reader('txt')
+def read_wos_text_frames(path: str, chunksize: Optional[int], usecols: Optional[Collection[str]]) -> Iterator[pd.DataFrame]:
+    return record_frames(wos_text_records(path), chunksize, usecols)
+
+# RIS 的欄位標籤（同一欄位可能有多個標籤，取先出現者）
+RIS_TAGS = {
+    "AU": "Authors", "A1": "Authors", "TI": "Article Title", "T1": "Article Title",
+    "T2": "Source Title", "JO": "Source Title", "JF": "Source Title", "BT": "Source Title",
+    "KW": "Author Keywords", "AB": "Abstract", "N2": "Abstract",
+    "PY": "Publication Year", "Y1": "Publication Year", "DA": "Publication Date",
+    "DO": "DOI", "UR": "URL",
+}
+RIS_LIST_COLUMNS = {"Authors", "Author Keywords"}
+# 視為會議論文的 RIS 類型
+RIS_CONFERENCE_TYPES = {"CONF", "CPAPER"}
+RIS_LINE_PATTERN = re.compile(r"^([A-Z][A-Z0-9])  -(?: (.*))?$")
+
+def ris_records(path: str) -> Iterator[Dict[str, str]]:
+    """逐行解析 RIS（'TAG  - 值'，'ER  -' 結束一筆紀錄）"""
+    record: Dict[str, List[str]] = {}
+    tag = None
+    with open(path, encoding=TEXT_ENCODING, errors="replace") as f:
+        for line in f:
+            line = line.rstrip("\r\n")
+            match = RIS_LINE_PATTERN.match(line)
+            if not match:
+                # 沒有標籤的行接續上一個欄位
+                if tag and line.strip():
+                    record.setdefault(tag, []).append(line.strip())
+                continue
+            tag, value = match[1], (match[2] or "").strip()
+            if tag == "ER":
+                if record:
+                    yield ris_to_record(record)
+                record, tag = {}, None
+            elif value:
+                record.setdefault(tag, []).append(value)
+
+def ris_to_record(record: Dict[str, List[str]]) -> Dict[str, str]:
+    result: Dict[str, str] = {}
+    for tag, values in record.items():
+        column = RIS_TAGS.get(tag)
+        if column is None:
+            continue
+        if column in RIS_LIST_COLUMNS:
+            result[column] = "; ".join(filter(None, [result.get(column), *values]))
+        elif column not in result:
+            result[column] = " ".join(values)
+    # PY/Y1 可能寫成 "2022/05/01/"，只取年份
+    if result.get("Publication Year"):
+        result["Publication Year"] = result["Publication Year"].split("/")[0].strip()
+    types = record.get("TY")
+    result["Publication Type"] = "P" if types and types[0] in RIS_CONFERENCE_TYPES else "J"
+    return result
+
+@register_reader('ris')
+def read_ris_frames(path: str, chunksize: Optional[int], usecols: Optional[Collection[str]]) -> Iterator[pd.DataFrame]:
+    return record_frames(ris_records(path), chunksize, usecols)
+
+# BibTeX 的欄位
+BIBTEX_FIELDS = {
+    "title": "Article Title", "abstract": "Abstract", "year": "Publication Year", "doi": "DOI", "url": "URL",
+}
+BIBTEX_CONFERENCE_TYPES = {"inproceedings", "conference", "proceedings"}
+BIBTEX_ENTRY_PATTERN = re.compile(r"@\s*(\w+)\s*[{(]")
+BIBTEX_FIELD_PATTERN = re.compile(r"\s*,?\s*([\w-]+)\s*=\s*")
+BIBTEX_AUTHOR_SEPARATOR = re.compile(r"\s+and\s+", re.IGNORECASE)
+
+def bibtex_entries(path: str) -> Iterator[tuple]:
+    """
+    逐行讀取 BibTeX 切出每個條目，產生 (類型, 條目內容)；不會整個文件讀入。
+    條目以 {...} 或 (...) 包住：只追蹤欄位值的大括號深度與引號，在值之外遇到與開頭對應的結束符號時條目才結束，
+    欄位值中的括號（例如 "1) data, 2) models"）不影響切分。
+    """
+    entry_type = closer = None
+    body: List[str] = []
+    depth = 0
+    quoted = False
+    with open(path, encoding=TEXT_ENCODING, errors="replace") as f:
+        for line in f:
+            while line:
+                if entry_type is None:
+                    match = BIBTEX_ENTRY_PATTERN.search(line)
+                    if not match:
+                        break
+                    entry_type = match[1].lower()
+                    closer = '}' if match[0].endswith('{') else ')'
+                    line = line[match.end():]
+                    depth, quoted = 0, False
+                end = None
+                for position, char in enumerate(line):
+                    if char == '{':
+                        depth += 1
+                    elif char == '}' and depth > 0:
+                        depth -= 1
+                    elif depth == 0 and char == '"':
+                        quoted = not quoted
+                    elif depth == 0 and not quoted and char == closer:
+                        end = position
+                        break
+                if end is None:
+                    body.append(line)
+                    break
+                body.append(line[:end])
+                if entry_type not in ("comment", "preamble", "string"):
+                    yield entry_type, "".join(body)
+                entry_type, body = None, []
+                # 同一行可能還有下一個條目
+                line = line[end + 1:]
+
+def bibtex_value(text: str, start: int) -> tuple:
+    """讀取從 start 開始的欄位值（{...}、"..." 或不加引號的數字），回傳 (值, 結束位置)"""
+    if text.startswith('{', start) or text.startswith('"', start):
+        depth = 0
+        for position in range(start, len(text)):
+            char = text[position]
+            if char == '{':
+                depth += 1
+            elif char == '}':
+                depth -= 1
+            # 大括號包住的值在括號配對完成時結束；引號包住的值在括號外的下一個引號結束
+            ended = depth == 0 if text[start] == '{' else (char == '"' and position > start and depth == 0)
+            if ended:
+                return text[start + 1:position], position + 1
+        return text[start + 1:], len(text)
+    end = start
+    while end < len(text) and text[end] not in ",\n":
+        end += 1
+    return text[start:end].strip(), end
+
+def bibtex_fields(body: str) -> Dict[str, str]:
+    """解析條目的 key 之後的 '欄位 = 值' 列表，去除 LaTeX 分組用的大括號並合併空白"""
+    fields: Dict[str, str] = {}
+    position = body.find(',')
+    while position != -1 and position < len(body):
+        match = BIBTEX_FIELD_PATTERN.match(body, position)
+        if not match:
+            break
+        value, position = bibtex_value(body, match.end())
+        fields[match[1].lower()] = " ".join(value.replace("{", "").replace("}", "").split())
+    return fields
+
+def bibtex_records(path: str) -> Iterator[Dict[str, str]]:
+    for entry_type, body in bibtex_entries(path):
+        fields = bibtex_fields(body)
+        record = {column: fields[field] for field, column in BIBTEX_FIELDS.items() if fields.get(field)}
+        # booktitle 只在沒有 journal 時作為來源
+        record["Source Title"] = fields.get("journal") or fields.get("booktitle")
+        if fields.get("author"):
+            record["Authors"] = "; ".join(BIBTEX_AUTHOR_SEPARATOR.split(fields["author"]))
+        if fields.get("keywords"):
+            record["Author Keywords"] = fields["keywords"].replace(",", ";")
+        record["Publication Type"] = "P" if entry_type in BIBTEX_CONFERENCE_TYPES else "J"
+        yield record
+
+@register_reader('bib')
+def read_bibtex_frames(path: str, chunksize: Optional[int], usecols: Optional[Collection[str]]) -> Iterator[pd.DataFrame]:
+    return record_frames(bibtex_records(path), chunksize, usecols)
+
+# EndNote XML 中視為會議論文的文獻類型
+ENDNOTE_CONFERENCE_TYPES = {"Conference Proceedings", "Conference Paper"}
+
+def endnote_text(element: Optional[ET.Element]) -> Optional[str]:
+    if element is None:
+        return None
+    text = " ".join("".join(element.itertext()).split())
+    return text or None
+
+def endnote_records(path: str) -> Iterator[Dict[str, str]]:
+    """以 iterparse 逐筆解析 EndNote XML 的 <record>，處理完即從父元素移除，記憶體用量與文件大小無關"""
+    # 目前開啟中的元素；<record> 結束時堆疊頂端即為其父元素
+    parents = []
+    for event, element in ET.iterparse(path, events=("start", "end")):
+        if event == "start":
+            parents.append(element)
+            continue
+        parents.pop()
+        if element.tag != "record":
+            continue
+        ref_type = element.find("ref-type")
+        record = {
+            "Publication Type": "P" if ref_type is not None and ref_type.get("name") in ENDNOTE_CONFERENCE_TYPES else "J",
+            "Article Title": endnote_text(element.find("titles/title")),
+            "Source Title": endnote_text(element.find("titles/secondary-title"))
+                or endnote_text(element.find("periodical/full-title")),
+            "Abstract": endnote_text(element.find("abstract")),
+            "Publication Year": endnote_text(element.find("dates/year")),
+            "DOI": endnote_text(element.find("electronic-resource-num")),
+            "URL": endnote_text(element.find("urls/related-urls/url")),
+        }
+        authors = [endnote_text(author) for author in element.findall("contributors/authors/author")]
+        record["Authors"] = "; ".join(filter(None, authors)) or None
+        keywords = [endnote_text(keyword) for keyword in element.findall("keywords/keyword")]
+        record["Author Keywords"] = "; ".join(filter(None, keywords)) or None
+        if parents:
+            parents[-1].remove(element)
+        yield record
+
+@register_reader('xml')
+def read_endnote_frames(path: str, chunksize: Optional[int], usecols: Optional[Collection[str]]) -> Iterator[pd.DataFrame]:
+    return record_frames(endnote_records(path), chunksize, usecols)
+
+# 上傳不支持的文件類型時的錯誤訊息
+UNSUPPORTED_FORMAT_DETAIL = (
+    "只支持Excel文件 (.xlsx, .xls)、CSV文件 (.csv)、TSV文件 (.tsv)、"
+    "WoS純文字 (.txt)、BibTeX (.bib)、RIS (.ris) 和 EndNote XML (.xml)"
+)
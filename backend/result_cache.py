@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict
+
+# 結果快取設定
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "512"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "300"))  # 秒
+
+# 全域資料版本：任何會影響列表或搜索結果的寫入都會遞增它，使舊快取失效
+_data_version = 0
+_version_lock = threading.Lock()
+
+def get_data_version() -> int:
+    return _data_version
+
+def bump_data_version():
+    """資料已變更，讓所有快取結果失效"""
+    global _data_version
+    with _version_lock:
+        _data_version += 1
+
+def make_cache_key(namespace: str, *parts: Any) -> str:
+    """以命名空間與參數產生雜湊快取鍵"""
+    raw = json.dumps([namespace, *parts], sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+class ResultCache:
+    """帶容量與 TTL 上限的 LRU 快取，項目綁定寫入時的資料版本"""
+
+    def __init__(self, max_size: int = RESULT_CACHE_SIZE, ttl: float = RESULT_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str):
+        """取得快取值；過期或資料版本已變更時回傳 None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                version, expires_at, value = entry
+                if version == _data_version and expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: Any, version: int):
+        """存入快取值；version 應為開始計算結果之前的資料版本"""
+        if self.max_size <= 0 or version != _data_version:
+            return
+        with self._lock:
+            self._entries[key] = (version, time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]):
+        """命中時直接回傳，否則計算並存入快取"""
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        version = _data_version
+        value = compute()
+        self.set(key, value, version)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "data_version": _data_version,
+            }
+
+# 論文列表與搜索結果共用的快取
+search_cache = ResultCache()
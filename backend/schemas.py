@@ -123,9 +123,35 @@ class PaperResponse(PaperBase):
     venue: Optional[VenueResponse] = None
     authors: List[PaperAuthorResponse] = []
     tags: List[PaperTagResponse] = []
+    score: Optional[float] = None  # 搜索相關度分數（僅排序搜索時提供）
+
+# 游標分頁回應
+class PaperPage(BaseModel):
+    items: List[PaperResponse]
+    next_cursor: Optional[str] = None  # 為 None 表示已無下一頁
+    total: Optional[int] = None  # 結果總數，只在第一頁提供
+    total_is_exact: Optional[bool] = None  # False 表示總數為查詢規劃器的估計值
+
+# 分面統計
+class FacetValue(BaseModel):
+    value: Optional[Union[int, str]] = None  # 年份、期刊/標籤 ID 或文件類型；None 表示未設定
+    label: Optional[str] = None
+    color: Optional[str] = None
+    count: int
+
+class SearchFacets(BaseModel):
+    total: int
+    publication_year: List[FacetValue] = []
+    venue: List[FacetValue] = []
+    document_type: List[FacetValue] = []
+    tag: List[FacetValue] = []
+
+class FacetedPaperPage(PaperPage):
+    facets: SearchFacets
 
 # Search filters
 class SearchFilters(BaseModel):
+    keyword: Optional[str] = None  # 標題、關鍵字、摘要加權全文搜索
     title_keyword: Optional[str] = None
     author_name: Optional[str] = None
     year_from: Optional[int] = None
@@ -135,6 +161,7 @@ class SearchFilters(BaseModel):
     abstract_keyword: Optional[str] = None
     venue_id: Optional[int] = None
     tags: Optional[List[str]] = None
+    sort_by: Optional[str] = None  # 'relevance' 依 ts_rank_cd 排序
 
 # 新的複雜查詢構建器類型
 class FilterCondition(BaseModel):
@@ -167,6 +194,53 @@ class BatchTagResult(BaseModel):
     updated_paper_ids: List[int]
     errors: List[str]
 
+# 重複論文掃描 schemas
+class DuplicateScanRunResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    
+    id: int
+    status: str  # 'running', 'completed' 或 'failed'
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    papers_scanned: Optional[int] = 0
+    clusters_found: Optional[int] = 0
+    error: Optional[str] = None
+
+class DuplicateMemberResponse(BaseModel):
+    paper_id: int
+    score: float  # 與代表論文的相似度
+    match: str  # 'representative', 'doi' 或 'title'
+    title: Optional[str] = None  # 論文已被刪除時為 None
+    doi: Optional[str] = None
+    publication_year: Optional[int] = None
+
+class DuplicateClusterResponse(BaseModel):
+    id: int
+    run_id: int
+    size: int
+    status: str  # 'open', 'resolved' 或 'dismissed'
+    kept_paper_id: Optional[int] = None
+    members: List[DuplicateMemberResponse]
+
+class DuplicateResolveRequest(BaseModel):
+    cluster_id: int
+    keep_paper_id: Optional[int] = None  # 預設保留代表論文（id 最小者）
+    mode: str = 'keep_old'  # 傳給 merge_paper：keep_old, overwrite, merge_fields
+    fields: Optional[List[str]] = None
+
+class DuplicateResolveResult(BaseModel):
+    cluster_id: int
+    status: str  # 'resolved'、'skipped' 或 'failed'（合併失敗，群組已回滾）
+    kept_paper_id: Optional[int] = None
+    removed_paper_ids: List[int] = []
+    message: Optional[str] = None
+
+class DuplicateCheckResult(BaseModel):
+    index: int  # 在請求列表中的位置
+    status: str  # 'doi_match'、'title_match'、'similar' 或 'new'
+    candidate_ids: List[int] = []
+    batch_duplicate_of: Optional[int] = None  # 與同一批次中較前面的項目重複時，該項目的位置
+
 # File import schemas
 class FileColumnInfo(BaseModel):
     name: str
@@ -196,6 +270,45 @@ class FileImportResult(BaseModel):
     errors: List[str]
     imported_papers: List[PaperResponse]
 
+# 試導入（不寫入資料庫）schemas
+class ImportDryRunRow(BaseModel):
+    row: int  # 行號，與導入時錯誤訊息的行號相同
+    status: str  # 'new', 'doi_duplicate', 'title_duplicate', 'file_duplicate' 或 'invalid'
+    existing_paper_id: Optional[int] = None  # 重複時資料庫中相同的論文
+    message: Optional[str] = None  # 無效的原因
+
+class ImportDryRunResult(BaseModel):
+    total_rows: int
+    new: int
+    doi_duplicates: int
+    title_duplicates: int
+    file_duplicates: int  # 與文件中前面的列重複
+    invalid: int
+    rows: List[ImportDryRunRow]
+
+# 背景匯入工作 schemas
+class ImportJobResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    
+    id: int
+    filename: Optional[str] = None
+    status: str  # 'queued', 'running', 'completed', 'failed' 或 'cancelled'
+    cancel_requested: bool = False
+    total_rows: Optional[int] = 0
+    processed_rows: Optional[int] = 0
+    successful_imports: Optional[int] = 0
+    failed_imports: Optional[int] = 0
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class ImportJobErrorResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    
+    id: int  # 輪詢時作為 after_id 續讀
+    message: str
+
 # PDF 解析結果 Schema
 class PDFInfoResponse(BaseModel):
     title: Optional[str] = None
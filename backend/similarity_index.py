@@ -0,0 +1,227 @@
+import math
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy.orm import Session
+
+from models import Paper
+from bm25_index import tokenize, find_paper_changes
+
+# 相似論文搜索設定
+SIMILARITY_SYNC_INTERVAL = float(os.getenv("SIMILARITY_SYNC_INTERVAL", "60"))  # 秒
+
+# 各欄位的詞頻權重
+FIELD_WEIGHTS = {"title": 2.0, "keywords": 2.0, "abstract": 1.0}
+# 失效列（已更新或刪除）比例超過此值時壓縮矩陣
+COMPACT_RATIO = 0.2
+
+def paper_term_counts(title: Optional[str], abstract: Optional[str], keywords: Optional[List[str]]) -> Dict[str, float]:
+    """計算一篇論文的加權詞頻"""
+    counts: Dict[str, float] = {}
+    for field, text in (("title", title), ("keywords", " ".join(keywords or [])), ("abstract", abstract)):
+        weight = FIELD_WEIGHTS[field]
+        for token in tokenize(text):
+            counts[token] = counts.get(token, 0.0) + weight
+    return counts
+
+class SimilarityIndex:
+    """
+    以 TF-IDF 餘弦相似度尋找相似論文。
+    詞頻存成 scipy 稀疏矩陣（每列一篇論文），IDF 與列正規化在查詢前才計算並快取，
+    更新的論文附加為新列並讓舊列失效，失效列過多時再壓縮。
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.vocabulary: Dict[str, int] = {}
+        self.matrix = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self.paper_ids = np.zeros(0, dtype=np.int64)
+        self.alive = np.zeros(0, dtype=bool)
+        self.row_of: Dict[int, int] = {}
+        self.pending: Dict[int, Dict[str, float]] = {}
+        self.built = False
+        self.last_sync = 0.0
+        self.watermark = None
+        self._weighted = None
+        self._idf = None
+
+    def _row_vectors(self, docs: List[Dict[str, float]], grow: bool) -> sparse.csr_matrix:
+        """將多篇論文的詞頻轉為稀疏列（對數詞頻）；grow 為 False 時忽略詞彙表外的詞"""
+        indptr, indices, data = [0], [], []
+        for counts in docs:
+            for term, count in counts.items():
+                column = self.vocabulary.get(term)
+                if column is None:
+                    if not grow:
+                        continue
+                    column = self.vocabulary[term] = len(self.vocabulary)
+                indices.append(column)
+                data.append(1.0 + math.log(count))
+            indptr.append(len(indices))
+        return sparse.csr_matrix(
+            (np.asarray(data, dtype=np.float32), np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int64)),
+            shape=(len(docs), len(self.vocabulary))
+        )
+
+    def build(self, db: Session):
+        """從 papers 表完整建立矩陣"""
+        with self._lock:
+            self.vocabulary = {}
+            ids, docs, watermark = [], [], None
+            for paper_id, counts, updated_at in iter_paper_terms(db):
+                ids.append(paper_id)
+                docs.append(counts)
+                if updated_at is not None and (watermark is None or updated_at > watermark):
+                    watermark = updated_at
+            self.matrix = self._row_vectors(docs, grow=True)
+            self.paper_ids = np.asarray(ids, dtype=np.int64)
+            self.alive = np.ones(len(ids), dtype=bool)
+            self.row_of = {paper_id: row for row, paper_id in enumerate(ids)}
+            self.pending = {}
+            self.watermark = watermark
+            self.built = True
+            self.last_sync = time.monotonic()
+            self._weighted = None
+
+    def update_paper(self, paper_id: int, counts: Dict[str, float]):
+        """記錄論文的新內容，下次查詢前附加到矩陣"""
+        with self._lock:
+            self.pending[paper_id] = counts
+
+    def remove_paper(self, paper_id: int):
+        with self._lock:
+            self.pending.pop(paper_id, None)
+            row = self.row_of.pop(paper_id, None)
+            if row is not None:
+                self.alive[row] = False
+                self._weighted = None
+
+    def _apply_pending(self):
+        """將待處理的更新附加為新列，必要時壓縮失效列"""
+        if self.pending:
+            ids = list(self.pending)
+            for paper_id in ids:
+                row = self.row_of.get(paper_id)
+                if row is not None:
+                    self.alive[row] = False
+            new_rows = self._row_vectors([self.pending[paper_id] for paper_id in ids], grow=True)
+            matrix = self.matrix.copy()
+            matrix.resize((matrix.shape[0], len(self.vocabulary)))
+            start = matrix.shape[0]
+            self.matrix = sparse.vstack([matrix, new_rows], format="csr")
+            self.paper_ids = np.concatenate([self.paper_ids, np.asarray(ids, dtype=np.int64)])
+            self.alive = np.concatenate([self.alive, np.ones(len(ids), dtype=bool)])
+            for offset, paper_id in enumerate(ids):
+                self.row_of[paper_id] = start + offset
+            self.pending = {}
+            self._weighted = None
+
+        dead = len(self.alive) - int(self.alive.sum())
+        if dead and dead > COMPACT_RATIO * len(self.alive):
+            self.matrix = self.matrix[self.alive]
+            self.paper_ids = self.paper_ids[self.alive]
+            self.alive = np.ones(len(self.paper_ids), dtype=bool)
+            self.row_of = {int(paper_id): row for row, paper_id in enumerate(self.paper_ids)}
+            self._weighted = None
+
+    def _weighted_matrix(self) -> Tuple[sparse.csr_matrix, np.ndarray]:
+        """取得 (列已 L2 正規化的 TF-IDF 矩陣, IDF 向量)，資料變更後才重新計算"""
+        self._apply_pending()
+        if self._weighted is None:
+            live = self.matrix[self.alive]
+            doc_count = live.shape[0]
+            df = np.bincount(live.indices, minlength=self.matrix.shape[1])
+            idf = (np.log((1.0 + doc_count) / (1.0 + df)) + 1.0).astype(np.float32)
+            weighted = self.matrix @ sparse.diags(idf)
+            norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+            norms[norms == 0] = 1.0
+            self._weighted = sparse.csr_matrix(sparse.diags(1.0 / norms) @ weighted)
+            self._idf = idf
+        return self._weighted, self._idf
+
+    def _top_k(self, scores: np.ndarray, limit: int, exclude: Optional[int]) -> List[Tuple[int, float]]:
+        """從所有論文的分數中取出前 k 名（排除失效列、零分與查詢論文本身）"""
+        scores = np.where(self.alive, scores, 0.0)
+        if exclude is not None and exclude in self.row_of:
+            scores[self.row_of[exclude]] = 0.0
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+        candidates = candidates[np.lexsort((self.paper_ids[candidates], -scores[candidates]))]
+        return [(int(self.paper_ids[row]), float(scores[row])) for row in candidates]
+
+    def similar_to_paper(self, paper_id: int, limit: int) -> Optional[List[Tuple[int, float]]]:
+        """與指定論文最相似的論文；論文不在索引中時回傳 None"""
+        with self._lock:
+            weighted, _ = self._weighted_matrix()
+            row = self.row_of.get(paper_id)
+            if row is None:
+                return None
+            scores = (weighted @ weighted[row].T).toarray().ravel()
+            return self._top_k(scores, limit, exclude=paper_id)
+
+    def similar_to_documents(self, docs: List[Dict[str, float]], limit: int) -> List[List[Tuple[int, float]]]:
+        """一次為多篇（尚未入庫的）論文計算最相似的論文，以單次稀疏矩陣乘法取得所有分數"""
+        with self._lock:
+            weighted, idf = self._weighted_matrix()
+            queries = self._row_vectors(docs, grow=False) @ sparse.diags(idf)
+            norms = np.sqrt(np.asarray(queries.multiply(queries).sum(axis=1)).ravel())
+            norms[norms == 0] = 1.0
+            queries = sparse.diags(1.0 / norms) @ queries
+            scores = (weighted @ queries.T).toarray()
+            return [self._top_k(scores[:, i], limit, exclude=None) for i in range(len(docs))]
+
+    def sync(self, db: Session):
+        """補上不經過本行程的變更"""
+        with self._lock:
+            indexed = np.union1d(
+                self.paper_ids[self.alive],
+                np.fromiter(self.pending.keys(), dtype=np.int64, count=len(self.pending))
+            )
+            watermark = self.watermark
+        changed, removed = find_paper_changes(db, watermark, indexed)
+        for paper_id, counts, updated_at in iter_paper_terms(db, changed):
+            self.update_paper(paper_id, counts)
+            with self._lock:
+                if updated_at is not None and (self.watermark is None or updated_at > self.watermark):
+                    self.watermark = updated_at
+        for paper_id in removed:
+            self.remove_paper(paper_id)
+        self.last_sync = time.monotonic()
+
+    def ensure_ready(self, db: Session):
+        """第一次使用時建立矩陣，之後定期與資料庫同步"""
+        if not self.built:
+            with self._lock:
+                if not self.built:
+                    self.build(db)
+                    return
+        if time.monotonic() - self.last_sync >= SIMILARITY_SYNC_INTERVAL:
+            self.sync(db)
+
+def iter_paper_terms(db: Session, paper_ids: Optional[Iterable[int]] = None, batch_size: int = 2000):
+    """依 id 順序逐批讀取論文，產生 (id, 加權詞頻, updated_at)"""
+    query = db.query(Paper.id, Paper.title, Paper.abstract, Paper.keywords, Paper.updated_at)
+    if paper_ids is not None:
+        paper_ids = list(paper_ids)
+        if not paper_ids:
+            return
+        query = query.filter(Paper.id.in_(paper_ids))
+    for row in query.order_by(Paper.id).yield_per(batch_size):
+        yield row.id, paper_term_counts(row.title, row.abstract, row.keywords), row.updated_at
+
+# 行程內共用的相似度索引
+similarity_index = SimilarityIndex()
+
+def index_paper_similarity(paper: Paper):
+    """論文新增或更新後更新相似度索引（尚未建立時略過，建立時會讀到最新資料）"""
+    if similarity_index.built:
+        similarity_index.update_paper(paper.id, paper_term_counts(paper.title, paper.abstract, paper.keywords))
+
+def remove_paper_similarity(paper_id: int):
+    if similarity_index.built:
+        similarity_index.remove_paper(paper_id)
@@ -0,0 +1,101 @@
+import time
+
+from sqlalchemy import delete, event
+
+import crud
+from bm25_index import BM25Index, find_paper_changes
+from models import Paper
+from schemas import PaperCreate, SearchFilters
+
+def make_papers(db):
+    for i in range(40):
+        crud.create_paper(db, PaperCreate(title=f"Graph study number {i}", publication_year=1995 + i % 30, citation_count=i))
+    for i in range(10):
+        crud.create_paper(db, PaperCreate(title=f"Unrelated topic {i}", publication_year=2020))
+
+def search_ids(db, monkeypatch, tmp_path, filters, skip=0, limit=100):
+    """回傳 (資料庫路徑的結果 id, BM25 路徑的結果 id)"""
+    expected = [paper.id for paper in crud.search_papers(db, filters, skip=skip, limit=limit)]
+    index = BM25Index(str(tmp_path))
+    index.build(db)
+    with monkeypatch.context() as patch:
+        patch.setattr(crud, "search_index", index)
+        patch.setattr(crud, "bm25_enabled", lambda: True)
+        # 小批次，確保結構化條件需要檢查多個批次
+        patch.setattr(crud, "BM25_MAX_CANDIDATES", 3)
+        actual = [paper.id for paper in crud.search_papers(db, filters, skip=skip, limit=limit)]
+    return expected, actual
+
+def test_bm25_filtered_search_matches_postgres_path(db, monkeypatch, tmp_path):
+    make_papers(db)
+    filters = SearchFilters(keyword="graph", year_from=2020, min_citations=26)
+    expected, actual = search_ids(db, monkeypatch, tmp_path, filters)
+    assert len(expected) > 0
+    assert actual == expected
+
+def test_bm25_paging_beyond_first_batch_matches_postgres_path(db, monkeypatch, tmp_path):
+    make_papers(db)
+    filters = SearchFilters(keyword="graph", year_from=2010)
+    expected, actual = search_ids(db, monkeypatch, tmp_path, filters, skip=5, limit=4)
+    assert len(expected) == 4
+    assert actual == expected
+
+def test_bm25_relevance_sort_returns_all_filtered_matches(db, monkeypatch, tmp_path):
+    make_papers(db)
+    filters = SearchFilters(keyword="graph", year_to=2000, sort_by="relevance")
+    expected, actual = search_ids(db, monkeypatch, tmp_path, filters)
+    assert sorted(actual) == sorted(expected)
+
+def test_compaction_keeps_segments_other_workers_may_use(tmp_path):
+    index = BM25Index(str(tmp_path))
+    index.index_document(1, {"graph": 1.0})
+    index.save()
+    first = (tmp_path / "CURRENT").read_text()
+    # 其他 worker 在 first 之後開始寫入、尚未切換 CURRENT 的索引段
+    in_progress = tmp_path / f"segment-{time.time_ns()}-1"
+    in_progress.mkdir()
+
+    index.index_document(2, {"graph": 1.0})
+    index.save()
+    assert (tmp_path / first).is_dir()
+    assert in_progress.is_dir()
+
+    index.index_document(3, {"graph": 1.0})
+    index.save()
+    assert not (tmp_path / first).exists()
+
+    reloaded = BM25Index(str(tmp_path))
+    assert reloaded.load()
+    assert [paper_id for paper_id, _ in reloaded.search("graph ")] == [1, 2, 3]
+
+def full_id_scans(db, watermark, indexed_ids):
+    """執行 find_paper_changes，回傳 (結果, 讀出全部論文 id 的查詢次數)"""
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(" ".join(statement.split()))
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        result = find_paper_changes(db, watermark, indexed_ids)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return result, sum(1 for statement in statements if statement.endswith("FROM papers") and "count" not in statement)
+
+def test_sync_detects_deletions_without_full_scan_when_unchanged(db, tmp_path):
+    make_papers(db)
+    index = BM25Index(str(tmp_path))
+    index.build(db)
+
+    (changed, removed), scans = full_id_scans(db, index.watermark, index.indexed_ids())
+    assert removed == []
+    assert scans == 0
+
+    deleted_id = int(index.indexed_ids()[0])
+    db.execute(delete(Paper).where(Paper.id == deleted_id))
+    db.commit()
+    (changed, removed), scans = full_id_scans(db, index.watermark, index.indexed_ids())
+    assert removed == [deleted_id]
+    assert scans == 1
+
+    index.sync(db)
+    assert deleted_id not in index.indexed_ids()
@@ -0,0 +1,35 @@
+import bulk_import
+from bulk_import import import_chunk
+from models import Paper
+
+def test_oversized_value_fails_only_its_row(db):
+    rows = [
+        (1, {"title": "Normal paper", "publication_year": 2020, "authors": ["Smith, J"], "venue": "Journal A"}),
+        (2, {"title": "x" * 1001, "publication_year": 2020, "authors": ["Doe, A"]}),
+        (3, {"title": "Long DOI paper", "publication_year": 2021, "doi": "10.1000/" + "d" * 300}),
+        (4, {"title": "Another paper", "publication_year": 2021, "url": "http://example.org/" + "u" * 1000}),
+        (5, {"title": "Last paper", "publication_year": 2022, "doi": "10.1000/ok"}),
+    ]
+
+    paper_ids, papers, errors = import_chunk(db, rows)
+
+    assert sorted(paper.title for paper in papers) == ["Last paper", "Normal paper"]
+    assert sorted(paper_ids) == sorted(paper.id for paper in papers)
+    assert [error.split(":")[0] for error in errors] == ["行 2", "行 3", "行 4"]
+    assert db.query(Paper).count() == 2
+
+def test_streaming_chunk_skips_hydration_without_indexes(db, monkeypatch):
+    hydrated = []
+    hydrate = bulk_import.hydrate_papers
+    monkeypatch.setattr(bulk_import, "hydrate_papers", lambda db, ids: hydrated.append(ids) or hydrate(db, ids))
+    monkeypatch.setattr(bulk_import, "indexes_enabled", lambda: False)
+    rows = [(1, {"title": "Streamed paper", "publication_year": 2020, "authors": ["Smith, J"]})]
+
+    paper_ids, papers, errors = import_chunk(db, rows, keep_papers=False)
+    assert len(paper_ids) == 1 and papers == [] and errors == []
+    assert hydrated == []
+
+    monkeypatch.setattr(bulk_import, "indexes_enabled", lambda: True)
+    paper_ids, papers, errors = import_chunk(db, [(1, {"title": "Indexed paper", "publication_year": 2020})], keep_papers=False)
+    assert papers == []
+    assert hydrated == [paper_ids]
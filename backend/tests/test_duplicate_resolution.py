@@ -0,0 +1,54 @@
+import crud
+from models import Paper, DuplicateScanRun, DuplicateCluster, DuplicateClusterMember
+from schemas import PaperCreate, DuplicateResolveRequest
+
+def make_cluster(db, paper_ids):
+    run = DuplicateScanRun(status='completed')
+    db.add(run)
+    db.flush()
+    cluster = DuplicateCluster(run_id=run.id, size=len(paper_ids), status='open')
+    db.add(cluster)
+    db.flush()
+    for paper_id in paper_ids:
+        db.add(DuplicateClusterMember(cluster_id=cluster.id, paper_id=paper_id, score=1.0, match='title'))
+    db.commit()
+    return cluster.id
+
+def make_pair(db):
+    kept = crud.create_paper(db, PaperCreate(title="Duplicate paper", publication_year=2020))
+    duplicate = crud.create_paper(db, PaperCreate(title="Duplicate paper", publication_year=2020, doi="10.1000/dup"))
+    return kept.id, duplicate.id
+
+def test_resolve_merges_duplicate_doi_into_kept_paper(db):
+    kept_id, duplicate_id = make_pair(db)
+    cluster_id = make_cluster(db, [kept_id, duplicate_id])
+
+    results = crud.resolve_duplicate_clusters(db, [
+        DuplicateResolveRequest(cluster_id=cluster_id, keep_paper_id=kept_id, mode='merge_fields', fields=['doi'])
+    ])
+
+    assert results[0]["status"] == "resolved"
+    assert results[0]["removed_paper_ids"] == [duplicate_id]
+    db.expire_all()
+    assert db.get(Paper, duplicate_id) is None
+    assert db.get(Paper, kept_id).doi == "10.1000/dup"
+    assert db.get(DuplicateCluster, cluster_id).status == 'resolved'
+
+def test_failed_merge_keeps_duplicate_and_cluster_open(db, monkeypatch):
+    kept_id, duplicate_id = make_pair(db)
+    cluster_id = make_cluster(db, [kept_id, duplicate_id])
+
+    def failing_merge(*args, **kwargs):
+        raise RuntimeError("merge failed")
+    monkeypatch.setattr(crud, "merge_paper", failing_merge)
+
+    results = crud.resolve_duplicate_clusters(db, [
+        DuplicateResolveRequest(cluster_id=cluster_id, keep_paper_id=kept_id, mode='overwrite')
+    ])
+
+    assert results[0]["status"] == "failed"
+    db.expire_all()
+    duplicate = db.get(Paper, duplicate_id)
+    assert duplicate is not None
+    assert duplicate.doi == "10.1000/dup"
+    assert db.get(DuplicateCluster, cluster_id).status == 'open'
@@ -0,0 +1,33 @@
+import numpy as np
+
+import duplicate_scan
+from duplicate_index import NUM_PERMUTATIONS
+
+def scan(monkeypatch, doi_keys, signatures, has_title):
+    ids = np.arange(1, len(doi_keys) + 1, dtype=np.int64)
+    years = np.full(len(doi_keys), 2020, dtype=np.int64)
+    loaded = (ids, years, doi_keys, np.asarray(signatures, dtype=np.uint32), np.asarray(has_title))
+    monkeypatch.setattr(duplicate_scan, "load_papers", lambda db: loaded)
+    return duplicate_scan.find_duplicate_clusters(None)[1]
+
+def test_chained_title_matches_do_not_join_unrelated_papers(monkeypatch):
+    # A~B 與 B~C 的估計相似度約 0.84，A~C 只有約 0.69
+    a = np.arange(NUM_PERMUTATIONS)
+    b = a.copy()
+    b[54:] += 1000
+    c = b.copy()
+    c[44:54] += 1000
+
+    clusters = scan(monkeypatch, [None, None, None], [a, b, c], [True, True, True])
+
+    assert [[paper_id for paper_id, _, _ in members] for members in clusters] == [[1, 2]]
+    assert all(score >= duplicate_scan.DUPLICATE_SCAN_THRESHOLD for _, score, _ in clusters[0])
+
+def test_untitled_paper_joins_only_a_representative_with_the_same_doi(monkeypatch):
+    # 1 與 2 標題相同；3 沒有標題，只與 2 的 DOI 相同
+    signature = np.arange(NUM_PERMUTATIONS)
+    empty = np.zeros(NUM_PERMUTATIONS)
+
+    clusters = scan(monkeypatch, [None, "10.1/x", "10.1/x"], [signature, signature, empty], [True, True, False])
+
+    assert clusters == [[(1, 1.0, 'representative'), (2, 1.0, 'title')]]
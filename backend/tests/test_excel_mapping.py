@@ -0,0 +1,37 @@
+from datetime import date, datetime
+
+import pandas as pd
+
+from excel_import import parse_years, map_wos_frame, map_frame_with_config
+from schemas import FieldMapping
+
+def test_parse_years_handles_datetime_columns():
+    values = pd.Series(pd.to_datetime(["2021-01-01", "2019-06-30", None]))
+    assert parse_years(values).tolist()[:2] == [2021, 2019]
+    assert pd.isna(parse_years(values).iloc[2])
+
+def test_parse_years_handles_dates_mixed_with_numbers_and_text():
+    values = pd.Series([pd.Timestamp("2021-01-01"), datetime(2018, 3, 1), date(2017, 5, 2), 2020, "2016.0", "Mar 2015", None, "n/a"], dtype=object)
+    years = parse_years(values)
+    assert years.tolist()[:6] == [2021, 2018, 2017, 2020, 2016, 2015]
+    assert years.iloc[6:].isna().all()
+
+def test_config_mapping_accepts_date_cells_in_year_column():
+    df = pd.DataFrame({"Title": ["Dated paper"], "Year": [pd.Timestamp("2021-01-01")]})
+    mappings = [
+        FieldMapping(target_field="title", excel_column="Title", is_required=True),
+        FieldMapping(target_field="publication_year", excel_column="Year", is_required=True),
+    ]
+    records, errors = map_frame_with_config(df, mappings)
+    assert errors == []
+    assert records[0][1]["publication_year"] == 2021
+
+def test_wos_mapping_accepts_date_cells_in_publication_year():
+    df = pd.DataFrame({
+        "Article Title": ["WoS paper", "Fallback paper"],
+        "Publication Year": pd.Series([pd.Timestamp("2020-01-01"), None], dtype=object),
+        "Publication Date": [None, "JUN 2019"],
+    })
+    records, errors = map_wos_frame(df)
+    assert errors == []
+    assert [data["publication_year"] for _, data in records] == [2020, 2019]
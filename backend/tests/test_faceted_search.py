@@ -0,0 +1,65 @@
+from sqlalchemy import event
+
+import crud
+from models import Tag
+from schemas import PaperCreate, SearchFilters, ComplexSearchQuery, FilterGroup, FilterCondition
+
+def make_papers(db):
+    tag = Tag(name="graphs", color="#000000")
+    db.add(tag)
+    db.commit()
+    for i in range(12):
+        crud.create_paper(db, PaperCreate(
+            title=f"Graph study number {i}", publication_year=2010 + i % 3,
+            tag_ids=[tag.id] if i % 4 == 0 else []
+        ))
+    crud.create_paper(db, PaperCreate(title="Unrelated topic", publication_year=2020))
+    return tag.id
+
+def collect_pages(fetch):
+    """依游標取完所有頁，回傳 (各頁論文 id, 第一頁的分面統計)"""
+    ids, cursor, first_facets = [], None, None
+    while True:
+        papers, cursor, facets = fetch(cursor)
+        first_facets = first_facets or facets
+        ids.extend(paper.id for paper in papers)
+        if cursor is None:
+            return ids, first_facets
+
+def test_faceted_search_pages_and_counts_match_paged_search(db):
+    tag_id = make_papers(db)
+    filters = SearchFilters(keyword="graph")
+
+    expected, cursor = [], None
+    while True:
+        papers, cursor = crud.search_papers_page(db, filters, cursor=cursor, limit=5)
+        expected.extend(paper.id for paper in papers)
+        if cursor is None:
+            break
+    ids, facets = collect_pages(lambda cursor: crud.search_papers_faceted(db, filters, cursor=cursor, limit=5))
+
+    assert ids == expected
+    assert facets["total"] == 12
+    assert facets["publication_year"] == [{"value": year, "count": 4} for year in (2010, 2011, 2012)]
+    assert facets["tag"] == [{"value": tag_id, "label": "graphs", "color": "#000000", "count": 3}]
+
+def test_complex_faceted_search_reads_page_and_facets_in_one_statement(db):
+    make_papers(db)
+    query = ComplexSearchQuery(root=FilterGroup(id="root", operator="AND", conditions=[
+        FilterCondition(id="c1", field="year_from", operator="greater_than", value=2011)
+    ]))
+
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        papers, cursor, facets = crud.search_papers_complex_faceted(db, query, limit=3)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert sum(1 for statement in statements if "GROUPING SETS" in statement) == 1
+    assert facets["total"] == 9
+    ids, _ = collect_pages(lambda cursor: crud.search_papers_complex_faceted(db, query, cursor=cursor, limit=3))
+    assert len(ids) == len(set(ids)) == 9
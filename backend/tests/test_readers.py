@@ -0,0 +1,117 @@
+import pandas as pd
+
+import readers
+
+def write(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_text(content, encoding="utf-8")
+    return str(path)
+
+def read_records(path, filename, chunksize=None, usecols=None):
+    return pd.concat(readers.read_frames(path, filename, chunksize, usecols)).to_dict("records")
+
+def test_wos_text_continuation_lines_and_multiple_authors(tmp_path):
+    path = write(tmp_path, "savedrecs.txt", (
+        "\ufeffFN Clarivate Analytics Web of Science\nVR 1.0\n"
+        "PT J\nAU Smith, J\n   Doe, A\nTI A study of graph\n   neural networks\nSO JOURNAL OF TESTS\n"
+        "DE graph; gnn\nTC 12\nPY 2020\nDI 10.1234/abc.1\nER\n\n"
+        "PT J\nAU Lee, K\nTI Second paper\nPY 2021\nER\n\nEF\n"
+    ))
+    records = read_records(path, "savedrecs.txt")
+    assert len(records) == 2
+    assert records[0]["Authors"] == "Smith, J; Doe, A"
+    assert records[0]["Article Title"] == "A study of graph neural networks"
+    assert records[0]["Times Cited, WoS Core"] == "12"
+    assert records[0]["DOI"] == "10.1234/abc.1"
+    assert records[1]["Article Title"] == "Second paper"
+
+def test_ris_records_and_year_with_date_parts(tmp_path):
+    path = write(tmp_path, "export.ris", (
+        "TY  - JOUR\nAU  - Smith, John\nAU  - Doe, Alice\nTI  - RIS title\nT2  - Journal of RIS\n"
+        "PY  - 2019\nDO  - 10.1234/ris.1\nKW  - one\nKW  - two\nUR  - http://ris.org\nER  - \n\n"
+        "TY  - CONF\nA1  - Lee, K\nT1  - RIS conf\nPY  - 2022/05/01/\nER  - \n"
+    ))
+    first, second = read_records(path, "export.ris")
+    assert first["Authors"] == "Smith, John; Doe, Alice"
+    assert first["Author Keywords"] == "one; two"
+    assert first["Source Title"] == "Journal of RIS"
+    assert first["Publication Type"] == "J"
+    assert second["Publication Year"] == "2022"
+    assert second["Publication Type"] == "P"
+
+def test_bibtex_parentheses_inside_values_do_not_end_entry(tmp_path):
+    path = write(tmp_path, "refs.bib", (
+        "@article{smith2020,\n"
+        "  title = {Deep learning: 1) data, 2) models},\n"
+        "  author = {Smith, John and Doe, Alice},\n"
+        "  journal = \"Journal (Tests\",\n"
+        "  year = 2020,\n"
+        "  doi = {10.1234/bib.1}\n"
+        "}\n"
+    ))
+    [record] = read_records(path, "refs.bib")
+    assert record["Article Title"] == "Deep learning: 1) data, 2) models"
+    assert record["Authors"] == "Smith, John; Doe, Alice"
+    assert record["Source Title"] == "Journal (Tests"
+    assert record["Publication Year"] == "2020"
+    assert record["DOI"] == "10.1234/bib.1"
+
+def test_bibtex_parenthesis_delimited_and_same_line_entries(tmp_path):
+    path = write(tmp_path, "refs.bib", (
+        "@comment{ignored (}\n"
+        "@inproceedings(lee21, title={Conf (paper}, booktitle={Proc Conf}, year={2021}, keywords={a, b})"
+        "@article{kim22, title={Third}, year={2022}}\n"
+    ))
+    first, second = read_records(path, "refs.bib")
+    assert first["Article Title"] == "Conf (paper"
+    assert first["Source Title"] == "Proc Conf"
+    assert first["Publication Type"] == "P"
+    assert first["Author Keywords"] == "a; b"
+    assert second["Article Title"] == "Third"
+    assert second["Publication Year"] == "2022"
+
+def test_endnote_xml_records(tmp_path):
+    path = write(tmp_path, "library.xml", (
+        '<?xml version="1.0" encoding="UTF-8"?><xml><records>'
+        '<record><ref-type name="Journal Article">17</ref-type>'
+        '<contributors><authors><author><style>Smith, J</style></author><author>Doe, A</author></authors></contributors>'
+        '<titles><title><style>EndNote title</style></title><secondary-title>EN Journal</secondary-title></titles>'
+        '<dates><year>2018</year></dates><electronic-resource-num>10.1234/en.1</electronic-resource-num>'
+        '<keywords><keyword>k1</keyword><keyword>k2</keyword></keywords></record>'
+        '<record><ref-type name="Conference Proceedings">10</ref-type><titles><title>EN conf</title></titles>'
+        '<dates><year>2023</year></dates></record>'
+        '</records></xml>'
+    ))
+    first, second = read_records(path, "library.xml")
+    assert first["Authors"] == "Smith, J; Doe, A"
+    assert first["Article Title"] == "EndNote title"
+    assert first["Source Title"] == "EN Journal"
+    assert first["Author Keywords"] == "k1; k2"
+    assert first["DOI"] == "10.1234/en.1"
+    assert second["Publication Type"] == "P"
+    assert pd.isna(second["Authors"])
+
+def test_endnote_records_are_detached_after_parsing(tmp_path, monkeypatch):
+    records = "".join(f"<record><titles><title>Paper {i}</title></titles></record>" for i in range(50))
+    path = write(tmp_path, "library.xml", f"<xml><records>{records}</records></xml>")
+    roots = []
+    iterparse = readers.ET.iterparse
+    def recording_iterparse(source, events=None):
+        for event, element in iterparse(source, events=events):
+            if not roots:
+                roots.append(element)
+            yield event, element
+    monkeypatch.setattr(readers.ET, "iterparse", recording_iterparse)
+
+    titles = [record["Article Title"] for record in readers.endnote_records(path)]
+
+    assert titles == [f"Paper {i}" for i in range(50)]
+    assert roots[0].tag == "xml"
+    assert list(roots[0].iter("record")) == []
+
+def test_record_chunks_have_continuous_index_and_projected_columns(tmp_path):
+    path = write(tmp_path, "export.ris", "".join(f"TY  - JOUR\nTI  - Paper {i}\nPY  - 2020\nER  - \n" for i in range(5)))
+    frames = list(readers.read_frames(path, "export.ris", 2, ["Article Title", "Publication Year"]))
+    assert [len(frame) for frame in frames] == [2, 2, 1]
+    assert [list(frame.index) for frame in frames] == [[0, 1], [2, 3], [4]]
+    assert all(list(frame.columns) == ["Article Title", "Publication Year"] for frame in frames)
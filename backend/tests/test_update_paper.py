@@ -0,0 +1,31 @@
+import pytest
+
+import crud
+from models import Paper
+from schemas import PaperCreate, PaperUpdate
+
+def make_legacy_duplicate(db):
+    """模擬回填後的舊資料：DOI 與其他論文相同，doi_key 留為 NULL"""
+    original = crud.create_paper(db, PaperCreate(title="Original paper", publication_year=2020, doi="10.1000/same"))
+    legacy = Paper(title="Legacy copy", title_key="legacy copy", publication_year=2020, doi="https://doi.org/10.1000/SAME")
+    db.add(legacy)
+    db.commit()
+    return original.id, legacy.id
+
+def test_update_without_doi_keeps_legacy_doi_key_null(db):
+    _, legacy_id = make_legacy_duplicate(db)
+
+    updated = crud.update_paper(db, legacy_id, PaperUpdate(citation_count=5))
+
+    assert updated.citation_count == 5
+    assert updated.doi_key is None
+
+def test_update_to_existing_doi_raises_value_error(db):
+    original_id, _ = make_legacy_duplicate(db)
+    other = crud.create_paper(db, PaperCreate(title="Other paper", publication_year=2021, doi="10.1000/other"))
+
+    with pytest.raises(ValueError):
+        crud.update_paper(db, other.id, PaperUpdate(doi="doi:10.1000/SAME"))
+    db.expire_all()
+    assert db.get(Paper, other.id).doi_key == "10.1000/other"
+    assert db.get(Paper, original_id).doi_key == "10.1000/same"
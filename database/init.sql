@@ -1,9 +1,13 @@
 -- 研究室論文管理系統數據庫初始化腳本
 
+-- 三元組擴充，用於子字串搜索索引
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
 -- 創建作者表
 CREATE TABLE authors (
     id SERIAL PRIMARY KEY,
     name VARCHAR(255) NOT NULL,
+    name_key VARCHAR(255), -- 標準化姓名（NFKC、casefold、合併標點），匯入時用於查找作者
     email VARCHAR(255) UNIQUE,
     affiliation VARCHAR(500),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
@@ -13,6 +17,7 @@ CREATE TABLE authors (
 CREATE TABLE venues (
     id SERIAL PRIMARY KEY,
     name VARCHAR(500) NOT NULL,
+    name_key VARCHAR(500), -- 標準化名稱（NFKC、轉小寫、合併空白），匯入時用於查找期刊/會議
     type VARCHAR(50) NOT NULL CHECK (type IN ('journal', 'conference')),
     impact_factor DECIMAL(5,3),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
@@ -22,10 +27,12 @@ CREATE TABLE venues (
 CREATE TABLE papers (
     id SERIAL PRIMARY KEY,
     title VARCHAR(1000) NOT NULL,
+    title_key VARCHAR(500), -- 標準化標題（去除標點、轉小寫），用於重複檢查
     abstract TEXT,
     document_type VARCHAR(50) NOT NULL DEFAULT 'paper', -- 新增欄位
     publication_year INTEGER NOT NULL,
     doi VARCHAR(255) UNIQUE,
+    doi_key VARCHAR(255), -- 標準化 DOI（去除 doi.org 前綴、轉小寫），用於重複檢查
     isbn VARCHAR(50), -- 新增欄位
     citation_count INTEGER DEFAULT 0,
     venue_id INTEGER REFERENCES venues(id),
@@ -34,7 +41,8 @@ CREATE TABLE papers (
     url VARCHAR(1000), -- 論文連結
     keywords TEXT[], -- PostgreSQL 陣列類型存儲關鍵字
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    search_vector TSVECTOR -- 加權全文搜索向量，由觸發器維護
 );
 
 -- 創建論文作者關聯表（多對多關係）
@@ -70,24 +78,85 @@ CREATE TABLE citations (
     UNIQUE(citing_paper_id, cited_paper_id)
 );
 
+-- 重複論文掃描結果（成員不設指向 papers 的外鍵，掃描與寫入結果時不鎖定 papers）
+CREATE TABLE duplicate_scan_runs (
+    id SERIAL PRIMARY KEY,
+    status VARCHAR(20) NOT NULL DEFAULT 'running',
+    started_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP WITH TIME ZONE,
+    papers_scanned INTEGER DEFAULT 0,
+    clusters_found INTEGER DEFAULT 0,
+    error TEXT
+);
+
+CREATE TABLE duplicate_clusters (
+    id SERIAL PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES duplicate_scan_runs(id) ON DELETE CASCADE,
+    size INTEGER NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'open',
+    kept_paper_id INTEGER,
+    resolved_at TIMESTAMP WITH TIME ZONE
+);
+
+CREATE TABLE duplicate_cluster_members (
+    id SERIAL PRIMARY KEY,
+    cluster_id INTEGER NOT NULL REFERENCES duplicate_clusters(id) ON DELETE CASCADE,
+    paper_id INTEGER NOT NULL,
+    score DOUBLE PRECISION NOT NULL,
+    match VARCHAR(20) NOT NULL
+);
+
+CREATE TABLE import_jobs (
+    id SERIAL PRIMARY KEY,
+    filename VARCHAR(500),
+    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+    cancel_requested BOOLEAN NOT NULL DEFAULT FALSE,
+    total_rows INTEGER DEFAULT 0,
+    processed_rows INTEGER DEFAULT 0,
+    successful_imports INTEGER DEFAULT 0,
+    failed_imports INTEGER DEFAULT 0,
+    error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP WITH TIME ZONE,
+    finished_at TIMESTAMP WITH TIME ZONE
+);
+
+CREATE TABLE import_job_errors (
+    id SERIAL PRIMARY KEY,
+    job_id INTEGER NOT NULL REFERENCES import_jobs(id) ON DELETE CASCADE,
+    message TEXT NOT NULL
+);
+
 -- 創建全文搜索索引
 CREATE INDEX idx_papers_title_search ON papers USING gin(to_tsvector('english', title));
 CREATE INDEX idx_papers_abstract_search ON papers USING gin(to_tsvector('english', abstract));
 CREATE INDEX idx_papers_year ON papers(publication_year);
 CREATE INDEX idx_papers_citation_count ON papers(citation_count);
 CREATE INDEX idx_authors_name_search ON authors USING gin(to_tsvector('english', name));
+CREATE INDEX idx_papers_search_vector ON papers USING gin(search_vector);
+CREATE INDEX idx_papers_year_id ON papers(publication_year, id); -- 游標分頁排序鍵
+CREATE INDEX idx_papers_title_trgm ON papers USING gin(title gin_trgm_ops);
+CREATE INDEX idx_papers_abstract_trgm ON papers USING gin(abstract gin_trgm_ops);
+CREATE INDEX idx_authors_name_trgm ON authors USING gin(name gin_trgm_ops);
+CREATE UNIQUE INDEX idx_authors_name_key ON authors(name_key);
+CREATE UNIQUE INDEX idx_venues_name_key ON venues(name_key);
+CREATE UNIQUE INDEX idx_papers_doi_key ON papers(doi_key);
+CREATE INDEX idx_papers_title_key ON papers(title_key);
+CREATE INDEX idx_duplicate_clusters_run_status ON duplicate_clusters(run_id, status);
+CREATE INDEX idx_duplicate_cluster_members_cluster ON duplicate_cluster_members(cluster_id);
+CREATE INDEX idx_import_job_errors_job ON import_job_errors(job_id, id);
 
 -- 插入初始測試數據
-INSERT INTO venues (name, type, impact_factor) VALUES 
-('Nature', 'journal', 49.962),
-('Science', 'journal', 47.728),
-('ICML', 'conference', NULL),
-('NeurIPS', 'conference', NULL);
+INSERT INTO venues (name, name_key, type, impact_factor) VALUES 
+('Nature', 'nature', 'journal', 49.962),
+('Science', 'science', 'journal', 47.728),
+('ICML', 'icml', 'conference', NULL),
+('NeurIPS', 'neurips', 'conference', NULL);
 
-INSERT INTO authors (name, email, affiliation) VALUES 
-('張三', 'zhang@example.com', '台灣大學資訊工程學系'),
-('李四', 'li@example.com', '清華大學電機工程學系'),
-('王五', 'wang@example.com', '交通大學資訊科學與工程研究所');
+INSERT INTO authors (name, name_key, email, affiliation) VALUES 
+('張三', '張三', 'zhang@example.com', '台灣大學資訊工程學系'),
+('李四', '李四', 'li@example.com', '清華大學電機工程學系'),
+('王五', '王五', 'wang@example.com', '交通大學資訊科學與工程研究所');
 
 INSERT INTO tags (name, color) VALUES 
 ('機器學習', '#3B82F6'),
@@ -106,4 +175,25 @@ END;
 $$ language 'plpgsql';
 
 CREATE TRIGGER update_papers_updated_at BEFORE UPDATE ON papers
-    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column(); 
\ No newline at end of file
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+-- 觸發器：維護加權全文搜索向量（標題 A、關鍵字 B、摘要 C）
+CREATE OR REPLACE FUNCTION papers_search_vector_update()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT'
+       OR NEW.title IS DISTINCT FROM OLD.title
+       OR NEW.keywords IS DISTINCT FROM OLD.keywords
+       OR NEW.abstract IS DISTINCT FROM OLD.abstract
+       OR NEW.search_vector IS NULL THEN
+        NEW.search_vector :=
+            setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(array_to_string(NEW.keywords, ' '), '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(NEW.abstract, '')), 'C');
+    END IF;
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER papers_search_vector_trigger BEFORE INSERT OR UPDATE ON papers
+    FOR EACH ROW EXECUTE FUNCTION papers_search_vector_update();
@@ -118,11 +118,11 @@ export function FileImportModal({ isOpen, onClose }: FileImportModalProps) {
   const handleFileChange = (e: React.ChangeEvent<HTMLInputElement>) => {
     const file = e.target.files?.[0]
     if (file) {
-      const validExtensions = ['.xlsx', '.xls', '.csv', '.tsv']
+      const validExtensions = ['.xlsx', '.xls', '.csv', '.tsv', '.txt', '.bib', '.ris', '.xml']
       const hasValidExtension = validExtensions.some(ext => file.name.toLowerCase().endsWith(ext))
       
       if (!hasValidExtension) {
-        alert('請選擇數據文件 (.xlsx, .xls, .csv, .tsv)')
+        alert('請選擇數據文件 (.xlsx, .xls, .csv, .tsv, .txt, .bib, .ris, .xml)')
         return
       }
       setSelectedFile(file)
@@ -228,7 +228,8 @@ export function FileImportModal({ isOpen, onClose }: FileImportModalProps) {
               <div className="bg-blue-50 border border-blue-200 rounded-lg p-4">
                 <h3 className="text-sm font-medium text-blue-800 mb-2">支持的文件格式</h3>
                 <ul className="text-sm text-blue-700 space-y-1">
-                  <li>• Web of Science 導出的文件 (.xlsx, .xls, .csv, .tsv)</li>
+                  <li>• Web of Science 導出的文件 (.xlsx, .xls, .csv, .tsv, 純文字 .txt)</li>
+                  <li>• BibTeX (.bib)、RIS (.ris) 和 EndNote XML (.xml) 文獻文件</li>
                   <li>• 文件應包含論文標題、作者、發表年份等基本信息</li>
                   <li>• 系統會自動識別並匹配欄位，您也可以手動配置</li>
                 </ul>
@@ -241,7 +242,7 @@ export function FileImportModal({ isOpen, onClose }: FileImportModalProps) {
                 <input
                   type="file"
                   id="data_file"
-                  accept=".xlsx,.xls,.csv,.tsv"
+                  accept=".xlsx,.xls,.csv,.tsv,.txt,.bib,.ris,.xml"
                   onChange={handleFileChange}
                   className="block w-full text-sm text-gray-500
                     file:mr-4 file:py-2 file:px-4
@@ -251,7 +252,7 @@ export function FileImportModal({ isOpen, onClose }: FileImportModalProps) {
                     hover:file:bg-blue-100"
                 />
                 <p className="mt-1 text-sm text-gray-500">
-                  支持 Excel (.xlsx, .xls)、CSV (.csv) 和 TSV (.tsv) 文件
+                  支持 Excel (.xlsx, .xls)、CSV (.csv)、TSV (.tsv)、WoS 純文字 (.txt)、BibTeX (.bib)、RIS (.ris) 和 EndNote XML (.xml) 文件
                 </p>
                 {selectedFile && (
                   <p className="mt-2 text-sm text-green-600">
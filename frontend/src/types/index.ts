@@ -49,9 +49,11 @@ export interface Paper {
   venue?: Venue
   authors: PaperAuthor[]
   tags: PaperTag[]
+  score?: number // 搜索相關度分數
 }
 
 export interface SearchFilters {
+  keyword?: string
   title_keyword?: string
   author_name?: string
   year_from?: number
@@ -61,6 +63,7 @@ export interface SearchFilters {
   abstract_keyword?: string
   venue_id?: number
   tags?: string[]
+  sort_by?: 'relevance'
 }
 
 // 新的查詢構建器類型